@@ -13,10 +13,14 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 from pathlib import Path
 from dotenv import load_dotenv
 import os
+import sys
 
 # Load environment variables from .env file (if present)
 load_dotenv()
 
+# True while running `manage.py test`
+TESTING = len(sys.argv) > 1 and sys.argv[1] == "test"
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -68,10 +72,17 @@ REST_FRAMEWORK = {
     "DEFAULT_PERMISSION_CLASSES": [
         "rest_framework.permissions.AllowAny",  # Default to allow any, override in views
     ],
+    # Same bytes as rest_framework.renderers.JSONRenderer, encoded by orjson
+    "DEFAULT_RENDERER_CLASSES": [
+        "core.renderers.FastJSONRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+    ],
 }
 
 
 MIDDLEWARE = [
+    # First, so its timings cover every other middleware
+    "core.instrumentation.RequestTimingMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "corsheaders.middleware.CorsMiddleware",
@@ -112,6 +123,198 @@ DATABASES = {
     }
 }
 
+# PostgreSQL instead of SQLite when POSTGRES_DB is set (needs psycopg)
+if os.getenv("POSTGRES_DB"):
+    DATABASES["default"] = {
+        "ENGINE": "django.db.backends.postgresql",
+        "NAME": os.getenv("POSTGRES_DB"),
+        "USER": os.getenv("POSTGRES_USER", ""),
+        "PASSWORD": os.getenv("POSTGRES_PASSWORD", ""),
+        "HOST": os.getenv("POSTGRES_HOST", "localhost"),
+        "PORT": os.getenv("POSTGRES_PORT", "5432"),
+    }
+
+
+# Caches
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+#
+# "ai_match" stores Gemini recipe matches. It uses a file backend locally so
+# entries survive restarts and are shared between workers; point
+# AI_MATCH_CACHE_BACKEND at the database cache (and run `createcachetable`)
+# in production. Tests always use LocMem.
+#
+# "recipe_pages" stores serialized recipe detail and feed pages. Every worker
+# must see the same entries (writes invalidate them), so it is file based
+# locally; use the database cache or Redis in production.
+
+AI_MATCH_CACHE_BACKEND = os.getenv(
+    "AI_MATCH_CACHE_BACKEND",
+    "django.core.cache.backends.filebased.FileBasedCache",
+)
+AI_MATCH_CACHE_LOCATION = os.getenv(
+    "AI_MATCH_CACHE_LOCATION", str(BASE_DIR / ".cache" / "ai_match")
+)
+
+RECIPE_PAGE_CACHE_BACKEND = os.getenv(
+    "RECIPE_PAGE_CACHE_BACKEND",
+    "django.core.cache.backends.filebased.FileBasedCache",
+)
+RECIPE_PAGE_CACHE_LOCATION = os.getenv(
+    "RECIPE_PAGE_CACHE_LOCATION", str(BASE_DIR / ".cache" / "recipe_pages")
+)
+
+if TESTING:
+    AI_MATCH_CACHE_BACKEND = "django.core.cache.backends.locmem.LocMemCache"
+    AI_MATCH_CACHE_LOCATION = "ai-match-tests"
+    RECIPE_PAGE_CACHE_BACKEND = "django.core.cache.backends.locmem.LocMemCache"
+    RECIPE_PAGE_CACHE_LOCATION = "recipe-pages-tests"
+
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    },
+    "ai_match": {
+        "BACKEND": AI_MATCH_CACHE_BACKEND,
+        "LOCATION": AI_MATCH_CACHE_LOCATION,
+        "OPTIONS": {
+            "MAX_ENTRIES": int(os.getenv("AI_MATCH_CACHE_MAX_ENTRIES", "5000")),
+        },
+    },
+    "recipe_pages": {
+        "BACKEND": RECIPE_PAGE_CACHE_BACKEND,
+        "LOCATION": RECIPE_PAGE_CACHE_LOCATION,
+        "OPTIONS": {
+            "MAX_ENTRIES": int(os.getenv("RECIPE_PAGE_CACHE_MAX_ENTRIES", "20000")),
+        },
+    },
+}
+
+AI_MATCH_CACHE = {
+    "ALIAS": "ai_match",
+    # Seconds a Gemini answer stays valid
+    "TTL": int(os.getenv("AI_MATCH_CACHE_TTL", str(60 * 60 * 24))),
+    # Entries kept in the per-process LRU in front of the cache backend
+    "LRU_SIZE": int(os.getenv("AI_MATCH_CACHE_LRU_SIZE", "256")),
+}
+
+RECIPE_PAGE_CACHE = {
+    "ALIAS": "recipe_pages",
+    # Seconds a page is served as is; 0 turns the cache off (the default in
+    # tests, which enable it explicitly)
+    "TTL": 0 if TESTING else int(os.getenv("RECIPE_PAGE_CACHE_TTL", "300")),
+    # Seconds an expired page may still be served while one worker rebuilds it
+    "STALE_TTL": int(os.getenv("RECIPE_PAGE_CACHE_STALE_TTL", "60")),
+    "LOCK_TIMEOUT": 10,
+    # Feed pages cached per feed (landing, each category)
+    "LIST_PAGES": int(os.getenv("RECIPE_PAGE_CACHE_LIST_PAGES", "3")),
+}
+
+
+# Gemini
+# Pin a model name to skip discovery, e.g. GEMINI_MODEL=gemini-1.5-flash
+GEMINI_MODEL = os.getenv("GEMINI_MODEL", "")
+# Backoff (seconds) before re-resolving the model after a failure
+GEMINI_RESOLVE_BACKOFF_BASE = float(os.getenv("GEMINI_RESOLVE_BACKOFF_BASE", "2"))
+GEMINI_RESOLVE_BACKOFF_MAX = float(os.getenv("GEMINI_RESOLVE_BACKOFF_MAX", "300"))
+
+# LLM used by AI matching. core.match_backends.LocalMatchBackend is an offline,
+# deterministic stand-in for CI and load tests.
+AI_MATCH_BACKEND = {
+    "BACKEND": os.getenv(
+        "AI_MATCH_BACKEND", "core.match_backends.GeminiMatchBackend"
+    ),
+    "OPTIONS": {},
+}
+
+# Recipes shortlisted locally and sent to Gemini per match (0 = whole catalog)
+AI_MATCH_TOP_K = int(os.getenv("AI_MATCH_TOP_K", "25"))
+# Hard per-request limit (seconds) on the LLM call of an AI match
+AI_MATCH_TIMEOUT = float(os.getenv("AI_MATCH_TIMEOUT", "20"))
+# Answer with the best locally ranked recipe (core.ranking) when the LLM is
+# not configured, fails or times out
+AI_MATCH_RANKING_FALLBACK = (
+    os.getenv("AI_MATCH_RANKING_FALLBACK", "True").lower() == "true"
+)
+
+# Concurrent AI matches for the same pantry share one LLM call
+# (core.single_flight), across workers through a lock in the ai_match cache
+AI_MATCH_SINGLE_FLIGHT = {
+    "ENABLED": os.getenv("AI_MATCH_SINGLE_FLIGHT", "True").lower() == "true",
+    # Longest a request waits for another worker's LLM call, in seconds
+    "WAIT": float(os.getenv("AI_MATCH_SINGLE_FLIGHT_WAIT", "30")),
+    # The cross-worker lock needs a cache with an atomic add (Redis, Memcached,
+    # database); unset, it is only used with those backends
+    "CROSS_WORKER": {"true": True, "false": False}.get(
+        os.getenv("AI_MATCH_SINGLE_FLIGHT_CROSS_WORKER", "").lower()
+    ),
+}
+
+# Seconds between checks of the catalog version by the process-local
+# ingredient index (core.ingredient_index), which rebuilds after writes made
+# by other workers
+INGREDIENT_INDEX = {
+    "CHECK_INTERVAL": float(os.getenv("INGREDIENT_INDEX_CHECK_INTERVAL", "1")),
+}
+
+# Background AI matches (core.match_jobs). WORKERS threads per web process run
+# the jobs it queues; set it to 0 to leave them to `manage.py run_match_jobs`.
+AI_MATCH_JOBS = {
+    "WORKERS": int(os.getenv("AI_MATCH_JOB_WORKERS", "2")),
+    # Jobs a user (or address, when anonymous) may have in flight
+    "PER_USER": int(os.getenv("AI_MATCH_JOBS_PER_USER", "2")),
+    # Longest long-poll (?wait=) on a job, in seconds
+    "MAX_WAIT": float(os.getenv("AI_MATCH_JOB_MAX_WAIT", "25")),
+    # Seconds finished jobs are kept for their clients to collect
+    "RESULT_TTL": int(os.getenv("AI_MATCH_JOB_RESULT_TTL", str(60 * 60))),
+    # Header a trusted reverse proxy puts the client address in (as a META
+    # key, e.g. HTTP_X_FORWARDED_FOR); anonymous quotas use REMOTE_ADDR without
+    "CLIENT_IP_HEADER": os.getenv("AI_MATCH_JOB_CLIENT_IP_HEADER") or None,
+}
+
+# Cache-Control (seconds) sent with recipe reads; ETags let clients and
+# proxies revalidate for the cost of one primary-key query
+RECIPE_HTTP_CACHE = {
+    "MAX_AGE": int(os.getenv("RECIPE_HTTP_CACHE_MAX_AGE", "0")),
+    "S_MAXAGE": int(os.getenv("RECIPE_HTTP_CACHE_S_MAXAGE", "30")),
+    "STALE_WHILE_REVALIDATE": int(
+        os.getenv("RECIPE_HTTP_CACHE_STALE_WHILE_REVALIDATE", "60")
+    ),
+}
+
+# Per-request timings (core.instrumentation): Server-Timing headers, a logfmt
+# line per request on the "core.requests" logger and /api/metrics/
+REQUEST_TIMING = {
+    "SERVER_TIMING": os.getenv("REQUEST_SERVER_TIMING", "True").lower() == "true",
+    # Bearer token required to scrape /api/metrics/. Without one the endpoint
+    # answers 404 unless DEBUG is on or METRICS_PUBLIC opts in to serving it open
+    "METRICS_TOKEN": os.getenv("METRICS_TOKEN", ""),
+    "METRICS_PUBLIC": os.getenv("METRICS_PUBLIC", "False").lower() == "true",
+}
+
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "handlers": {"console": {"class": "logging.StreamHandler"}},
+    "loggers": {
+        "core.requests": {
+            "handlers": ["console"],
+            "level": "WARNING" if TESTING else os.getenv("REQUEST_LOG_LEVEL", "INFO"),
+            "propagate": False,
+        },
+    },
+}
+
+# Full-text recipe search. Empty picks the database's own engine (SQLite FTS5,
+# Postgres tsvector/GIN) and falls back to core.search.PythonSearchBackend.
+RECIPE_SEARCH_BACKEND = os.getenv("RECIPE_SEARCH_BACKEND", "")
+# Ranked hits computed per query, across all result pages
+RECIPE_SEARCH_MAX_RESULTS = int(os.getenv("RECIPE_SEARCH_MAX_RESULTS", "1000"))
+
+# Rows written per transaction by the bulk recipe import (API and command)
+RECIPE_IMPORT_CHUNK_SIZE = int(os.getenv("RECIPE_IMPORT_CHUNK_SIZE", "500"))
+# Recipes fetched (and prefetched) per round trip by the streaming export
+RECIPE_EXPORT_CHUNK_SIZE = int(os.getenv("RECIPE_EXPORT_CHUNK_SIZE", "500"))
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -0,0 +1,415 @@
+"""
+Helpers shared by the ``bench_*`` management commands: a throwaway database,
+a deterministic synthetic catalog, requests for every API route and latency
+statistics.
+"""
+import json
+import logging
+import os
+import random
+import statistics
+import tempfile
+import time
+from contextlib import contextmanager
+from itertools import count, cycle
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.urls import reverse
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from .ingredient_index import ingredient_index
+from .models import (
+    Category,
+    Ingredient,
+    Instruction,
+    Recipe,
+    RecipeIngredient,
+    SkillLevel,
+)
+from .quantities import quantity_fields
+from .search import get_search_backend, reset_search_backend
+
+BASE_INGREDIENTS = [
+    "chicken", "beef", "pork", "lamb", "salmon", "cod", "prawn", "tofu",
+    "egg", "milk", "butter", "cheddar", "parmesan", "mozzarella", "yogurt",
+    "cream", "rice", "pasta", "noodle", "bread", "flour", "oat", "quinoa",
+    "lentil", "chickpea", "bean", "potato", "sweet potato", "carrot", "onion",
+    "garlic", "ginger", "tomato", "pepper", "chilli", "spinach", "kale",
+    "broccoli", "cauliflower", "mushroom", "courgette", "aubergine", "pea",
+    "corn", "leek", "celery", "lemon", "lime", "apple", "banana", "berry",
+    "coconut milk", "curry paste", "soy sauce", "honey", "sugar", "olive oil",
+    "basil", "coriander", "parsley", "thyme", "rosemary", "cumin", "paprika",
+]
+MODIFIERS = [
+    "", "fresh", "dried", "smoked", "red", "green", "baby", "ground",
+    "chopped", "roasted", "frozen", "wild",
+]
+CATEGORIES = [
+    "Italian", "Asian", "Vegetarian", "Seafood", "Dessert", "Breakfast",
+    "Mexican", "Indian", "Soup", "Salad",
+]
+SKILL_LEVELS = ["low", "medium", "high"]
+QUANTITIES = ["1", "2", "100g", "250g", "1 cup", "2 tbsp", "1 tsp", "a pinch"]
+
+
+def ingredient_vocabulary(size):
+    """Deterministic list of ``size`` distinct, realistic ingredient names"""
+    names = []
+    for modifier in MODIFIERS:
+        for base in BASE_INGREDIENTS:
+            names.append(f"{modifier} {base}".strip())
+            if len(names) == size:
+                return names
+    index = 2
+    while len(names) < size:
+        names.append(f"{BASE_INGREDIENTS[len(names) % len(BASE_INGREDIENTS)]} {index}")
+        index += 1
+    return names
+
+
+def local_backend(latency=0.0):
+    """``AI_MATCH_BACKEND`` setting for the offline LLM stand-in"""
+    return {
+        "BACKEND": "core.match_backends.LocalMatchBackend",
+        "OPTIONS": {"latency": latency},
+    }
+
+
+def reset_derived_state():
+    """Drop process-local indexes built from a previous database"""
+    ingredient_index.invalidate()
+    reset_search_backend()
+
+
+@contextmanager
+def temporary_database():
+    """
+    Run the block against a fresh, migrated test database.
+
+    SQLite gets a temporary file rather than ``:memory:`` (an in-memory test
+    database cannot be dropped while the process is alive, so a second
+    catalog would land on top of the first).
+    """
+    test_settings = connection.settings_dict.setdefault("TEST", {})
+    old_test_name = test_settings.get("NAME")
+    tmp_path = None
+    if connection.vendor == "sqlite":
+        fd, tmp_path = tempfile.mkstemp(prefix="bench-", suffix=".sqlite3")
+        os.close(fd)
+        test_settings["NAME"] = tmp_path
+
+    old_name = connection.creation.create_test_db(
+        verbosity=0, autoclobber=True, serialize=False
+    )
+    reset_derived_state()
+    try:
+        yield
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        test_settings["NAME"] = old_test_name
+        if tmp_path and os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        reset_derived_state()
+
+
+def seed_catalog(
+    recipes,
+    vocabulary=600,
+    ingredients_per_recipe=(4, 12),
+    steps_per_recipe=(3, 10),
+    seed=0,
+    batch_size=2000,
+):
+    """
+    Insert a deterministic synthetic catalog with ``bulk_create``, then
+    rebuild the search index (bulk inserts send no signals).
+
+    Returns the ingredient vocabulary used, so callers can build queries
+    that hit the catalog.
+    """
+    rng = random.Random(seed)
+    categories = Category.objects.bulk_create(
+        [
+            Category(name=name, **Category.name_fields(name))
+            for name in CATEGORIES
+        ]
+    )
+    skill_levels = SkillLevel.objects.bulk_create(
+        [SkillLevel(level=level) for level in SKILL_LEVELS]
+    )
+    names = ingredient_vocabulary(vocabulary)
+    ingredients = Ingredient.objects.bulk_create(
+        [
+            Ingredient(name=name, **Ingredient.name_fields(name))
+            for name in names
+        ],
+        batch_size=batch_size,
+    )
+
+    for start in range(0, recipes, batch_size):
+        count = min(batch_size, recipes - start)
+        batch = Recipe.objects.bulk_create(
+            [
+                Recipe(
+                    title=f"{rng.choice(names).title()} {rng.choice(CATEGORIES)} "
+                    f"#{start + offset}",
+                    category=rng.choice(categories),
+                    skill_level=rng.choice(skill_levels),
+                    description=" ".join(rng.choices(names, k=12)),
+                    preparation_duration=rng.randint(5, 120),
+                    servings=rng.randint(1, 8),
+                )
+                for offset in range(count)
+            ]
+        )
+        recipe_ingredients = []
+        instructions = []
+        for recipe in batch:
+            picked = rng.sample(ingredients, rng.randint(*ingredients_per_recipe))
+            for ingredient in picked:
+                recipe_ingredients.append(
+                    RecipeIngredient(
+                        recipe=recipe,
+                        ingredient=ingredient,
+                        **quantity_fields(rng.choice(QUANTITIES)),
+                    )
+                )
+            for step in range(1, rng.randint(*steps_per_recipe) + 1):
+                instructions.append(
+                    Instruction(
+                        recipe=recipe,
+                        step_number=step,
+                        content=f"Step {step}: combine the "
+                        + ", ".join(rng.choices(names, k=3)),
+                    )
+                )
+        RecipeIngredient.objects.bulk_create(recipe_ingredients, batch_size=batch_size)
+        Instruction.objects.bulk_create(instructions, batch_size=batch_size)
+
+    reset_derived_state()
+    get_search_backend().rebuild()
+    return names
+
+
+@contextmanager
+def quiet_request_log():
+    """Silence the per-request log lines of ``core.instrumentation``"""
+    logger = logging.getLogger("core.requests")
+    old_level = logger.level
+    logger.setLevel(logging.WARNING)
+    try:
+        yield
+    finally:
+        logger.setLevel(old_level)
+
+
+def sample_pantries(names, count, size=3, seed=1):
+    """Deterministic comma-separated pantry strings drawn from ``names``"""
+    rng = random.Random(seed)
+    return [", ".join(rng.sample(names, size)) for _ in range(count)]
+
+
+@contextmanager
+def stopwatch(results):
+    """Append the elapsed wall time of the block (in ms) to ``results``"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        results.append((time.perf_counter() - start) * 1000)
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = (len(ordered) - 1) * pct / 100
+    low = int(rank)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+
+def summarize(latencies_ms):
+    """p50/p95/p99/mean of a list of millisecond timings"""
+    return {
+        "count": len(latencies_ms),
+        "mean_ms": round(statistics.fmean(latencies_ms), 3) if latencies_ms else 0.0,
+        "p50_ms": round(percentile(latencies_ms, 50), 3),
+        "p95_ms": round(percentile(latencies_ms, 95), 3),
+        "p99_ms": round(percentile(latencies_ms, 99), 3),
+    }
+
+
+# -------------------------------------------------
+# API requests
+# -------------------------------------------------
+BENCH_PASSWORD = "bench-Passw0rd!"
+
+
+class BenchClient:
+    """``APIClient`` that sends ``ApiWorkload`` requests"""
+
+    def __init__(self):
+        self.client = APIClient()
+        self.user = None
+
+    def authenticate(self, user=None):
+        # Dropping a forced user logs the client out, which costs queries
+        if user is not self.user:
+            self.client.force_authenticate(user)
+            self.user = user
+
+    def send(self, method, path, data=None, user=None, content_type=None):
+        self.authenticate(user)
+        if content_type:
+            response = self.client.generic(
+                method, path, data, content_type=content_type
+            )
+        else:
+            response = getattr(self.client, method.lower())(path, data, format="json")
+        if response.streaming:
+            b"".join(response.streaming_content)
+        return response
+
+
+class ApiWorkload:
+    """
+    One request per URL name of ``core/urls.py`` against a catalog from
+    ``seed_catalog``: ``build(name)()`` returns ``(method, path, data, user,
+    content type)``, trailing items optional. Every call gives a new request
+    (unique user names and titles), and builders may be called from several
+    threads at once.
+    """
+
+    def __init__(self, names, seed=0):
+        self.names = names
+        self.cook = User.objects.create_user("bench-cook", password=BENCH_PASSWORD)
+        self.admin = User.objects.create_user(
+            "bench-admin", password=BENCH_PASSWORD, is_staff=True
+        )
+        ids = list(Recipe.objects.order_by("id").values_list("id", flat=True))
+        self.recipe_ids = cycle(random.Random(seed).sample(ids, min(100, len(ids))))
+        self.terms = cycle(names)
+        self.pantries = cycle(sample_pantries(names, 100, seed=seed + 1))
+        self.serial = count()
+
+    def build(self, name):
+        """Request builder of a URL name, ``None`` if there is none"""
+        return getattr(self, "request_" + name.replace("-", "_"), None)
+
+    def recipe_payload(self, label):
+        return {
+            "title": f"Benchmark stew {label}",
+            "description": "Slow cooked",
+            "preparation_duration": 90,
+            "category": "Italian",
+            "ingredients": [
+                {"name": next(self.terms), "quantity": "1 cup"} for _ in range(8)
+            ],
+            "instructions": [
+                {"step_number": step, "content": f"Step {step}"} for step in (1, 2, 3)
+            ],
+        }
+
+    def request_user_register(self):
+        data = {
+            "username": f"bench-user-{next(self.serial)}",
+            "password": BENCH_PASSWORD,
+            "password_confirm": BENCH_PASSWORD,
+        }
+        return "POST", reverse("user-register"), data
+
+    def request_user_login(self):
+        data = {"username": "bench-cook", "password": BENCH_PASSWORD}
+        return "POST", reverse("user-login"), data
+
+    def request_user_logout(self):
+        data = {"refresh": str(RefreshToken.for_user(self.cook))}
+        return "POST", reverse("user-logout"), data, self.cook
+
+    def request_current_user(self):
+        return "GET", reverse("current-user"), None, self.cook
+
+    def request_recipe_list_landing(self):
+        return "GET", reverse("recipe-list-landing")
+
+    def request_recipe_by_category(self):
+        return "GET", reverse("recipe-by-category", args=["italian"])
+
+    def request_recipe_search(self):
+        return "GET", reverse("recipe-search"), {"q": next(self.terms)}
+
+    def request_recipe_detail(self):
+        return "GET", reverse("recipe-detail", args=[next(self.recipe_ids)])
+
+    def request_recipe_scale(self):
+        path = reverse("recipe-scale", args=[next(self.recipe_ids)])
+        return "GET", path, {"servings": 6}
+
+    def request_recipe_create(self):
+        data = self.recipe_payload(next(self.serial))
+        return "POST", reverse("recipe-create"), data, self.cook
+
+    def request_recipe_import(self):
+        body = json.dumps(self.recipe_payload(f"import {next(self.serial)}"))
+        return (
+            "POST",
+            reverse("recipe-import"),
+            body,
+            self.admin,
+            "application/x-ndjson",
+        )
+
+    def request_recipe_export(self):
+        return "GET", reverse("recipe-export"), None, self.admin
+
+    def request_recipe_rank(self):
+        params = {"ingredients": next(self.pantries), "limit": 10}
+        return "GET", reverse("recipe-rank"), params
+
+    def request_recipe_cookable(self):
+        params = {"ingredients": next(self.pantries), "max_missing": 2}
+        return "GET", reverse("recipe-cookable"), params
+
+    def request_ai_recipe_match(self):
+        data = {"ingredients": next(self.pantries)}
+        return "POST", reverse("ai-recipe-match"), data
+
+    def request_ai_recipe_match_async(self):
+        data = {"ingredients": next(self.pantries)}
+        return "POST", reverse("ai-recipe-match-async"), data
+
+    def request_ai_match_cache_stats(self):
+        return "GET", reverse("ai-match-cache-stats"), None, self.admin
+
+    def request_metrics(self):
+        return "GET", reverse("metrics")
+
+
+# -------------------------------------------------
+# Query plans
+# -------------------------------------------------
+def explain(sql):
+    """
+    The database's plan for a captured ``SELECT`` (``EXPLAIN QUERY PLAN`` on
+    SQLite, ``EXPLAIN`` on PostgreSQL), one line per plan node
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(f"{connection.ops.explain_query_prefix()} {sql}")
+        return [str(row[-1]) for row in cursor.fetchall()]
+
+
+def full_scans(plan):
+    """Plan lines that read a whole table instead of seeking an index"""
+    scans = []
+    for line in plan:
+        detail = line.strip()
+        if "Seq Scan" in detail:
+            scans.append(detail)
+        elif detail.startswith("SCAN ") and not any(
+            marker in detail for marker in ("USING", "VIRTUAL TABLE")
+        ):
+            scans.append(detail)
+    return scans
@@ -0,0 +1,55 @@
+"""
+Freshness of the recipe catalog, for HTTP validators and caches.
+
+* ``Recipe.updated_at`` moves whenever anything shown on the recipe's detail
+  page changes: the recipe itself (``auto_now``), or its instructions,
+  ingredients, category or skill level (``touch_recipes``);
+* the ``CatalogVersion`` row is bumped by every catalog write, so one
+  primary-key read tells whether any list page may have changed.
+
+Both are maintained by the signal handlers in ``core.signals``, which batch
+them inside ``deferred_index_updates`` like the index refreshes.
+"""
+from django.db.models import F
+from django.utils import timezone
+
+from .models import CatalogVersion, Recipe
+
+CATALOG_VERSION_ID = 1
+
+
+def catalog_version():
+    """``(version, changed_at)`` of the whole catalog"""
+    row = (
+        CatalogVersion.objects.filter(id=CATALOG_VERSION_ID)
+        .values_list("version", "changed_at")
+        .first()
+    )
+    if row is None:
+        state, _ = CatalogVersion.objects.get_or_create(id=CATALOG_VERSION_ID)
+        row = (state.version, state.changed_at)
+    return row
+
+
+def bump_catalog_version():
+    """Move the catalog to its next version, and return that version"""
+    updated = CatalogVersion.objects.filter(id=CATALOG_VERSION_ID).update(
+        version=F("version") + 1, changed_at=timezone.now()
+    )
+    if not updated:
+        CatalogVersion.objects.get_or_create(
+            id=CATALOG_VERSION_ID, defaults={"version": 2}
+        )
+    # The row stays locked until commit, so this is the version written
+    return (
+        CatalogVersion.objects.filter(id=CATALOG_VERSION_ID)
+        .values_list("version", flat=True)
+        .get()
+    )
+
+
+def touch_recipes(recipe_ids):
+    """Move ``updated_at`` of recipes whose related rows changed"""
+    recipe_ids = set(recipe_ids)
+    if recipe_ids:
+        Recipe.objects.filter(id__in=recipe_ids).update(updated_at=timezone.now())
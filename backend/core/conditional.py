@@ -0,0 +1,120 @@
+"""
+Conditional GET for the recipe read endpoints.
+
+Validators cost one primary-key query and never touch a serializer:
+
+* single recipes (detail, scaling): ``Recipe.updated_at``;
+* lists (landing, category, search): the catalog version (``core.catalog``).
+
+Requests whose ``If-None-Match`` / ``If-Modified-Since`` still match get a
+``304 Not Modified`` before the view runs (Django's ``condition``). Every
+response carries ``Cache-Control`` from ``RECIPE_HTTP_CACHE``, so shared
+caches (CDN, reverse proxy) can absorb repeat traffic and browsers
+revalidate cheaply.
+"""
+import hashlib
+
+from django.conf import settings
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.utils.decorators import method_decorator
+from django.views.decorators.http import condition
+
+from .catalog import catalog_version
+from .models import Recipe
+
+DEFAULTS = {
+    "MAX_AGE": 0,
+    "S_MAXAGE": 30,
+    "STALE_WHILE_REVALIDATE": 60,
+}
+
+
+def get_setting(name):
+    return getattr(settings, "RECIPE_HTTP_CACHE", {}).get(name, DEFAULTS[name])
+
+
+def make_etag(request, *parts):
+    """
+    Strong ETag of ``parts``, scoped to the URL and the negotiated format
+    (the browsable API and JSON share URLs)
+    """
+    scope = f"{request.get_full_path()}|{request.META.get('HTTP_ACCEPT', '')}"
+    digest = hashlib.sha1(scope.encode("utf-8")).hexdigest()[:12]
+    return "-".join(str(part) for part in parts) + f"-{digest}"
+
+
+# -------------------------------------------------
+# Validators
+# -------------------------------------------------
+def _recipe_updated_at(request, id):
+    # condition() asks for the ETag and Last-Modified separately
+    if not hasattr(request, "_recipe_updated_at"):
+        request._recipe_updated_at = (
+            Recipe.objects.filter(id=id).values_list("updated_at", flat=True).first()
+        )
+    return request._recipe_updated_at
+
+
+def recipe_etag(request, id, **kwargs):
+    updated_at = _recipe_updated_at(request, id)
+    if updated_at is None:
+        # Let the view answer 404
+        return None
+    return make_etag(request, "recipe", id, updated_at.timestamp())
+
+
+def recipe_last_modified(request, id, **kwargs):
+    return _recipe_updated_at(request, id)
+
+
+def _catalog_version(request):
+    if not hasattr(request, "_catalog_version"):
+        request._catalog_version = catalog_version()
+    return request._catalog_version
+
+
+def catalog_etag(request, *args, **kwargs):
+    version, _ = _catalog_version(request)
+    return make_etag(request, "catalog", version)
+
+
+def catalog_last_modified(request, *args, **kwargs):
+    _, changed_at = _catalog_version(request)
+    return changed_at
+
+
+# -------------------------------------------------
+# Decorators for the views
+# -------------------------------------------------
+def cache_control(view):
+    """Send ``Cache-Control`` and ``Vary: Accept`` on successful reads"""
+
+    def wrapped(request, *args, **kwargs):
+        response = view(request, *args, **kwargs)
+        if request.method in ("GET", "HEAD") and response.status_code in (200, 304):
+            patch_cache_control(
+                response,
+                public=True,
+                max_age=get_setting("MAX_AGE"),
+                s_maxage=get_setting("S_MAXAGE"),
+                stale_while_revalidate=get_setting("STALE_WHILE_REVALIDATE"),
+            )
+            patch_vary_headers(response, ["Accept"])
+        return response
+
+    return wrapped
+
+
+def _conditional(etag_func, last_modified_func):
+    def decorator(view):
+        return cache_control(
+            condition(etag_func=etag_func, last_modified_func=last_modified_func)(
+                view
+            )
+        )
+
+    return method_decorator(decorator, name="dispatch")
+
+
+recipe_conditional = _conditional(recipe_etag, recipe_last_modified)
+catalog_conditional = _conditional(catalog_etag, catalog_last_modified)
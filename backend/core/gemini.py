@@ -0,0 +1,232 @@
+"""
+Gemini model resolution.
+
+Picking a working model used to cost one or two ``list_models()`` round trips
+plus trial ``generate_content`` calls on every AI match. The resolver does
+that work once, memoizes the chosen ``GenerativeModel`` for the life of the
+process and only resolves again after a failure, with exponential backoff.
+A model whose calls failed is passed over by the next resolutions until every
+listed model has failed once.
+"""
+import os
+import threading
+import time
+
+from django.conf import settings
+
+import google.generativeai as genai
+
+# Tried in order when list_models() is unavailable or returns nothing usable
+CANDIDATE_MODELS = [
+    "gemini-1.5-flash-latest",
+    "gemini-1.5-pro-latest",
+    "gemini-1.5-flash",
+    "gemini-1.5-pro",
+    "gemini-pro",
+    "models/gemini-1.5-flash-latest",
+    "models/gemini-1.5-pro-latest",
+    "models/gemini-1.5-flash",
+    "models/gemini-1.5-pro",
+    "models/gemini-pro",
+]
+
+PROBE_PROMPT = "Say hello in one word"
+
+TROUBLESHOOTING = (
+    "\n\nTroubleshooting steps:\n"
+    "1. Verify your API key at https://aistudio.google.com/app/apikey\n"
+    "2. Make sure the API key has 'Generative Language API' enabled\n"
+    "3. Check if your API key has any restrictions\n"
+    "4. Try creating a new API key\n"
+    "5. Ensure you're using the correct API key (not Vertex AI key)"
+)
+
+
+class GeminiError(Exception):
+    """Base class for Gemini resolution errors"""
+
+
+class GeminiNotConfigured(GeminiError):
+    """GOOGLE_AI_API_KEY is missing"""
+
+
+class GeminiUnavailable(GeminiError):
+    """No working model could be found (or we are backing off)"""
+
+
+def get_api_key():
+    api_key = os.getenv("GOOGLE_AI_API_KEY")
+    if not api_key or api_key == "YOUR_KEY_HERE":
+        return None
+    return api_key
+
+
+def strip_model_prefix(name):
+    """'models/gemini-pro' -> 'gemini-pro'"""
+    return name.split("/")[-1] if "/" in name else name
+
+
+class GeminiModelResolver:
+    """Resolve a working Gemini model once and memoize it"""
+
+    def __init__(self, backoff_base=None, backoff_max=None):
+        self._lock = threading.Lock()
+        self._model = None
+        self._model_name = None
+        self._failures = 0
+        self._retry_at = 0.0
+        self._last_error = None
+        # Listed models whose calls failed, skipped when resolving again
+        self._failed_models = set()
+        self._backoff_base = backoff_base
+        self._backoff_max = backoff_max
+
+    @property
+    def backoff_base(self):
+        if self._backoff_base is not None:
+            return self._backoff_base
+        return getattr(settings, "GEMINI_RESOLVE_BACKOFF_BASE", 2.0)
+
+    @property
+    def backoff_max(self):
+        if self._backoff_max is not None:
+            return self._backoff_max
+        return getattr(settings, "GEMINI_RESOLVE_BACKOFF_MAX", 300.0)
+
+    @property
+    def model_name(self):
+        return self._model_name
+
+    def get_model(self):
+        """Return the memoized model, resolving it on first use"""
+        model = self._model
+        if model is not None:
+            return model
+
+        with self._lock:
+            if self._model is not None:
+                return self._model
+
+            api_key = get_api_key()
+            if api_key is None:
+                raise GeminiNotConfigured("Google AI API key not configured")
+
+            wait = self._retry_at - time.monotonic()
+            if wait > 0:
+                raise GeminiUnavailable(
+                    f"Gemini model resolution is backing off for {wait:.0f}s "
+                    f"after: {self._last_error}"
+                )
+
+            try:
+                self._model, self._model_name = self.resolve(api_key)
+            except GeminiError as exc:
+                self._register_failure(str(exc))
+                raise
+            self._failures = 0
+            self._retry_at = 0.0
+            return self._model
+
+    def report_failure(self, error=None):
+        """
+        Forget the memoized model after a failed call; the next
+        ``get_model()`` resolves again once the backoff has elapsed
+        """
+        with self._lock:
+            if self._model_name is not None:
+                self._failed_models.add(self._model_name)
+            self._model = None
+            self._model_name = None
+            self._register_failure(str(error) if error else "generation failed")
+
+    def reset(self):
+        with self._lock:
+            self._model = None
+            self._model_name = None
+            self._failures = 0
+            self._retry_at = 0.0
+            self._last_error = None
+            self._failed_models = set()
+
+    def set_model(self, model, name="override"):
+        """Install a model directly (used by tests and benchmarks)"""
+        with self._lock:
+            self._model = model
+            self._model_name = name
+            self._failures = 0
+            self._retry_at = 0.0
+
+    def _register_failure(self, error):
+        self._failures += 1
+        self._last_error = error
+        delay = min(self.backoff_base * 2 ** (self._failures - 1), self.backoff_max)
+        self._retry_at = time.monotonic() + delay
+
+    # -------------------------------------------------
+    # Resolution
+    # -------------------------------------------------
+    def list_generation_models(self):
+        """Names of available models that support generateContent"""
+        names = []
+        for model_info in genai.list_models():
+            methods = getattr(model_info, "supported_generation_methods", None) or []
+            if "generateContent" in methods:
+                names.append(strip_model_prefix(model_info.name))
+        return names
+
+    def resolve(self, api_key):
+        """
+        Configure the SDK and pick a model. Returns ``(model, name)``.
+
+        Order of preference: ``settings.GEMINI_MODEL`` if set, then the
+        entries of ``CANDIDATE_MODELS`` that ``list_models()`` reports, then
+        any listed model supporting generateContent, leaving out models that
+        failed since (``report_failure``). If listing fails, each candidate
+        is probed with a tiny prompt until one answers.
+        """
+        try:
+            genai.configure(api_key=api_key)
+        except Exception as exc:
+            raise GeminiUnavailable(f"Failed to configure Gemini API: {exc}")
+
+        pinned = getattr(settings, "GEMINI_MODEL", "")
+        if pinned:
+            return genai.GenerativeModel(pinned), pinned
+
+        last_error = None
+        try:
+            available = self.list_generation_models()
+        except Exception as exc:
+            available = []
+            last_error = str(exc)
+
+        if available:
+            preferred = [
+                strip_model_prefix(name)
+                for name in CANDIDATE_MODELS
+                if strip_model_prefix(name) in available
+            ]
+            ordered = list(dict.fromkeys(preferred + available))
+            untried = [name for name in ordered if name not in self._failed_models]
+            if not untried:
+                # Every model failed once: start over, the errors may be gone
+                self._failed_models.clear()
+                untried = ordered
+            name = untried[0]
+            return genai.GenerativeModel(name), name
+
+        for name in CANDIDATE_MODELS:
+            try:
+                model = genai.GenerativeModel(name)
+                model.generate_content(PROBE_PROMPT)
+                return model, name
+            except Exception as exc:
+                last_error = str(exc)
+
+        raise GeminiUnavailable(
+            f"Could not find a working Gemini model. "
+            f"Last error: {last_error}. {TROUBLESHOOTING}"
+        )
+
+
+gemini_resolver = GeminiModelResolver()
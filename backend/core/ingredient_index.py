@@ -0,0 +1,397 @@
+"""
+Process-local inverted index of recipe ingredients.
+
+Answers the exact-match pass of the AI match endpoint without touching the
+ORM, and shortlists candidate recipes (BM25 over ingredient name tokens) for
+the Gemini prompt. The index is built lazily on first use and kept up to
+date by the signal handlers in ``core.signals``.
+
+Signals only reach the process that wrote. Every other process (gunicorn
+workers, ``run_match_jobs``) notices the write by the catalog version
+(``core.catalog``), read at most once per ``INGREDIENT_INDEX["CHECK_INTERVAL"]``
+seconds, and rebuilds the index; the old one keeps answering meanwhile.
+
+Recipes are indexed by canonical ingredient name (``core.normalization``),
+and user input naming no indexed ingredient is corrected to the nearest one
+within a typo or two (``resolve``), so "Tomatos" still matches "tomato".
+"""
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+
+from django.conf import settings
+
+from .normalization import CANONICAL_VERSION, canonical_ingredient_name
+from .retrieval import BM25Index, TrigramIndex, tokenize
+
+# Names shorter than this are never corrected ("ice" is not "rice"); from
+# TYPO_LONG_LENGTH characters on, two edits are allowed instead of one
+TYPO_MIN_LENGTH = 5
+TYPO_LONG_LENGTH = 9
+
+DEFAULTS = {
+    # Seconds between checks of the catalog version for other processes' writes
+    "CHECK_INTERVAL": 1.0,
+}
+
+
+INGREDIENT_COLUMNS = (
+    "ingredient__canonical_name",
+    "ingredient__canonical_version",
+    "ingredient__name",
+)
+
+
+def get_setting(name):
+    return getattr(settings, "INGREDIENT_INDEX", {}).get(name, DEFAULTS[name])
+
+
+def normalize_ingredient_name(name):
+    """Canonical form of an ingredient name, for matching"""
+    return canonical_ingredient_name(name)
+
+
+def typo_budget(term):
+    """Edits allowed when correcting ``term``"""
+    if len(term) < TYPO_MIN_LENGTH:
+        return 0
+    return 1 if len(term) < TYPO_LONG_LENGTH else 2
+
+
+def stored_canonical_name(canonical, version, name):
+    """A row's canonical name, recomputed when missing or outdated"""
+    if version == CANONICAL_VERSION and canonical:
+        return canonical
+    return canonical_ingredient_name(name)
+
+
+@dataclass
+class IngredientMatch:
+    """A recipe that shares at least one ingredient with the user's input"""
+
+    recipe_id: int
+    matched: list = field(default_factory=list)
+    missing: list = field(default_factory=list)
+
+    @property
+    def overlap(self):
+        return len(self.matched)
+
+
+class IngredientIndex:
+    """
+    Inverted index: canonical ingredient name -> recipe ids, plus the
+    ingredient set of every recipe (canonical name -> display name).
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._built = False
+        self._recipes_by_ingredient = {}
+        self._ingredients_by_recipe = {}
+        self._bm25 = BM25Index()
+        # Typo-tolerant lookup of indexed names, and of their words (search)
+        self._names = TrigramIndex()
+        self._words = TrigramIndex()
+        self._word_counts = Counter()
+        # Change tracking for snapshot(): bumped by every build / invalidate,
+        # and recipe id -> version of its last change
+        self._generation = 0
+        self._version = 0
+        self._changed = {}
+        # Catalog version the index reflects, and when to check it next
+        self._catalog_version = None
+        self._next_check = 0.0
+        self._check_lock = threading.Lock()
+
+    # -------------------------------------------------
+    # Building / maintenance
+    # -------------------------------------------------
+    def build(self):
+        from .catalog import catalog_version
+        from .models import RecipeIngredient
+
+        # Read first: a write landing during the build moves it again
+        version = catalog_version()[0]
+        rows = RecipeIngredient.objects.order_by("id").values_list(
+            "recipe_id", *INGREDIENT_COLUMNS
+        )
+        recipes_by_ingredient = {}
+        ingredients_by_recipe = {}
+        for recipe_id, *ingredient in rows.iterator(chunk_size=2000):
+            normalized, name = stored_canonical_name(*ingredient), ingredient[-1]
+            if not normalized:
+                continue
+            ingredients_by_recipe.setdefault(recipe_id, {}).setdefault(
+                normalized, name.strip()
+            )
+            recipes_by_ingredient.setdefault(normalized, set()).add(recipe_id)
+
+        bm25 = BM25Index()
+        for recipe_id, ingredients in ingredients_by_recipe.items():
+            bm25.replace(recipe_id, self._tokens(ingredients))
+
+        with self._lock:
+            self._recipes_by_ingredient = recipes_by_ingredient
+            self._ingredients_by_recipe = ingredients_by_recipe
+            self._bm25 = bm25
+            self._reset_vocabulary(recipes_by_ingredient)
+            self._built = True
+            self._catalog_version = version
+            self._next_check = time.monotonic() + get_setting("CHECK_INTERVAL")
+            self._new_generation()
+
+    def ensure_built(self):
+        if not self._built:
+            with self._lock:
+                if not self._built:
+                    self.build()
+            return
+        if time.monotonic() >= self._next_check:
+            self._follow_catalog()
+
+    def _follow_catalog(self):
+        """Rebuild if another process changed the catalog since the build"""
+        from .catalog import catalog_version
+
+        # One thread checks; the others keep using the current index
+        if not self._check_lock.acquire(blocking=False):
+            return
+        try:
+            self._next_check = time.monotonic() + get_setting("CHECK_INTERVAL")
+            if catalog_version()[0] != self._catalog_version:
+                self.build()
+        finally:
+            self._check_lock.release()
+
+    def follow_write(self, version):
+        """
+        This process's write moved the catalog to ``version``; the signal
+        handlers apply it. Only a version skipping none keeps the index from
+        being rebuilt: anything else includes another process's write.
+        """
+        if self._check_lock.locked():
+            # A rebuild is reading the catalog: let the next check decide
+            return
+        with self._lock:
+            if self._catalog_version is not None and (
+                version == self._catalog_version + 1
+            ):
+                self._catalog_version = version
+
+    def invalidate(self):
+        """Drop the index; it is rebuilt on next use"""
+        with self._lock:
+            self._recipes_by_ingredient = {}
+            self._ingredients_by_recipe = {}
+            self._bm25 = BM25Index()
+            self._reset_vocabulary({})
+            self._built = False
+            self._catalog_version = None
+            self._new_generation()
+
+    def _reset_vocabulary(self, names):
+        self._names = TrigramIndex(names)
+        self._word_counts = Counter(word for name in names for word in name.split())
+        self._words = TrigramIndex(self._word_counts)
+
+    def _add_name(self, normalized):
+        self._names.add(normalized)
+        for word in normalized.split():
+            self._word_counts[word] += 1
+            self._words.add(word)
+
+    def _discard_name(self, normalized):
+        self._names.discard(normalized)
+        for word in normalized.split():
+            self._word_counts[word] -= 1
+            if not self._word_counts[word]:
+                del self._word_counts[word]
+                self._words.discard(word)
+
+    def _new_generation(self):
+        self._generation += 1
+        self._version = 0
+        self._changed = {}
+
+    def refresh_recipe(self, recipe_id):
+        """Reload the ingredient set of a single recipe from the database"""
+        self.refresh_recipes([recipe_id])
+
+    def refresh_recipes(self, recipe_ids):
+        """Reload the ingredient sets of several recipes in one query"""
+        from .models import RecipeIngredient
+
+        recipe_ids = set(recipe_ids)
+        with self._lock:
+            if not self._built or not recipe_ids:
+                # Nothing to keep in sync, the next build reads everything
+                return
+            rows = RecipeIngredient.objects.filter(recipe_id__in=recipe_ids).order_by(
+                "id"
+            ).values_list("recipe_id", *INGREDIENT_COLUMNS)
+            ingredients_by_recipe = {recipe_id: {} for recipe_id in recipe_ids}
+            for recipe_id, *ingredient in rows:
+                normalized, name = stored_canonical_name(*ingredient), ingredient[-1]
+                if normalized:
+                    ingredients_by_recipe[recipe_id].setdefault(
+                        normalized, name.strip()
+                    )
+            for recipe_id, ingredients in ingredients_by_recipe.items():
+                self._replace_recipe(recipe_id, ingredients)
+
+    def remove_recipe(self, recipe_id):
+        with self._lock:
+            if self._built:
+                self._replace_recipe(recipe_id, {})
+
+    def _replace_recipe(self, recipe_id, ingredients):
+        self._version += 1
+        self._changed[recipe_id] = self._version
+        old = self._ingredients_by_recipe.pop(recipe_id, {})
+        for normalized in old:
+            recipe_ids = self._recipes_by_ingredient.get(normalized)
+            if recipe_ids is not None:
+                recipe_ids.discard(recipe_id)
+                if not recipe_ids:
+                    del self._recipes_by_ingredient[normalized]
+                    self._discard_name(normalized)
+        if ingredients:
+            self._ingredients_by_recipe[recipe_id] = ingredients
+            for normalized in ingredients:
+                if normalized not in self._recipes_by_ingredient:
+                    self._add_name(normalized)
+                self._recipes_by_ingredient.setdefault(normalized, set()).add(
+                    recipe_id
+                )
+        self._bm25.replace(
+            recipe_id, self._tokens(ingredients), previous_tokens=self._tokens(old)
+        )
+
+    @staticmethod
+    def _tokens(ingredients):
+        return [token for name in ingredients for token in tokenize(name)]
+
+    # -------------------------------------------------
+    # Queries
+    # -------------------------------------------------
+    def __len__(self):
+        self.ensure_built()
+        return len(self._ingredients_by_recipe)
+
+    def ingredients_for(self, recipe_id):
+        """Display names of a recipe's ingredients, in insertion order"""
+        self.ensure_built()
+        with self._lock:
+            return list(self._ingredients_by_recipe.get(recipe_id, {}).values())
+
+    def snapshot(self, since=None):
+        """
+        ``(stamp, full, {recipe_id: {normalized: display name}})`` for
+        indexes derived from this one (``core.ranking``): every recipe when
+        ``full`` (first call, or the index was rebuilt since), otherwise only
+        the recipes changed since the ``since`` stamp, removed ones mapping
+        to ``{}``. Pass the returned stamp as the next ``since``.
+        """
+        self.ensure_built()
+        with self._lock:
+            stamp = (self._generation, self._version)
+            if since is None or since[0] != self._generation:
+                recipes = self._ingredients_by_recipe
+                full = True
+            elif since == stamp:
+                return stamp, False, {}
+            else:
+                recipes = {
+                    recipe_id: self._ingredients_by_recipe.get(recipe_id, {})
+                    for recipe_id, version in self._changed.items()
+                    if version > since[1]
+                }
+                full = False
+            return stamp, full, {
+                recipe_id: dict(ingredients)
+                for recipe_id, ingredients in recipes.items()
+            }
+
+    def resolve(self, names):
+        """
+        Canonical ``names``, those naming no indexed ingredient replaced by
+        the nearest indexed name within ``typo_budget`` edits, if any (ties
+        go to the name most recipes use)
+        """
+        self.ensure_built()
+        with self._lock:
+            recipes = self._recipes_by_ingredient
+            return [
+                self._correct(name, self._names, lambda name: len(recipes[name]))
+                for name in names
+            ]
+
+    def correct_words(self, words):
+        """``resolve`` for single words, against the words of indexed names"""
+        self.ensure_built()
+        with self._lock:
+            counts = self._word_counts
+            return [self._correct(word, self._words, counts.get) for word in words]
+
+    @staticmethod
+    def _correct(term, vocabulary, weight):
+        if term in vocabulary:
+            return term
+        budget = typo_budget(term)
+        found = vocabulary.closest(term, budget) if budget else []
+        if not found:
+            return term
+        best = found[0][0]
+        nearest = [candidate for distance, candidate in found if distance == best]
+        return max(nearest, key=lambda candidate: (weight(candidate), candidate))
+
+    def rank(self, user_ingredients, limit=None):
+        """
+        Rank recipes by how many of ``user_ingredients`` they contain.
+
+        Ties are broken by fewest missing ingredients, then newest recipe.
+        Returns a list of ``IngredientMatch``.
+        """
+        self.ensure_built()
+        wanted = []
+        for name in user_ingredients:
+            normalized = normalize_ingredient_name(name)
+            if normalized and normalized not in wanted:
+                wanted.append(normalized)
+
+        with self._lock:
+            overlap = {}
+            for normalized in wanted:
+                for recipe_id in self._recipes_by_ingredient.get(normalized, ()):
+                    overlap.setdefault(recipe_id, []).append(normalized)
+
+            matches = []
+            for recipe_id, matched in overlap.items():
+                ingredients = self._ingredients_by_recipe[recipe_id]
+                missing = [
+                    display
+                    for normalized, display in ingredients.items()
+                    if normalized not in wanted
+                ]
+                matches.append(IngredientMatch(recipe_id, matched, missing))
+
+        matches.sort(key=lambda m: (-m.overlap, len(m.missing), -m.recipe_id))
+        if limit is not None:
+            matches = matches[:limit]
+        return matches
+
+    def candidates(self, user_ingredients, k):
+        """
+        Ids of the ``k`` recipes whose ingredient names best match the user's
+        ingredients (BM25 over name tokens, so "cherry tomatoes" still scores
+        recipes using "tomato"), best first
+        """
+        self.ensure_built()
+        query = [token for name in user_ingredients for token in tokenize(name)]
+        with self._lock:
+            return [recipe_id for recipe_id, _ in self._bm25.top(query, k)]
+
+
+ingredient_index = IngredientIndex()
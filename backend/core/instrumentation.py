@@ -0,0 +1,299 @@
+"""
+Per-request performance instrumentation.
+
+``RequestTimingMiddleware`` times every request and splits it into phases:
+
+* ``db``: time and number of SQL queries (a wrapper on every connection);
+* ``serialize``: building response payloads (serializers, ``core.payloads``)
+  and rendering them;
+* ``llm``: calls to the AI match backend.
+
+Code marks its phases with ``timed("serialize")`` / ``timed("llm")``; the
+state lives in a context variable, so it follows sync views, async views and
+the threads ``sync_to_async`` runs their ORM calls in.
+
+Each response gets a ``Server-Timing`` header (browser dev tools show it), a
+``logfmt`` line is written to the ``core.requests`` logger, and the numbers
+are aggregated per view name into in-process Prometheus histograms served by
+``/api/metrics/``. Like the AI match cache stats, the metrics cover the
+worker that answers the scrape.
+"""
+import contextvars
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from django.http import HttpResponse, HttpResponseForbidden, HttpResponseNotFound
+from django.utils.crypto import constant_time_compare
+
+logger = logging.getLogger("core.requests")
+
+DEFAULTS = {
+    "SERVER_TIMING": True,
+    "METRICS_TOKEN": "",
+    "METRICS_PUBLIC": False,
+}
+PHASES = ("db", "serialize", "llm")
+# Seconds; Prometheus client defaults
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+
+def get_setting(name):
+    return getattr(settings, "REQUEST_TIMING", {}).get(name, DEFAULTS[name])
+
+
+class RequestTimings:
+    """Phase durations (seconds) and query count of one request"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.total = 0.0
+        self.phases = dict.fromkeys(PHASES, 0.0)
+        self.queries = 0
+
+    def finish(self):
+        self.total = time.perf_counter() - self.started
+
+    def server_timing(self):
+        db_ms = self.phases["db"] * 1000
+        entries = [f'db;dur={db_ms:.1f};desc="{self.queries} queries"']
+        entries += [
+            f"{phase};dur={self.phases[phase] * 1000:.1f}"
+            for phase in PHASES[1:]
+            if self.phases[phase]
+        ]
+        entries.append(f"total;dur={self.total * 1000:.1f}")
+        return ", ".join(entries)
+
+
+_current = contextvars.ContextVar("request_timings", default=None)
+
+
+@contextmanager
+def timed(phase):
+    """Add the wall time of the block to ``phase`` of the current request"""
+    timings = _current.get()
+    if timings is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.phases[phase] += time.perf_counter() - start
+
+
+class TimedSerializerMixin:
+    """Count a serializer's ``.data`` as serialize time"""
+
+    @property
+    def data(self):
+        with timed("serialize"):
+            return super().data
+
+
+# -------------------------------------------------
+# Database time
+# -------------------------------------------------
+def _time_query(execute, sql, params, many, context):
+    timings = _current.get()
+    if timings is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        timings.phases["db"] += time.perf_counter() - start
+        timings.queries += 1
+
+
+def install_query_timer(connection):
+    if _time_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_time_query)
+
+
+@receiver(connection_created)
+def time_new_connection(sender, connection, **kwargs):
+    install_query_timer(connection)
+
+
+# -------------------------------------------------
+# Histograms
+# -------------------------------------------------
+class Histogram:
+    """Prometheus histogram with one series per view name"""
+
+    def __init__(self, name, help_text, buckets):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        # view -> [count per bucket..., +Inf count], sum
+        self._series = {}
+
+    def observe(self, view, value):
+        with self._lock:
+            empty = ([0] * (len(self.buckets) + 1), 0)
+            counts, total = self._series.get(view, empty)
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[index] += 1
+            counts[-1] += 1
+            self._series[view] = (counts, total + value)
+
+    def render(self):
+        lines = [
+            f"# HELP {self.name} {self.help_text}",
+            f"# TYPE {self.name} histogram",
+        ]
+        with self._lock:
+            series = sorted(self._series.items())
+        for view, (counts, total) in series:
+            label = f'view="{_escape(view)}"'
+            for bound, count in zip(self.buckets, counts):
+                lines.append(f'{self.name}_bucket{{{label},le="{bound}"}} {count}')
+            lines.append(f'{self.name}_bucket{{{label},le="+Inf"}} {counts[-1]}')
+            lines.append(f"{self.name}_sum{{{label}}} {total}")
+            lines.append(f"{self.name}_count{{{label}}} {counts[-1]}")
+        return lines
+
+    def clear(self):
+        with self._lock:
+            self._series.clear()
+
+
+def _escape(value):
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class RequestMetrics:
+    """Histograms of every instrumented request, by view name"""
+
+    def __init__(self):
+        self.total = Histogram(
+            "recipes_request_duration_seconds",
+            "Wall time of a request.",
+            DURATION_BUCKETS,
+        )
+        self.phases = {
+            phase: Histogram(
+                f"recipes_request_{phase}_seconds",
+                f"Time spent in the {phase} phase of a request.",
+                DURATION_BUCKETS,
+            )
+            for phase in PHASES
+        }
+        self.queries = Histogram(
+            "recipes_request_db_queries",
+            "SQL queries issued by a request.",
+            QUERY_BUCKETS,
+        )
+
+    def observe(self, view, timings):
+        self.total.observe(view, timings.total)
+        for phase, histogram in self.phases.items():
+            histogram.observe(view, timings.phases[phase])
+        self.queries.observe(view, timings.queries)
+
+    def histograms(self):
+        return [self.total, *self.phases.values(), self.queries]
+
+    def render(self):
+        lines = []
+        for histogram in self.histograms():
+            lines.extend(histogram.render())
+        return "\n".join(lines) + "\n"
+
+    def clear(self):
+        for histogram in self.histograms():
+            histogram.clear()
+
+
+request_metrics = RequestMetrics()
+
+
+# -------------------------------------------------
+# Middleware and metrics endpoint
+# -------------------------------------------------
+class RequestTimingMiddleware:
+    """Time every request; first in ``MIDDLEWARE`` so the total covers all"""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        timings, token = self.start()
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, timings)
+
+    async def __acall__(self, request):
+        timings, token = self.start()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, timings)
+
+    def start(self):
+        for connection in connections.all(initialized_only=True):
+            install_query_timer(connection)
+        timings = RequestTimings()
+        return timings, _current.set(timings)
+
+    def finish(self, request, response, timings):
+        timings.finish()
+        match = request.resolver_match
+        view = match.view_name if match is not None else "unresolved"
+        request_metrics.observe(view, timings)
+        if get_setting("SERVER_TIMING"):
+            response["Server-Timing"] = timings.server_timing()
+        logger.info(
+            "request view=%s method=%s status=%s total_ms=%.1f db_ms=%.1f "
+            "queries=%d serialize_ms=%.1f llm_ms=%.1f",
+            view,
+            request.method,
+            response.status_code,
+            timings.total * 1000,
+            timings.phases["db"] * 1000,
+            timings.queries,
+            timings.phases["serialize"] * 1000,
+            timings.phases["llm"] * 1000,
+        )
+        return response
+
+
+def metrics_view(request):
+    """
+    GET /api/metrics/
+    Prometheus text format. With ``REQUEST_TIMING["METRICS_TOKEN"]`` set,
+    scrapers must send it as ``Authorization: Bearer <token>``. Without a
+    token the endpoint is hidden (404) unless DEBUG or ``METRICS_PUBLIC`` is on.
+    """
+    token = get_setting("METRICS_TOKEN")
+    if not token:
+        if not (settings.DEBUG or get_setting("METRICS_PUBLIC")):
+            return HttpResponseNotFound()
+    elif not constant_time_compare(
+        request.headers.get("Authorization", ""), f"Bearer {token}"
+    ):
+        return HttpResponseForbidden()
+    return HttpResponse(
+        request_metrics.render(), content_type="text/plain; version=0.0.4"
+    )
@@ -0,0 +1,60 @@
+"""
+Compute ``Ingredient.canonical_name`` for rows written before canonical
+names were stored on save or under older rules (``canonical_version``).
+
+Until then the ingredient index computes the missing or outdated names
+itself when it is built, so this only saves that work. Changing
+``INGREDIENT_ALIASES`` does not bump the version: re-run with ``--all`` and
+restart the workers. The catalog version is bumped once at the end, so
+running workers rebuild their ingredient index with the new names.
+
+    python manage.py backfill_canonical_names --batch-size 2000
+"""
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from core.catalog import bump_catalog_version
+from core.models import Ingredient
+from core.normalization import CANONICAL_FIELDS, CANONICAL_VERSION, canonical_fields
+
+
+class Command(BaseCommand):
+    help = "Store the canonical matching form of every ingredient name"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument(
+            "--all",
+            action="store_true",
+            help="Recompute every row, not only those from older rules",
+        )
+
+    def handle(self, *args, **options):
+        rows = Ingredient.objects.order_by("id").only("id", "name")
+        if not options["all"]:
+            rows = rows.filter(canonical_version__lt=CANONICAL_VERSION)
+
+        last_id = 0
+        updated = 0
+        try:
+            while True:
+                batch = list(rows.filter(id__gt=last_id)[: options["batch_size"]])
+                if not batch:
+                    break
+                for row in batch:
+                    for name, value in canonical_fields(row.name).items():
+                        setattr(row, name, value)
+                with transaction.atomic():
+                    Ingredient.objects.bulk_update(batch, CANONICAL_FIELDS)
+                updated += len(batch)
+                last_id = batch[-1].id
+                if options["verbosity"] > 1:
+                    self.stdout.write(f"{updated} rows")
+        finally:
+            # Also when interrupted: the batches written so far are committed
+            if updated:
+                bump_catalog_version()
+
+        self.stdout.write(
+            self.style.SUCCESS(f"Backfilled {updated} canonical ingredient names")
+        )
@@ -0,0 +1,67 @@
+"""
+Parse the stored ``RecipeIngredient.quantity`` texts into ``amount``,
+``amount_max`` and ``unit``, for rows written before quantities were parsed
+on save or by an older parser (``quantity_version``).
+
+Rows are walked by primary key in batches, each batch updated in its own
+transaction, so the command can be interrupted and re-run safely. Each batch
+moves ``updated_at`` of its recipes and the catalog version is bumped once
+at the end, so HTTP validators, the page cache and other workers see the new
+amounts.
+
+    python manage.py backfill_quantities --batch-size 2000
+"""
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from core.catalog import bump_catalog_version, touch_recipes
+from core.models import RecipeIngredient
+from core.quantities import QUANTITY_FIELDS, QUANTITY_PARSER_VERSION, quantity_fields
+
+
+class Command(BaseCommand):
+    help = "Parse stored ingredient quantities into amounts and units"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument(
+            "--all",
+            action="store_true",
+            help="Re-parse every row, not only those from an older parser",
+        )
+
+    def handle(self, *args, **options):
+        rows = RecipeIngredient.objects.order_by("id").only(
+            "id", "recipe_id", "quantity"
+        )
+        if not options["all"]:
+            rows = rows.filter(quantity_version__lt=QUANTITY_PARSER_VERSION)
+
+        last_id = 0
+        updated = parsed = 0
+        try:
+            while True:
+                batch = list(rows.filter(id__gt=last_id)[: options["batch_size"]])
+                if not batch:
+                    break
+                for row in batch:
+                    for name, value in quantity_fields(row.quantity).items():
+                        setattr(row, name, value)
+                    parsed += row.amount is not None
+                with transaction.atomic():
+                    RecipeIngredient.objects.bulk_update(batch, QUANTITY_FIELDS)
+                    touch_recipes(row.recipe_id for row in batch)
+                updated += len(batch)
+                last_id = batch[-1].id
+                if options["verbosity"] > 1:
+                    self.stdout.write(f"{updated} rows")
+        finally:
+            # Also when interrupted: the batches written so far are committed
+            if updated:
+                bump_catalog_version()
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Backfilled {updated} quantities ({parsed} with an amount)"
+            )
+        )
@@ -0,0 +1,71 @@
+"""
+Benchmark the size and build time of the AI match prompt against catalog size,
+comparing the whole-catalog prompt with the top-K shortlist.
+
+    python manage.py bench_ai_prompt --sizes 100,1000,10000 --top-k 25
+"""
+import json
+
+from django.core.management.base import BaseCommand
+
+from core.benchmarking import (
+    sample_pantries,
+    seed_catalog,
+    stopwatch,
+    summarize,
+    temporary_database,
+)
+from core.ingredient_index import ingredient_index
+from core.matching import build_match_prompt, estimate_tokens, select_candidate_recipes
+
+
+class Command(BaseCommand):
+    help = "Measure AI match prompt tokens and build latency vs catalog size"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sizes", default="100,1000,5000")
+        parser.add_argument("--top-k", type=int, default=25)
+        parser.add_argument("--queries", type=int, default=20)
+        parser.add_argument("--json", action="store_true", help="Print JSON only")
+
+    def handle(self, *args, **options):
+        sizes = [int(size) for size in options["sizes"].split(",")]
+        results = []
+        for size in sizes:
+            with temporary_database():
+                names = seed_catalog(size)
+                pantries = sample_pantries(names, options["queries"])
+                ingredient_index.ensure_built()
+                for mode, top_k in (("full", 0), ("top_k", options["top_k"])):
+                    results.append(self.measure(size, mode, top_k, pantries))
+
+        if options["json"]:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+
+        self.stdout.write(
+            f"{'recipes':>8} {'mode':>6} {'prompt tokens':>14} "
+            f"{'p50 ms':>9} {'p95 ms':>9}"
+        )
+        for row in results:
+            self.stdout.write(
+                f"{row['recipes']:>8} {row['mode']:>6} {row['prompt_tokens']:>14} "
+                f"{row['latency']['p50_ms']:>9.2f} {row['latency']['p95_ms']:>9.2f}"
+            )
+
+    def measure(self, size, mode, top_k, pantries):
+        latencies = []
+        tokens = []
+        for pantry in pantries:
+            with stopwatch(latencies):
+                user_ingredients = [name.strip() for name in pantry.split(",")]
+                recipes = select_candidate_recipes(user_ingredients, top_k=top_k)
+                prompt = build_match_prompt(pantry, recipes, shortlisted=bool(top_k))
+            tokens.append(estimate_tokens(prompt))
+        return {
+            "recipes": size,
+            "mode": mode,
+            "top_k": top_k,
+            "prompt_tokens": max(tokens),
+            "latency": summarize(latencies),
+        }
@@ -0,0 +1,127 @@
+"""
+Load test: latency of the recipe list endpoint while AI match requests are in
+flight, against the local LLM stand-in
+(``LocalMatchBackend``).
+
+Requests go through Django's ASGI handler (``AsyncClient``), where sync views
+share one thread. Slow sync matches therefore queue the cheap list requests
+behind them, while the async endpoint leaves them untouched.
+
+    python manage.py bench_async_match --concurrency 8 --llm-latency 0.5
+"""
+import asyncio
+import json
+import time
+
+from django.core.management.base import BaseCommand
+from django.test import AsyncClient, override_settings
+from django.urls import reverse
+
+from core.benchmarking import (
+    local_backend,
+    seed_catalog,
+    summarize,
+    temporary_database,
+)
+
+LOCMEM_CACHES = {
+    "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"},
+    "ai_match": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "bench-async-match",
+    },
+    "recipe_pages": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "bench-async-match-pages",
+    },
+}
+
+
+class Command(BaseCommand):
+    help = "Compare list-endpoint latency under sync vs async AI match load"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--recipes", type=int, default=500)
+        parser.add_argument("--concurrency", type=int, default=8)
+        parser.add_argument("--llm-latency", type=float, default=0.5)
+        parser.add_argument("--list-requests", type=int, default=50)
+        parser.add_argument("--json", action="store_true", help="Print JSON only")
+
+    def handle(self, *args, **options):
+        with temporary_database(), override_settings(
+            CACHES=LOCMEM_CACHES,
+            ALLOWED_HOSTS=["testserver"],
+            AI_MATCH_BACKEND=local_backend(options["llm_latency"]),
+        ):
+            seed_catalog(options["recipes"])
+            results = asyncio.run(self.run_scenarios(options))
+
+        if options["json"]:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+
+        self.stdout.write(
+            f"{'scenario':>10} {'list p50 ms':>12} {'list p95 ms':>12} "
+            f"{'list max ms':>12} {'matches s':>10}"
+        )
+        for row in results:
+            self.stdout.write(
+                f"{row['scenario']:>10} {row['list']['p50_ms']:>12.1f} "
+                f"{row['list']['p95_ms']:>12.1f} {row['list_max_ms']:>12.1f} "
+                f"{row['match_wall_s']:>10.2f}"
+            )
+
+    async def run_scenarios(self, options):
+        client = AsyncClient()
+        list_url = reverse("recipe-list-landing")
+        results = []
+
+        latencies = await self.sample_list(client, list_url, options["list_requests"])
+        results.append(self.row("idle", latencies, 0.0))
+
+        for scenario, url_name in (
+            ("sync", "ai-recipe-match"),
+            ("async", "ai-recipe-match-async"),
+        ):
+            url = reverse(url_name)
+            start = time.perf_counter()
+            matches = [
+                asyncio.create_task(
+                    client.post(
+                        url,
+                        # Unknown ingredients: no exact match, no cache hit
+                        {"ingredients": f"mystery {scenario} {i}"},
+                        content_type="application/json",
+                    )
+                )
+                for i in range(options["concurrency"])
+            ]
+            await asyncio.sleep(0)
+            latencies = await self.sample_list(
+                client, list_url, options["list_requests"], until_done=matches
+            )
+            responses = await asyncio.gather(*matches)
+            wall = time.perf_counter() - start
+            failed = [r.status_code for r in responses if r.status_code != 200]
+            if failed:
+                self.stderr.write(f"{scenario}: failed match responses {failed}")
+            results.append(self.row(scenario, latencies, wall))
+        return results
+
+    async def sample_list(self, client, url, limit, until_done=None):
+        latencies = []
+        while len(latencies) < limit:
+            start = time.perf_counter()
+            await client.get(url)
+            latencies.append((time.perf_counter() - start) * 1000)
+            if until_done and all(task.done() for task in until_done):
+                break
+        return latencies
+
+    def row(self, scenario, latencies, wall):
+        return {
+            "scenario": scenario,
+            "list": summarize(latencies),
+            "list_max_ms": round(max(latencies), 3),
+            "match_wall_s": round(wall, 3),
+        }
@@ -0,0 +1,118 @@
+"""
+Latency of the "what can I cook" query (``core.pantry``) against a
+pure-Python scan of every recipe, on the in-memory synthetic catalogs of
+``bench_ranking``.
+
+Both must find the same recipes in the same order for every pantry and
+budget before anything is timed. A query is counted with its first page.
+
+    python manage.py bench_cookable --recipes 10000 100000 --max-missing 0 2 5
+"""
+import json
+import random
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.benchmarking import ingredient_vocabulary, stopwatch, summarize
+from core.ingredient_index import normalize_ingredient_name
+from core.pantry import PantryIndex
+
+from .bench_ranking import StaticSource, synthetic_catalog
+
+
+def python_cookable(recipes, wanted, max_missing):
+    """Recipe ids in ``CookableRecipes`` order, from a scan of ``recipes``"""
+    fitting = []
+    for recipe_id, ingredients in recipes.items():
+        used = len(ingredients.keys() & wanted)
+        missing = len(ingredients) - used
+        if used and missing <= max_missing:
+            fitting.append((missing, -used, -recipe_id))
+    fitting.sort()
+    return [-key[2] for key in fitting]
+
+
+class Command(BaseCommand):
+    help = "Compare bitset and pure-Python 'what can I cook' latency"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--recipes", type=int, nargs="+", default=[10000, 100000], dest="sizes"
+        )
+        parser.add_argument("--vocabulary", type=int, default=600)
+        parser.add_argument("--pantry-size", type=int, default=20)
+        parser.add_argument(
+            "--max-missing", type=int, nargs="+", default=[0, 2, 5], dest="budgets"
+        )
+        parser.add_argument("--page-size", type=int, default=10)
+        parser.add_argument("--repeat", type=int, default=20)
+        parser.add_argument("--json", action="store_true", help="Print JSON only")
+
+    def handle(self, *args, **options):
+        names = ingredient_vocabulary(options["vocabulary"])
+        rng = random.Random(options["pantry_size"])
+        pantries = [
+            rng.sample(names, options["pantry_size"])
+            for _ in range(options["repeat"])
+        ]
+        results = {"vocabulary": options["vocabulary"], "runs": []}
+        for size in options["sizes"]:
+            recipes = synthetic_catalog(size, options["vocabulary"])
+            build = []
+            with stopwatch(build):
+                index = PantryIndex(source=StaticSource(recipes))
+                index.cookable(names[:1])
+            for budget in options["budgets"]:
+                run = self.measure(index, recipes, pantries, budget, options)
+                results["runs"].append(
+                    {
+                        "recipes": size,
+                        "max_missing": budget,
+                        "build_ms": round(build[0], 1),
+                        **run,
+                    }
+                )
+
+        if options["json"]:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+        self.stdout.write(
+            f"{'recipes':>8} {'budget':>7} {'matches':>8} {'build ms':>9} "
+            f"{'bitset p50':>11} {'bitset p95':>11} {'python p50':>11} "
+            f"{'speedup':>8}"
+        )
+        for run in results["runs"]:
+            fast, slow = run["bitset"], run["python"]
+            self.stdout.write(
+                f"{run['recipes']:>8} {run['max_missing']:>7} "
+                f"{run['matches']:>8.0f} {run['build_ms']:>9.1f} "
+                f"{fast['p50_ms']:>11.3f} {fast['p95_ms']:>11.3f} "
+                f"{slow['p50_ms']:>11.3f} {slow['p50_ms'] / fast['p50_ms']:>7.1f}x"
+            )
+
+    def measure(self, index, recipes, pantries, budget, options):
+        page_size = options["page_size"]
+        wanted = [
+            set().union(
+                *(index._names_for(normalize_ingredient_name(item)) for item in pantry)
+            )
+            for pantry in pantries
+        ]
+        matches = []
+        for pantry, names in zip(pantries, wanted):
+            cookable = index.cookable(pantry, budget)
+            found = [match.recipe_id for match in cookable[: len(cookable)]]
+            if found != python_cookable(recipes, names, budget):
+                raise CommandError(f"Results differ for pantry {pantry}")
+            matches.append(len(found))
+
+        timings = {"bitset": [], "python": []}
+        for pantry, names in zip(pantries, wanted):
+            with stopwatch(timings["bitset"]):
+                index.cookable(pantry, budget)[:page_size]
+            with stopwatch(timings["python"]):
+                python_cookable(recipes, names, budget)[:page_size]
+        return {
+            "matches": sum(matches) / len(matches),
+            **{path: summarize(values) for path, values in timings.items()},
+        }
@@ -0,0 +1,174 @@
+"""
+Latency and query plans of every endpoint in ``core/urls.py`` against a
+large synthetic catalog.
+
+Each endpoint is requested once to capture its SQL, then ``--repeat`` more
+times for p50/p95. Every distinct ``SELECT`` is run through ``EXPLAIN``
+(``EXPLAIN QUERY PLAN`` on SQLite) and plan lines that read a whole table
+are listed as full scans. The benchmark uses the configured database, so run
+it once per engine (see ``POSTGRES_DB`` in settings for PostgreSQL):
+
+    python manage.py bench_endpoints --recipes 50000
+    POSTGRES_DB=recipes python manage.py bench_endpoints --json > pg.json
+"""
+import json
+
+from django.core.management.base import BaseCommand
+from django.db import connection, reset_queries
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+
+from core import urls
+from core.benchmarking import (
+    ApiWorkload,
+    BenchClient,
+    explain,
+    full_scans,
+    local_backend,
+    quiet_request_log,
+    seed_catalog,
+    stopwatch,
+    summarize,
+    temporary_database,
+)
+
+LOCMEM_CACHES = {
+    "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"},
+    "ai_match": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "bench-endpoints",
+    },
+    "recipe_pages": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "bench-endpoints-pages",
+    },
+}
+# Streaming the whole catalog takes seconds; a few runs are enough
+MAX_RUNS = {"recipe-export": 3}
+
+
+class Command(BaseCommand):
+    help = "EXPLAIN plans and p50/p95 latency for every core endpoint"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--recipes", type=int, default=20000)
+        parser.add_argument("--repeat", type=int, default=20)
+        parser.add_argument(
+            "--endpoint",
+            action="append",
+            dest="endpoints",
+            help="URL name to measure (repeatable); all endpoints by default",
+        )
+        parser.add_argument(
+            "--plans", action="store_true", help="Print every query plan"
+        )
+        parser.add_argument(
+            "--page-cache",
+            action="store_true",
+            help="Serve detail and feed pages from the page cache (off by default "
+            "so repeats hit the database)",
+        )
+        parser.add_argument("--json", action="store_true", help="Print JSON only")
+
+    def handle(self, *args, **options):
+        page_cache = {"TTL": 300 if options["page_cache"] else 0}
+        with temporary_database(), quiet_request_log(), override_settings(
+            CACHES=LOCMEM_CACHES,
+            ALLOWED_HOSTS=["testserver"],
+            AI_MATCH_BACKEND=local_backend(),
+            RECIPE_PAGE_CACHE=page_cache,
+        ):
+            self.workload = ApiWorkload(seed_catalog(options["recipes"]))
+            self.client = BenchClient()
+            wanted = options["endpoints"]
+            results = {
+                "database": connection.vendor,
+                "recipes": options["recipes"],
+                "page_cache": options["page_cache"],
+                "endpoints": [],
+                "skipped": [],
+            }
+            for pattern in urls.urlpatterns:
+                name = pattern.name
+                if wanted and name not in wanted:
+                    continue
+                build = self.workload.build(name)
+                if build is None:
+                    results["skipped"].append(name)
+                    continue
+                runs = min(options["repeat"], MAX_RUNS.get(name, options["repeat"]))
+                results["endpoints"].append(self.measure(name, build, runs))
+
+        if options["json"]:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+        self.report(results, options["plans"])
+
+    def report(self, results, plans):
+        self.stdout.write(
+            f"{results['database']}, {results['recipes']} recipes\n\n"
+            f"{'endpoint':<24} {'status':>6} {'queries':>8} {'p50 ms':>9} "
+            f"{'p95 ms':>9} {'scans':>6}"
+        )
+        for row in results["endpoints"]:
+            scans = sum(len(query["full_scans"]) for query in row["plans"])
+            self.stdout.write(
+                f"{row['endpoint']:<24} {row['status']:>6} {row['queries']:>8} "
+                f"{row['latency']['p50_ms']:>9.2f} {row['latency']['p95_ms']:>9.2f} "
+                f"{scans:>6}"
+            )
+        if results["skipped"]:
+            self.stdout.write(f"\nNo request defined for: {results['skipped']}")
+
+        for row in results["endpoints"]:
+            queries = [query for query in row["plans"] if plans or query["full_scans"]]
+            if not queries:
+                continue
+            self.stdout.write(f"\n{row['method']} {row['path']}")
+            for query in queries:
+                self.stdout.write(f"  {query['sql'][:160]}")
+                for line in query["plan"] if plans else query["full_scans"]:
+                    self.stdout.write(f"    {line}")
+
+    # -------------------------------------------------
+    # Measurement
+    # -------------------------------------------------
+    def measure(self, name, build, runs):
+        # The query log is a bounded deque, already full after seeding
+        reset_queries()
+        request = build()
+        method, path = request[:2]
+        self.client.authenticate(*request[3:4])
+        with CaptureQueriesContext(connection) as captured:
+            response = self.client.send(*request)
+        # Each request resets the query log, so keep this one's queries now
+        queries = captured.captured_queries
+
+        latencies = []
+        for _ in range(runs):
+            # Request bodies (tokens, unique names) are built outside the timer
+            request = build()
+            with stopwatch(latencies):
+                self.client.send(*request)
+
+        return {
+            "endpoint": name,
+            "method": method,
+            "path": path,
+            "status": response.status_code,
+            "queries": len(queries),
+            "latency": summarize(latencies),
+            "plans": self.plans(queries),
+        }
+
+    def plans(self, queries):
+        plans = []
+        seen = set()
+        for query in queries:
+            sql = query["sql"]
+            if sql in seen or not sql.lstrip().upper().startswith(("SELECT", "WITH")):
+                continue
+            seen.add(sql)
+            plan = explain(sql)
+            plans.append({"sql": sql, "plan": plan, "full_scans": full_scans(plan)})
+        return plans
@@ -0,0 +1,311 @@
+"""
+Throughput and latency of every endpoint in ``core/urls.py`` under
+concurrent load, saved as JSON so runs from different commits can be
+compared.
+
+For each catalog size (``--recipes``, seeded by ``seed_catalog`` into a
+fresh database) and each ``--concurrency`` level, every endpoint gets
+``--requests`` requests spread over that many client threads, after one
+untimed warm-up request. Requests go through the whole Django stack in
+process (middleware, views, database) without an HTTP server, so the
+figures are those of a single worker process. The AI match endpoints answer
+from the offline LLM stand-in, which takes ``--llm-latency`` seconds per
+call.
+
+``--output`` writes the results; ``--compare`` reads an earlier file and
+fails when an endpoint's p95 latency or throughput got worse by more than
+``--tolerance``, so the command can gate a CI job:
+
+    python manage.py bench_load --recipes 1000 10000 --concurrency 1 8 \\
+        --output bench-main.json
+    python manage.py bench_load --recipes 1000 10000 --concurrency 1 8 \\
+        --compare bench-main.json
+"""
+import json
+import platform
+import subprocess
+import threading
+import time
+from collections import Counter
+from itertools import count
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.test import override_settings
+from django.utils import timezone
+
+from core import urls
+from core.benchmarking import (
+    ApiWorkload,
+    BenchClient,
+    local_backend,
+    quiet_request_log,
+    seed_catalog,
+    summarize,
+    temporary_database,
+)
+
+LOCMEM_CACHES = {
+    "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"},
+    "ai_match": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "bench-load",
+    },
+    "recipe_pages": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "bench-load-pages",
+    },
+}
+# Streaming the whole catalog takes seconds and password hashing about half a
+# second per request; a few requests are enough
+MAX_REQUESTS = {"recipe-export": 3, "user-register": 10, "user-login": 10}
+# p95 changes smaller than this are noise whatever the ratio
+MIN_DELTA_MS = 0.5
+
+
+class Command(BaseCommand):
+    help = "Throughput and latency percentiles of every endpoint under load"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--recipes", type=int, nargs="+", default=[1000, 10000], dest="sizes"
+        )
+        parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8])
+        parser.add_argument(
+            "--requests", type=int, default=200, help="Requests per endpoint"
+        )
+        parser.add_argument(
+            "--endpoint",
+            action="append",
+            dest="endpoints",
+            help="URL name to load (repeatable); all endpoints by default",
+        )
+        parser.add_argument("--llm-latency", type=float, default=0.0)
+        parser.add_argument(
+            "--page-cache",
+            action="store_true",
+            help="Serve detail and feed pages from the page cache",
+        )
+        parser.add_argument("--output", help="Write the results to this JSON file")
+        parser.add_argument("--compare", help="Results file of an earlier run")
+        parser.add_argument(
+            "--tolerance",
+            type=float,
+            default=0.2,
+            help="Allowed relative regression before --compare fails (0.2)",
+        )
+        parser.add_argument("--json", action="store_true", help="Print JSON only")
+
+    def handle(self, *args, **options):
+        baseline = None
+        if options["compare"]:
+            with open(options["compare"]) as handle:
+                baseline = json.load(handle)
+
+        results = {
+            "commit": git_commit(),
+            "created_at": timezone.now().isoformat(),
+            "database": connection.vendor,
+            "python": platform.python_version(),
+            "django": django.get_version(),
+            "requests": options["requests"],
+            "llm_latency": options["llm_latency"],
+            "page_cache": options["page_cache"],
+            "runs": [],
+            "skipped": [],
+        }
+        for size in options["sizes"]:
+            results["runs"].extend(self.load_catalog(size, options, results))
+
+        if options["output"]:
+            with open(options["output"], "w") as handle:
+                json.dump(results, handle, indent=2)
+        regressions = []
+        if baseline is not None:
+            regressions = compare(baseline, results, options["tolerance"])
+
+        if options["json"]:
+            self.stdout.write(json.dumps(results, indent=2))
+        else:
+            self.report(results)
+            if baseline is not None:
+                self.report_comparison(baseline, regressions, options["tolerance"])
+        if regressions:
+            raise CommandError(
+                f"{len(regressions)} regression(s) against {options['compare']}"
+            )
+
+    # -------------------------------------------------
+    # Load
+    # -------------------------------------------------
+    def load_catalog(self, size, options, results):
+        page_cache = {"TTL": 300 if options["page_cache"] else 0}
+        runs = []
+        with temporary_database(), quiet_request_log(), override_settings(
+            CACHES=LOCMEM_CACHES,
+            ALLOWED_HOSTS=["testserver"],
+            AI_MATCH_BACKEND=local_backend(options["llm_latency"]),
+            RECIPE_PAGE_CACHE=page_cache,
+        ):
+            workload = ApiWorkload(seed_catalog(size))
+            wanted = options["endpoints"]
+            for pattern in urls.urlpatterns:
+                name = pattern.name
+                if wanted and name not in wanted:
+                    continue
+                build = workload.build(name)
+                if build is None:
+                    if name not in results["skipped"]:
+                        results["skipped"].append(name)
+                    continue
+                BenchClient().send(*build())
+                total = MAX_REQUESTS.get(name, options["requests"])
+                total = min(total, options["requests"])
+                for concurrency in options["concurrency"]:
+                    run = self.load(build, total, min(concurrency, total))
+                    runs.append({"recipes": size, "endpoint": name, **run})
+        return runs
+
+    def load(self, build, total, concurrency):
+        """``total`` requests from ``build`` over ``concurrency`` threads"""
+        tickets = count()
+        latencies = [[] for _ in range(concurrency)]
+        statuses = [Counter() for _ in range(concurrency)]
+
+        def worker(index):
+            client = BenchClient()
+            try:
+                while next(tickets) < total:
+                    # Request bodies (tokens, unique names) are built untimed
+                    request = build()
+                    start = time.perf_counter()
+                    try:
+                        status = client.send(*request).status_code
+                    except Exception as exc:
+                        status = type(exc).__name__
+                    latencies[index].append((time.perf_counter() - start) * 1000)
+                    statuses[index][str(status)] += 1
+            finally:
+                # Open connections would keep the test database from being dropped
+                connections.close_all()
+
+        threads = [
+            threading.Thread(target=worker, args=(index,))
+            for index in range(concurrency)
+        ]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+
+        merged = [value for values in latencies for value in values]
+        status_counts = sum(statuses, Counter())
+        return {
+            "concurrency": concurrency,
+            "requests": len(merged),
+            "errors": sum(
+                number
+                for status, number in status_counts.items()
+                if not status.isdigit() or int(status) >= 400
+            ),
+            "statuses": dict(sorted(status_counts.items())),
+            "throughput_rps": round(len(merged) / elapsed, 1),
+            "latency": summarize(merged),
+        }
+
+    # -------------------------------------------------
+    # Reports
+    # -------------------------------------------------
+    def report(self, results):
+        self.stdout.write(
+            f"{results['database']}, commit {results['commit'] or 'unknown'}\n\n"
+            f"{'recipes':>8} {'conc':>5} {'endpoint':<24} {'reqs':>6} {'errors':>7} "
+            f"{'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}"
+        )
+        for run in results["runs"]:
+            latency = run["latency"]
+            self.stdout.write(
+                f"{run['recipes']:>8} {run['concurrency']:>5} {run['endpoint']:<24} "
+                f"{run['requests']:>6} {run['errors']:>7} "
+                f"{run['throughput_rps']:>9.1f} {latency['p50_ms']:>9.2f} "
+                f"{latency['p95_ms']:>9.2f} {latency['p99_ms']:>9.2f}"
+            )
+        if results["skipped"]:
+            self.stdout.write(f"\nNo request defined for: {results['skipped']}")
+
+    def report_comparison(self, baseline, regressions, tolerance):
+        self.stdout.write(
+            f"\nAgainst commit {baseline.get('commit') or 'unknown'} "
+            f"(tolerance {tolerance:.0%}): {len(regressions) or 'no'} regression(s)"
+        )
+        for regression in regressions:
+            self.stdout.write(
+                "  {recipes} recipes, concurrency {concurrency}, {endpoint}: "
+                "{metric} {before} -> {after}".format(**regression)
+            )
+
+
+def git_commit():
+    """Short hash of the checked out commit, ``None`` outside a git checkout"""
+    try:
+        result = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=settings.BASE_DIR,
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return result.stdout.strip()
+
+
+def compare(baseline, results, tolerance):
+    """
+    Runs of ``results`` slower or with less throughput than the same run
+    (catalog size, concurrency, endpoint) of ``baseline`` beyond
+    ``tolerance``, or with new errors
+    """
+    before = {
+        (run["recipes"], run["concurrency"], run["endpoint"]): run
+        for run in baseline["runs"]
+    }
+    regressions = []
+    for run in results["runs"]:
+        key = (run["recipes"], run["concurrency"], run["endpoint"])
+        old = before.get(key)
+        if old is None:
+            continue
+        checks = [
+            (
+                "p95_ms",
+                old["latency"]["p95_ms"],
+                run["latency"]["p95_ms"],
+                run["latency"]["p95_ms"] > old["latency"]["p95_ms"] * (1 + tolerance)
+                and run["latency"]["p95_ms"] - old["latency"]["p95_ms"] > MIN_DELTA_MS,
+            ),
+            (
+                "throughput_rps",
+                old["throughput_rps"],
+                run["throughput_rps"],
+                run["throughput_rps"] < old["throughput_rps"] * (1 - tolerance),
+            ),
+            ("errors", old["errors"], run["errors"], run["errors"] > old["errors"]),
+        ]
+        for metric, old_value, new_value, worse in checks:
+            if worse:
+                regressions.append(
+                    {
+                        "recipes": key[0],
+                        "concurrency": key[1],
+                        "endpoint": key[2],
+                        "metric": metric,
+                        "before": old_value,
+                        "after": new_value,
+                    }
+                )
+    return regressions
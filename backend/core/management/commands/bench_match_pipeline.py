@@ -0,0 +1,134 @@
+"""
+Throughput benchmark of the full AI match pipeline with the offline LLM
+stand-in, so it runs on CI machines without network access.
+
+Reports per-stage latency (retrieval, prompt build, LLM, parse, serialize)
+and end-to-end requests/second through the HTTP endpoint.
+
+    python manage.py bench_match_pipeline --recipes 5000 --requests 200
+"""
+import json
+import time
+
+from django.core.management.base import BaseCommand
+from django.test import Client, override_settings
+from django.urls import reverse
+
+from core.benchmarking import (
+    local_backend,
+    sample_pantries,
+    seed_catalog,
+    stopwatch,
+    summarize,
+    temporary_database,
+)
+from core.ingredient_index import ingredient_index
+from core.match_backends import get_match_backend
+from core.match_cache import match_cache
+from core.matching import (
+    build_match_prompt,
+    match_payload,
+    parse_user_ingredients,
+    resolve_match,
+    select_candidate_recipes,
+)
+
+STAGES = ["retrieval", "prompt", "llm", "parse", "serialize"]
+
+LOCMEM_CACHES = {
+    "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"},
+    "ai_match": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "bench-match-pipeline",
+    },
+    "recipe_pages": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "bench-match-pipeline-pages",
+    },
+}
+
+
+class Command(BaseCommand):
+    help = "Benchmark the AI match pipeline end to end with a local LLM stand-in"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--recipes", type=int, default=2000)
+        parser.add_argument("--requests", type=int, default=100)
+        parser.add_argument("--llm-latency", type=float, default=0.0)
+        parser.add_argument("--json", action="store_true", help="Print JSON only")
+
+    def handle(self, *args, **options):
+        with temporary_database(), override_settings(
+            CACHES=LOCMEM_CACHES,
+            ALLOWED_HOSTS=["testserver"],
+            AI_MATCH_BACKEND=local_backend(options["llm_latency"]),
+        ):
+            names = seed_catalog(options["recipes"])
+            ingredient_index.ensure_built()
+            # Plural forms miss the exact-match pass but still retrieve well,
+            # so every request exercises the LLM path
+            pantries = [
+                ", ".join(f"{name}s" for name in pantry.split(", "))
+                for pantry in sample_pantries(names, options["requests"])
+            ]
+            results = {
+                "recipes": options["recipes"],
+                "requests": options["requests"],
+                "stages": self.measure_stages(pantries),
+                "end_to_end": self.measure_http(pantries),
+            }
+
+        if options["json"]:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+
+        self.stdout.write(f"{'stage':>10} {'p50 ms':>9} {'p95 ms':>9}")
+        for stage in STAGES:
+            row = results["stages"][stage]
+            self.stdout.write(
+                f"{stage:>10} {row['p50_ms']:>9.3f} {row['p95_ms']:>9.3f}"
+            )
+        e2e = results["end_to_end"]
+        self.stdout.write(
+            f"\nHTTP: {e2e['requests_per_second']:.1f} req/s, "
+            f"p50 {e2e['latency']['p50_ms']:.2f} ms, "
+            f"p95 {e2e['latency']['p95_ms']:.2f} ms"
+        )
+
+    def measure_stages(self, pantries):
+        backend = get_match_backend()
+        timings = {stage: [] for stage in STAGES}
+        for pantry in pantries:
+            user_ingredients = parse_user_ingredients(pantry)
+            with stopwatch(timings["retrieval"]):
+                candidates = select_candidate_recipes(user_ingredients)
+            with stopwatch(timings["prompt"]):
+                prompt = build_match_prompt(pantry, candidates)
+            with stopwatch(timings["llm"]):
+                response_text = backend.generate(prompt)
+            with stopwatch(timings["parse"]):
+                recipe, justification = resolve_match(
+                    response_text, candidates, pantry
+                )
+            with stopwatch(timings["serialize"]):
+                json.dumps(match_payload(recipe, justification))
+        return {stage: summarize(values) for stage, values in timings.items()}
+
+    def measure_http(self, pantries):
+        client = Client()
+        url = reverse("ai-recipe-match")
+        latencies = []
+        start = time.perf_counter()
+        for pantry in pantries:
+            match_cache.clear()
+            with stopwatch(latencies):
+                response = client.post(
+                    url, {"ingredients": pantry}, content_type="application/json"
+                )
+            if response.status_code != 200:
+                self.stderr.write(f"{response.status_code}: {response.content!r}")
+        elapsed = time.perf_counter() - start
+        return {
+            "requests_per_second": round(len(pantries) / elapsed, 2),
+            "latency": summarize(latencies),
+        }
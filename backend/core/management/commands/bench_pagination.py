@@ -0,0 +1,107 @@
+"""
+Latency of shallow vs deep pages of the landing feed, with page-number and
+cursor (keyset) pagination.
+
+Cursor pages are reached by following ``next`` links, the way an infinite
+scroll does; only the requests for the measured pages are timed. Besides the
+full HTTP round trip, ``paginate`` times ``RecipePagination`` alone (count,
+offset or keyset queries) without serialization.
+
+    python manage.py bench_pagination --recipes 20000 --deep-page 1000
+"""
+import json
+
+from django.core.management.base import BaseCommand
+from django.db import connection, reset_queries
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from core.benchmarking import seed_catalog, stopwatch, summarize, temporary_database
+from core.models import Recipe
+from core.pagination import RecipePagination
+
+
+class Command(BaseCommand):
+    help = "Compare page 1 vs deep page latency for page-number and cursor modes"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--recipes", type=int, default=20000)
+        parser.add_argument("--page-size", type=int, default=10)
+        parser.add_argument("--deep-page", type=int, default=1000)
+        parser.add_argument("--repeat", type=int, default=30)
+        parser.add_argument("--json", action="store_true", help="Print JSON only")
+
+    def handle(self, *args, **options):
+        pages_needed = options["deep_page"] * options["page_size"]
+        recipes = max(options["recipes"], pages_needed)
+        with temporary_database(), override_settings(ALLOWED_HOSTS=["testserver"]):
+            seed_catalog(recipes, steps_per_recipe=(1, 1))
+            self.client = Client()
+            self.url = reverse("recipe-list-landing")
+            results = {
+                "recipes": recipes,
+                "page_size": options["page_size"],
+                "modes": self.measure(options),
+            }
+
+        if options["json"]:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+
+        self.stdout.write(
+            f"{'mode':>7} {'page':>6} {'queries':>8} {'paginate p50':>13} "
+            f"{'http p50 ms':>12} {'http p95 ms':>12}"
+        )
+        for row in results["modes"]:
+            self.stdout.write(
+                f"{row['mode']:>7} {row['page']:>6} {row['queries']:>8} "
+                f"{row['paginate']['p50_ms']:>13.3f} "
+                f"{row['latency']['p50_ms']:>12.2f} {row['latency']['p95_ms']:>12.2f}"
+            )
+
+    def measure(self, options):
+        size = options["page_size"]
+        deep = options["deep_page"]
+        rows = []
+        for page in (1, deep):
+            rows.append(
+                self.time_url(
+                    "page", page, f"{self.url}?page={page}&page_size={size}", options
+                )
+            )
+
+        url = f"{self.url}?pagination=cursor&page_size={size}"
+        rows.append(self.time_url("cursor", 1, url, options))
+        for _ in range(deep - 1):
+            url = self.client.get(url).json()["next"]
+        rows.append(self.time_url("cursor", deep, url, options))
+        return rows
+
+    def time_url(self, mode, page, url, options):
+        # The query log is a bounded deque, already full after seeding
+        reset_queries()
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(url)
+        latencies = []
+        for _ in range(options["repeat"]):
+            with stopwatch(latencies):
+                response = self.client.get(url)
+        if response.status_code != 200:
+            self.stderr.write(f"{url}: {response.status_code}")
+
+        request = Request(APIRequestFactory().get(url))
+        queryset = Recipe.objects.order_by("-created_at", "-id")
+        paginate = []
+        for _ in range(options["repeat"]):
+            with stopwatch(paginate):
+                RecipePagination().paginate_queryset(queryset, request)
+        return {
+            "mode": mode,
+            "page": page,
+            "queries": len(queries.captured_queries),
+            "paginate": summarize(paginate),
+            "latency": summarize(latencies),
+        }
@@ -0,0 +1,139 @@
+"""
+Latency of ``core.ranking`` against a pure-Python scorer computing the same
+metrics recipe by recipe.
+
+The catalog is synthetic and held in memory only (the ranker is fed a static
+snapshot instead of the ingredient index), so large sizes cost no database
+seeding. Both rankers must return the same recipes in the same order for
+every pantry before anything is timed.
+
+    python manage.py bench_ranking --recipes 10000 100000 --pantry-size 3 8
+"""
+import json
+import random
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.benchmarking import ingredient_vocabulary, stopwatch, summarize
+from core.ingredient_index import normalize_ingredient_name
+from core.ranking import IngredientMatrix, RecipeRanker, sort_keys
+
+
+class StaticSource:
+    """``IngredientIndex.snapshot`` of a fixed catalog"""
+
+    def __init__(self, recipes):
+        self.recipes = recipes
+
+    def snapshot(self, since=None):
+        if since is None:
+            return (1, 0), True, self.recipes
+        return (1, 0), False, {}
+
+
+def synthetic_catalog(size, vocabulary, ingredients_per_recipe=(4, 12), seed=0):
+    """``{recipe_id: {normalized: display}}`` like ``seed_catalog``'s"""
+    rng = random.Random(seed)
+    names = ingredient_vocabulary(vocabulary)
+    return {
+        recipe_id: {
+            normalize_ingredient_name(name): name
+            for name in rng.sample(names, rng.randint(*ingredients_per_recipe))
+        }
+        for recipe_id in range(1, size + 1)
+    }
+
+
+def python_rank(recipes, matrix, pantry, limit, order="coverage"):
+    """The ranker's ordering, computed with sets over every recipe"""
+    pantry = list(dict.fromkeys(map(normalize_ingredient_name, pantry)))
+    pantry_names = [
+        {normalized for normalized, column in matrix.columns.items() if column in cols}
+        for cols in (matrix.columns_for(item) for item in pantry)
+    ]
+    wanted = set().union(*pantry_names)
+    idf = {name: matrix.idf[column] for name, column in matrix.columns.items()}
+    scored = []
+    for recipe_id, ingredients in recipes.items():
+        used = [name for name in ingredients if name in wanted]
+        if not used:
+            continue
+        items_hit = sum(1 for names in pantry_names if names & ingredients.keys())
+        coverage = sum(idf[name] for name in used) / sum(idf[n] for n in ingredients)
+        missing = len(ingredients) - len(used)
+        jaccard = len(used) / (len(ingredients) + len(pantry) - items_hit)
+        primary, secondary = sort_keys(order, coverage, missing, jaccard)
+        scored.append((primary, secondary, -recipe_id))
+    scored.sort()
+    return [-key[2] for key in scored[:limit]]
+
+
+class Command(BaseCommand):
+    help = "Compare matrix and pure-Python ranking latency per pantry"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--recipes", type=int, nargs="+", default=[10000, 100000], dest="sizes"
+        )
+        parser.add_argument("--vocabulary", type=int, default=600)
+        parser.add_argument(
+            "--pantry-size", type=int, nargs="+", default=[3, 8], dest="pantry_sizes"
+        )
+        parser.add_argument("--limit", type=int, default=10)
+        parser.add_argument("--repeat", type=int, default=20)
+        parser.add_argument("--json", action="store_true", help="Print JSON only")
+
+    def handle(self, *args, **options):
+        names = ingredient_vocabulary(options["vocabulary"])
+        results = {"vocabulary": options["vocabulary"], "runs": []}
+        for size in options["sizes"]:
+            recipes = synthetic_catalog(size, options["vocabulary"])
+            build = []
+            with stopwatch(build):
+                ranker = RecipeRanker(source=StaticSource(recipes))
+                ranker.rank(names[:1], limit=1)
+            matrix = IngredientMatrix(recipes)
+            for pantry_size in options["pantry_sizes"]:
+                rng = random.Random(pantry_size)
+                pantries = [
+                    rng.sample(names, pantry_size) for _ in range(options["repeat"])
+                ]
+                run = self.measure(ranker, recipes, matrix, pantries, options)
+                results["runs"].append(
+                    {
+                        "recipes": size,
+                        "pantry_size": pantry_size,
+                        "build_ms": round(build[0], 1),
+                        **run,
+                    }
+                )
+
+        if options["json"]:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+        self.stdout.write(
+            f"{'recipes':>8} {'pantry':>7} {'build ms':>9} {'matrix p50':>11} "
+            f"{'matrix p95':>11} {'python p50':>11} {'speedup':>8}"
+        )
+        for run in results["runs"]:
+            fast, slow = run["matrix"], run["python"]
+            self.stdout.write(
+                f"{run['recipes']:>8} {run['pantry_size']:>7} {run['build_ms']:>9.1f} "
+                f"{fast['p50_ms']:>11.3f} {fast['p95_ms']:>11.3f} "
+                f"{slow['p50_ms']:>11.3f} {slow['p50_ms'] / fast['p50_ms']:>7.1f}x"
+            )
+
+    def measure(self, ranker, recipes, matrix, pantries, options):
+        limit = options["limit"]
+        for pantry in pantries:
+            ranked = [match.recipe_id for match in ranker.rank(pantry, limit=limit)]
+            if ranked != python_rank(recipes, matrix, pantry, limit):
+                raise CommandError(f"Rankings differ for pantry {pantry}")
+
+        timings = {"matrix": [], "python": []}
+        for pantry in pantries:
+            with stopwatch(timings["matrix"]):
+                ranker.rank(pantry, limit=limit)
+            with stopwatch(timings["python"]):
+                python_rank(recipes, matrix, pantry, limit)
+        return {path: summarize(values) for path, values in timings.items()}
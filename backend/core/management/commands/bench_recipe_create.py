@@ -0,0 +1,117 @@
+"""
+Query count and wall time of creating one recipe through
+``RecipeCreateSerializer``, against the previous row-by-row implementation
+(kept below as a reference) on the same database.
+
+    python manage.py bench_recipe_create --ingredients 20 --steps 15
+"""
+import json
+
+from django.core.management.base import BaseCommand
+from django.db import connection, reset_queries
+from django.test.utils import CaptureQueriesContext
+
+from core.benchmarking import seed_catalog, stopwatch, summarize, temporary_database
+from core.models import Category, Ingredient, Instruction, Recipe, RecipeIngredient
+from core.serializers import RecipeCreateSerializer
+
+
+def create_row_by_row(validated_data):
+    """The original ``RecipeCreateSerializer.create``: one query per row"""
+    category_name = validated_data.pop("category", None)
+    ingredients_data = validated_data.pop("ingredients", [])
+    instructions_data = validated_data.pop("instructions", [])
+
+    category = None
+    if category_name:
+        category, _ = Category.objects.get_or_create(
+            name__iexact=category_name, defaults={"name": category_name}
+        )
+    validated_data.pop("skill_level_id", None)
+    recipe = Recipe.objects.create(category=category, **validated_data)
+
+    for item in ingredients_data:
+        name = item.get("name")
+        if not name:
+            continue
+        ingredient, _ = Ingredient.objects.get_or_create(
+            name__iexact=name, defaults={"name": name}
+        )
+        RecipeIngredient.objects.create(
+            recipe=recipe, ingredient=ingredient, quantity=item.get("quantity") or ""
+        )
+    for step in instructions_data:
+        Instruction.objects.create(
+            recipe=recipe,
+            step_number=step.get("step_number"),
+            content=step.get("content", ""),
+        )
+    return recipe
+
+
+class Command(BaseCommand):
+    help = "Compare row-by-row and bulk recipe creation (queries and latency)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--recipes", type=int, default=2000)
+        parser.add_argument("--ingredients", type=int, default=20)
+        parser.add_argument("--steps", type=int, default=15)
+        parser.add_argument("--repeat", type=int, default=30)
+        parser.add_argument("--json", action="store_true", help="Print JSON only")
+
+    def handle(self, *args, **options):
+        with temporary_database():
+            names = seed_catalog(options["recipes"])
+            results = [
+                self.measure(mode, names, options) for mode in ("row_by_row", "bulk")
+            ]
+
+        if options["json"]:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+
+        self.stdout.write(f"{'mode':>11} {'queries':>8} {'p50 ms':>9} {'p95 ms':>9}")
+        for row in results:
+            self.stdout.write(
+                f"{row['mode']:>11} {row['queries']:>8} "
+                f"{row['latency']['p50_ms']:>9.2f} {row['latency']['p95_ms']:>9.2f}"
+            )
+
+    def payload(self, names, options, run, label):
+        # Half known ingredients, half new ones, like a typical submission
+        ingredients = [
+            {"name": names[(run * 7 + i) % len(names)].title(), "quantity": "1 cup"}
+            for i in range(options["ingredients"] // 2)
+        ] + [
+            {"name": f"new ingredient {label} {run} {i}", "quantity": "2 tbsp"}
+            for i in range(options["ingredients"] - options["ingredients"] // 2)
+        ]
+        return {
+            "title": f"Benchmark stew {label} {run}",
+            "description": "Slow cooked",
+            "preparation_duration": 90,
+            "category": "Italian",
+            "ingredients": ingredients,
+            "instructions": [
+                {"step_number": i + 1, "content": f"Step {i + 1}: stir"}
+                for i in range(options["steps"])
+            ],
+        }
+
+    def measure(self, mode, names, options):
+        latencies = []
+        queries = 0
+        for run in range(options["repeat"]):
+            serializer = RecipeCreateSerializer(
+                data=self.payload(names, options, run, mode)
+            )
+            serializer.is_valid(raise_exception=True)
+            reset_queries()
+            with CaptureQueriesContext(connection) as captured:
+                with stopwatch(latencies):
+                    if mode == "bulk":
+                        serializer.save()
+                    else:
+                        create_row_by_row(dict(serializer.validated_data))
+            queries = len(captured.captured_queries)
+        return {"mode": mode, "queries": queries, "latency": summarize(latencies)}
@@ -0,0 +1,133 @@
+"""
+Per-page cost of the DRF serializers vs the row-based fast path
+(``core.payloads`` + ``core.renderers.FastJSONRenderer``).
+
+Feed pages and detail pages are built both ways from the same recipes and
+timed in three stages: fetching (model instances vs ``.values()`` rows),
+building the payload and rendering it to JSON. Every page is checked to
+produce the same bytes both ways before anything is timed.
+
+    python manage.py bench_serialization --recipes 5000 --page-size 10 100
+"""
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.renderers import JSONRenderer
+
+from core.benchmarking import seed_catalog, stopwatch, summarize, temporary_database
+from core.models import Recipe
+from core.payloads import (
+    LIST_COLUMNS,
+    datetime_zone,
+    detail_payloads,
+    detail_rows,
+    list_payload,
+)
+from core.renderers import FastJSONRenderer
+from core.serializers import RecipeDetailSerializer, RecipeListSerializer
+
+STAGES = ["fetch", "build", "render"]
+
+
+class Command(BaseCommand):
+    help = "Compare serializer and fast-path time per feed and detail page"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--recipes", type=int, default=5000)
+        parser.add_argument(
+            "--page-size", type=int, nargs="+", default=[10, 100], dest="page_sizes"
+        )
+        parser.add_argument("--repeat", type=int, default=50)
+        parser.add_argument("--json", action="store_true", help="Print JSON only")
+
+    def handle(self, *args, **options):
+        with temporary_database():
+            seed_catalog(options["recipes"])
+            recipes = Recipe.objects.order_by("-created_at", "-id")
+            results = {"recipes": options["recipes"], "pages": []}
+            for size in options["page_sizes"]:
+                results["pages"].append(
+                    self.measure("feed", size, self.feed_page(recipes, size), options)
+                )
+            detail_id = recipes.values_list("id", flat=True).first()
+            results["pages"].append(
+                self.measure("detail", 1, self.detail_page(detail_id), options)
+            )
+
+        if options["json"]:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+
+        self.stdout.write(
+            f"{'page':<7} {'size':>5} {'path':<11} "
+            + " ".join(f"{stage + ' p50':>11}" for stage in STAGES)
+            + f" {'total p50':>10} {'speedup':>8}"
+        )
+        for page in results["pages"]:
+            baseline = page["paths"]["serializer"]["total"]["p50_ms"]
+            for path, stages in page["paths"].items():
+                total = stages["total"]["p50_ms"]
+                self.stdout.write(
+                    f"{page['page']:<7} {page['size']:>5} {path:<11} "
+                    + " ".join(f"{stages[stage]['p50_ms']:>11.3f}" for stage in STAGES)
+                    + f" {total:>10.3f} {baseline / total:>7.1f}x"
+                )
+
+    # -------------------------------------------------
+    # Pages, as (fetch, build, render) callables per path
+    # -------------------------------------------------
+    def feed_page(self, recipes, size):
+        return {
+            "serializer": (
+                lambda: list(recipes.for_list()[:size]),
+                lambda rows: RecipeListSerializer(rows, many=True).data,
+                JSONRenderer().render,
+            ),
+            "fast": (
+                lambda: list(recipes.values(*LIST_COLUMNS)[:size]),
+                lambda rows: [list_payload(row, datetime_zone()) for row in rows],
+                FastJSONRenderer().render,
+            ),
+        }
+
+    def detail_page(self, recipe_id):
+        return {
+            "serializer": (
+                lambda: Recipe.objects.for_detail().get(id=recipe_id),
+                lambda recipe: RecipeDetailSerializer(recipe).data,
+                JSONRenderer().render,
+            ),
+            "fast": (
+                lambda: detail_rows([recipe_id]),
+                lambda rows: detail_payloads(rows=rows)[recipe_id],
+                FastJSONRenderer().render,
+            ),
+        }
+
+    # -------------------------------------------------
+    # Measurement
+    # -------------------------------------------------
+    def measure(self, name, size, paths, options):
+        rendered = {path: self.run(*stages) for path, stages in paths.items()}
+        if len(set(rendered.values())) != 1:
+            raise CommandError(f"{name} page of {size}: the paths render differently")
+
+        results = {}
+        for path, (fetch, build, render) in paths.items():
+            timings = {stage: [] for stage in STAGES + ["total"]}
+            for _ in range(options["repeat"]):
+                with stopwatch(timings["total"]):
+                    with stopwatch(timings["fetch"]):
+                        rows = fetch()
+                    with stopwatch(timings["build"]):
+                        data = build(rows)
+                    with stopwatch(timings["render"]):
+                        render(data)
+            results[path] = {
+                stage: summarize(values) for stage, values in timings.items()
+            }
+        return {"page": name, "size": size, "paths": results}
+
+    @staticmethod
+    def run(fetch, build, render):
+        return render(build(fetch()))
@@ -0,0 +1,71 @@
+"""
+Diagnose Google Gemini API configuration.
+
+Uses the same resolver as the AI match endpoint, so a model that works here
+is the model the endpoint will use.
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+import google.generativeai as genai
+
+from core.gemini import (
+    PROBE_PROMPT,
+    TROUBLESHOOTING,
+    GeminiError,
+    GeminiModelResolver,
+    get_api_key,
+)
+
+
+class Command(BaseCommand):
+    help = "Check the Gemini API key and resolve the model used for AI matching"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--list",
+            action="store_true",
+            help="List every model that supports generateContent",
+        )
+        parser.add_argument(
+            "--no-probe",
+            action="store_true",
+            help="Resolve the model without sending a test prompt",
+        )
+
+    def handle(self, *args, **options):
+        api_key = get_api_key()
+        if api_key is None:
+            raise CommandError(
+                "GOOGLE_AI_API_KEY not found in environment or .env file. "
+                "Please add: GOOGLE_AI_API_KEY=your_actual_key"
+            )
+        self.stdout.write(f"API key found: {api_key[:10]}...{api_key[-4:]}")
+
+        # Fresh resolver without backoff: this is a one-shot diagnostic
+        resolver = GeminiModelResolver(backoff_base=0, backoff_max=0)
+
+        if options["list"]:
+            try:
+                genai.configure(api_key=api_key)
+                names = resolver.list_generation_models()
+            except Exception as exc:
+                self.stderr.write(f"Failed to list models: {exc}")
+            else:
+                self.stdout.write(f"Found {len(names)} generateContent models:")
+                for name in names:
+                    self.stdout.write(f"  - {name}")
+
+        try:
+            model = resolver.get_model()
+        except GeminiError as exc:
+            raise CommandError(str(exc))
+        self.stdout.write(f"Resolved model: {resolver.model_name}")
+
+        if options["no_probe"]:
+            return
+
+        try:
+            response = model.generate_content(PROBE_PROMPT)
+        except Exception as exc:
+            raise CommandError(f"Model call failed: {exc}{TROUBLESHOOTING}")
+        self.stdout.write(self.style.SUCCESS(f"Response: {response.text.strip()}"))
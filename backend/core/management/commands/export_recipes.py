@@ -0,0 +1,39 @@
+"""
+Export the whole recipe catalog as NDJSON (one RecipeDetail record per line),
+in constant memory. The output can be re-imported with ``import_recipes``.
+
+    python manage.py export_recipes recipes.ndjson
+    python manage.py export_recipes - | gzip > recipes.ndjson.gz
+"""
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.recipe_export import export_recipes
+
+
+class Command(BaseCommand):
+    help = "Stream the recipe catalog to a file (or stdout) as NDJSON"
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", nargs="?", default="-", help="Output file, or -")
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=getattr(settings, "RECIPE_EXPORT_CHUNK_SIZE", 500),
+        )
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        output = sys.stdout if path == "-" else open(path, "w", encoding="utf-8")
+        records = 0
+        try:
+            for block in export_recipes(chunk_size=options["chunk_size"]):
+                output.write(block)
+                records += block.count("\n")
+        finally:
+            if output is not sys.stdout:
+                output.close()
+        if path != "-":
+            self.stdout.write(self.style.SUCCESS(f"Exported {records} recipes"))
@@ -0,0 +1,100 @@
+"""
+Bulk-import recipes from a JSON Lines or CSV file (``-`` reads stdin).
+
+    python manage.py import_recipes recipes.jsonl --chunk-size 1000
+    python manage.py import_recipes recipes.csv --author alice --errors bad.jsonl
+
+See ``core.recipe_import`` for the row formats.
+"""
+import json
+import sys
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from core.recipe_import import FORMATS, ImportFormatError, RecipeImporter, read_rows
+
+
+class Command(BaseCommand):
+    help = "Import recipes in chunks from a JSON Lines or CSV file"
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="Input file, or - for stdin")
+        parser.add_argument(
+            "--format", choices=FORMATS, help="Defaults to the file extension"
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=getattr(settings, "RECIPE_IMPORT_CHUNK_SIZE", 500),
+        )
+        parser.add_argument("--author", help="Username the recipes are credited to")
+        parser.add_argument(
+            "--errors", help="Write the per-line error report here (JSON Lines)"
+        )
+        parser.add_argument("--json", action="store_true", help="Print JSON only")
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        fmt = options["format"] or ("csv" if path.endswith(".csv") else "jsonl")
+
+        author = None
+        if options["author"]:
+            try:
+                author = User.objects.get(username=options["author"])
+            except User.DoesNotExist:
+                raise CommandError(f"No user named {options['author']!r}")
+
+        importer = RecipeImporter(
+            author=author,
+            chunk_size=options["chunk_size"],
+            on_chunk=None if options["json"] else self.print_chunk,
+            max_errors=sys.maxsize,
+        )
+        if path == "-":
+            stream = sys.stdin
+        else:
+            try:
+                stream = open(path, encoding="utf-8", newline="")
+            except OSError as exc:
+                raise CommandError(str(exc))
+        try:
+            report = importer.run(read_rows(stream, fmt))
+        except ImportFormatError as exc:
+            raise CommandError(str(exc))
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+
+        if options["errors"]:
+            with open(options["errors"], "w", encoding="utf-8") as handle:
+                for error in report.errors:
+                    handle.write(json.dumps(error) + "\n")
+
+        summary = report.as_dict()
+        if options["json"]:
+            self.stdout.write(json.dumps(summary, indent=2))
+            return
+
+        if not options["errors"]:
+            for error in report.errors[:20]:
+                self.stderr.write(
+                    f"line {error['line']}: {json.dumps(error['errors'])}"
+                )
+            if len(report.errors) > 20:
+                self.stderr.write(
+                    f"... {len(report.errors) - 20} more, use --errors for all"
+                )
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Imported {summary['created']} recipes, {summary['failed']} failed, "
+                f"in {summary['seconds']:.2f}s ({summary['rows_per_second']} rows/s)"
+            )
+        )
+
+    def print_chunk(self, chunk):
+        self.stdout.write(
+            f"chunk {chunk.chunk}: {chunk.created}/{chunk.rows} created, "
+            f"{chunk.rows_per_second} rows/s"
+        )
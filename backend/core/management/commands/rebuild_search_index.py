@@ -0,0 +1,20 @@
+"""
+Rebuild the full-text recipe search index from scratch, e.g. after a bulk
+import or ``loaddata`` (neither sends the signals that keep it up to date).
+
+    python manage.py rebuild_search_index
+"""
+from django.core.management.base import BaseCommand
+
+from core.search import get_search_backend
+
+
+class Command(BaseCommand):
+    help = "Rebuild the full-text recipe search index"
+
+    def handle(self, *args, **options):
+        backend = get_search_backend()
+        backend.rebuild()
+        self.stdout.write(
+            self.style.SUCCESS(f"Rebuilt the {backend.name} recipe search index")
+        )
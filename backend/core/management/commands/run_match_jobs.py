@@ -0,0 +1,61 @@
+"""
+Run background AI matches (``core.match_jobs``) queued by any web process.
+
+Needed when ``AI_MATCH_JOBS["WORKERS"]`` is 0; otherwise it only adds
+capacity. Several can run at once: a job is claimed by one of them.
+
+    python manage.py run_match_jobs --threads 4
+    python manage.py run_match_jobs --once
+"""
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from core.match_jobs import expire_jobs, run_next_job
+
+
+class Command(BaseCommand):
+    help = "Run queued background AI matches"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--threads", type=int, default=1)
+        parser.add_argument(
+            "--poll", type=float, default=1.0, help="Seconds between empty polls"
+        )
+        parser.add_argument(
+            "--once", action="store_true", help="Exit once the queue is empty"
+        )
+
+    def handle(self, *args, **options):
+        if options["once"]:
+            ran = 0
+            while run_next_job():
+                ran += 1
+            self.stdout.write(self.style.SUCCESS(f"Ran {ran} match jobs"))
+            return
+
+        self.stdout.write(f"Running match jobs on {options['threads']} threads")
+        threads = [
+            threading.Thread(target=self.work, args=(options["poll"],), daemon=True)
+            for _ in range(options["threads"])
+        ]
+        for thread in threads:
+            thread.start()
+        try:
+            while True:
+                expire_jobs()
+                time.sleep(60)
+        except KeyboardInterrupt:
+            pass
+
+    def work(self, poll):
+        while True:
+            close_old_connections()
+            try:
+                if run_next_job():
+                    continue
+            except Exception as e:
+                self.stderr.write(f"Match job failed: {e}")
+            time.sleep(poll)
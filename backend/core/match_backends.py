@@ -0,0 +1,209 @@
+"""
+Pluggable LLM backends for AI recipe matching.
+
+A backend turns a prompt (built by ``core.matching``) into the model's raw
+text answer. The active backend is configured like a Django cache:
+
+    AI_MATCH_BACKEND = {
+        "BACKEND": "core.match_backends.LocalMatchBackend",
+        "OPTIONS": {"latency": 0.5},
+    }
+
+``GeminiMatchBackend`` talks to Google Gemini; ``LocalMatchBackend`` is a
+deterministic offline stand-in for tests, CI and load testing.
+"""
+import asyncio
+import itertools
+import json
+import re
+import threading
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+
+from .gemini import GeminiError, GeminiNotConfigured, gemini_resolver
+from .retrieval import tokenize
+
+DEFAULT_BACKEND = {
+    "BACKEND": "core.match_backends.GeminiMatchBackend",
+    "OPTIONS": {},
+}
+
+
+class MatchBackendError(Exception):
+    """The backend cannot serve requests right now"""
+
+
+class BackendNotConfigured(MatchBackendError):
+    """The backend is missing configuration (e.g. an API key)"""
+
+
+class MatchBackend:
+    """
+    Interface of an AI match backend.
+
+    ``prepare()`` runs before any catalog work and raises
+    ``MatchBackendError`` when the backend cannot be used; ``generate()`` and
+    ``agenerate()`` return the model's answer as text.
+    """
+
+    name = "base"
+
+    def __init__(self, **options):
+        self.options = options
+
+    def prepare(self):
+        pass
+
+    def generate(self, prompt, timeout=None):
+        raise NotImplementedError
+
+    async def agenerate(self, prompt, timeout=None):
+        return await sync_to_async(self.generate, thread_sensitive=False)(
+            prompt, timeout=timeout
+        )
+
+
+class GeminiMatchBackend(MatchBackend):
+    """Google Gemini through the memoized model of ``core.gemini``"""
+
+    name = "gemini"
+
+    def prepare(self):
+        try:
+            gemini_resolver.get_model()
+        except GeminiNotConfigured as exc:
+            raise BackendNotConfigured(str(exc))
+        except GeminiError as exc:
+            raise MatchBackendError(f"Failed to configure Gemini API: {exc}")
+
+    def _request_options(self, timeout):
+        return {"timeout": timeout} if timeout else None
+
+    def generate(self, prompt, timeout=None):
+        model = gemini_resolver.get_model()
+        try:
+            response = model.generate_content(
+                prompt, request_options=self._request_options(timeout)
+            )
+        except Exception as exc:
+            # Drop the memoized model so the next request re-resolves it
+            gemini_resolver.report_failure(exc)
+            raise
+        return response.text
+
+    async def agenerate(self, prompt, timeout=None):
+        model = await sync_to_async(gemini_resolver.get_model)()
+        try:
+            response = await model.generate_content_async(
+                prompt, request_options=self._request_options(timeout)
+            )
+        except Exception as exc:
+            gemini_resolver.report_failure(exc)
+            raise
+        return response.text
+
+
+class LocalMatchBackend(MatchBackend):
+    """
+    Offline, deterministic stand-in for an LLM.
+
+    Options:
+
+    * ``latency``: seconds to wait per call (``time.sleep`` in ``generate``,
+      ``asyncio.sleep`` in ``agenerate``), to simulate a slow model;
+    * ``responses``: scripted answers returned in order (the last one
+      repeats). Without them the backend answers heuristically: it picks the
+      candidate in the prompt sharing the most ingredient tokens with the
+      user's input, ties going to the first listed.
+    """
+
+    name = "local"
+
+    USER_INPUT_RE = re.compile(r'A user has these ingredients: "(.*)"')
+    RECIPE_RE = re.compile(
+        r"Recipe ID: (\d+)\nTitle: (.*)\n(?:.*\n)*?Ingredients: (.*)\n"
+    )
+
+    def __init__(self, latency=0.0, responses=None, **options):
+        super().__init__(**options)
+        self.latency = latency
+        self.responses = list(responses or [])
+        self.calls = 0
+        self._lock = threading.Lock()
+        self._scripted = None
+        if self.responses:
+            self._scripted = itertools.chain(
+                self.responses, itertools.repeat(self.responses[-1])
+            )
+
+    def answer(self, prompt):
+        with self._lock:
+            self.calls += 1
+            if self._scripted is not None:
+                return next(self._scripted)
+
+        user_match = self.USER_INPUT_RE.search(prompt)
+        user_input = user_match.group(1) if user_match else ""
+        wanted = set(tokenize(user_input))
+
+        best = None
+        for recipe_id, title, ingredients in self.RECIPE_RE.findall(prompt):
+            overlap = len(wanted & set(tokenize(ingredients)))
+            if best is None or overlap > best[0]:
+                best = (overlap, int(recipe_id), title)
+
+        if best is None:
+            return json.dumps({"recipe_id": None, "justification": ""})
+        return json.dumps(
+            {
+                "recipe_id": best[1],
+                "justification": (
+                    f"With your {user_input}, you could make {best[2]}! "
+                    f"Check you have the right amounts, and you're ready to cook."
+                ),
+            }
+        )
+
+    def generate(self, prompt, timeout=None):
+        if self.latency:
+            time.sleep(self.latency)
+        return self.answer(prompt)
+
+    async def agenerate(self, prompt, timeout=None):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return self.answer(prompt)
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_match_backend():
+    """The configured backend instance (created once per process)"""
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                config = getattr(settings, "AI_MATCH_BACKEND", DEFAULT_BACKEND)
+                backend_class = import_string(config["BACKEND"])
+                _backend = backend_class(**config.get("OPTIONS", {}))
+    return _backend
+
+
+def reset_match_backend():
+    """Forget the backend instance; the next call builds it from settings"""
+    global _backend
+    with _backend_lock:
+        _backend = None
+
+
+@receiver(setting_changed)
+def _reset_on_setting_changed(setting, **kwargs):
+    if setting == "AI_MATCH_BACKEND":
+        reset_match_backend()
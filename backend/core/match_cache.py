@@ -0,0 +1,153 @@
+"""
+Response cache for AI recipe matches.
+
+Gemini answers are keyed on the sorted, normalized ingredient set plus the
+catalog version (``core.catalog``), so "Tomato, rice" and "rice,tomato"
+share an entry and no entry is used once any recipe, ingredient, category or
+skill level has been written. Building a key reads that version, a single
+primary-key query.
+
+Two tiers are used:
+
+* a small in-process LRU (``AI_MATCH_CACHE["LRU_SIZE"]``) that answers hot
+  keys without going to the shared cache and evicts the least recently used
+  entry when full;
+* the Django cache alias ``AI_MATCH_CACHE["ALIAS"]`` (LocMem in tests, a file
+  or database backend locally) which is shared between workers and enforces
+  the TTL.
+"""
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+
+from .catalog import catalog_version
+from .ingredient_index import normalize_ingredient_name
+
+DEFAULTS = {
+    "ALIAS": "ai_match",
+    "TTL": 60 * 60 * 24,
+    "LRU_SIZE": 256,
+}
+
+KEY_PREFIX = "ai-match"
+
+
+def get_setting(name):
+    return getattr(settings, "AI_MATCH_CACHE", {}).get(name, DEFAULTS[name])
+
+
+def normalize_ingredient_set(ingredients):
+    """Sorted tuple of unique normalized ingredient names"""
+    if isinstance(ingredients, str):
+        ingredients = ingredients.split(",")
+    names = {normalize_ingredient_name(name) for name in ingredients}
+    names.discard("")
+    return tuple(sorted(names))
+
+
+class MatchCache:
+    """Two-tier TTL + LRU cache of AI match results"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._lru = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        # Keys this process stored for the current catalog version (clear())
+        self._stored = set()
+        self._stored_version = None
+
+    @property
+    def backend(self):
+        return caches[get_setting("ALIAS")]
+
+    # -------------------------------------------------
+    # Lookups
+    # -------------------------------------------------
+    def version(self):
+        """
+        The catalog version keys are made for. Callers making several
+        lookups for one answer read it once and pass it along.
+        """
+        return catalog_version()[0]
+
+    def make_key(self, ingredients, version=None):
+        if version is None:
+            version = self.version()
+        ingredient_set = normalize_ingredient_set(ingredients)
+        digest = hashlib.sha1(
+            json.dumps(ingredient_set).encode("utf-8")
+        ).hexdigest()
+        return f"{KEY_PREFIX}:v{version}:{digest}"
+
+    def get(self, ingredients, version=None):
+        key = self.make_key(ingredients, version)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._lru.get(key)
+            if entry is not None and entry[0] > now:
+                self._lru.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self._lru.pop(key, None)
+
+        value = self.backend.get(key)
+        with self._lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self._remember(key, value, now)
+        return value
+
+    def set(self, ingredients, value, version=None):
+        if version is None:
+            version = self.version()
+        key = self.make_key(ingredients, version)
+        self.backend.set(key, value, timeout=get_setting("TTL"))
+        with self._lock:
+            self._remember(key, value, time.monotonic())
+            # Keys of older versions are never looked up again
+            if version != self._stored_version:
+                self._stored = set()
+                self._stored_version = version
+            self._stored.add(key)
+
+    def _remember(self, key, value, now):
+        self._lru[key] = (now + get_setting("TTL"), value)
+        self._lru.move_to_end(key)
+        while len(self._lru) > get_setting("LRU_SIZE"):
+            self._lru.popitem(last=False)
+
+    def clear(self):
+        """
+        Forget the entries this process stored and reset the counters. Other
+        entries of the alias (the single-flight locks, other processes'
+        matches) are left alone.
+        """
+        with self._lock:
+            stored, self._stored = self._stored, set()
+            self._lru.clear()
+            self.hits = 0
+            self.misses = 0
+        self.backend.delete_many(stored)
+
+    def stats(self):
+        version = self.version()
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "lru_entries": len(self._lru),
+                "catalog_version": version,
+            }
+
+
+match_cache = MatchCache()
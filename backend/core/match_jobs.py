@@ -0,0 +1,260 @@
+"""
+AI matches run in the background, for clients that cannot hold a request
+open for the length of an LLM call.
+
+``POST /api/recipes/ai-match/`` with ``"async": true`` (or a ``Prefer:
+respond-async`` header) still answers the exact-match and cache passes
+inline, but queues anything needing the LLM as a ``MatchJob`` row and
+answers ``202`` with the job's URL. Clients poll that URL, optionally
+long-polling with ``?wait=<seconds>``, until the job has finished; the
+result is the status and body the synchronous endpoint would have answered.
+
+* Jobs live in the database, so any process can report on them, and are run
+  by a thread pool in the web process (``WORKERS``) and/or by ``python
+  manage.py run_match_jobs`` workers.
+* Identical pantries (same ingredient set, in any order or case) share the
+  job in flight instead of queueing another LLM call.
+* A client (user, or address when anonymous) may have ``PER_USER`` jobs in
+  flight; more get ``429``. Behind a reverse proxy every anonymous client
+  has the proxy's ``REMOTE_ADDR``: set ``CLIENT_IP_HEADER`` to the header the
+  proxy puts the client's address in.
+* A job still queued ``ADOPT_AFTER`` seconds on (the process that queued it
+  may be gone) is handed to the workers of the next process asked about it.
+  Jobs queued or running longer than ``STALE_AFTER`` seconds are failed, and
+  finished jobs are deleted after ``RESULT_TTL`` seconds.
+"""
+import hashlib
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, close_old_connections, transaction
+from django.utils import timezone
+
+from .match_cache import match_cache, normalize_ingredient_set
+from .matching import llm_match, parse_user_ingredients
+from .single_flight import coalesced
+from .models import MatchJob
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    # Threads running jobs in each web process (0: run_match_jobs only)
+    "WORKERS": 2,
+    # Jobs a client may have in flight (0: unlimited)
+    "PER_USER": 2,
+    # Longest ?wait= a poll may block for, in seconds
+    "MAX_WAIT": 25,
+    # How often a waiting poll re-reads a job run by another process
+    "POLL_INTERVAL": 0.5,
+    "ADOPT_AFTER": 10,
+    "STALE_AFTER": 300,
+    "RESULT_TTL": 60 * 60,
+    # META key of the client address set by a trusted proxy, e.g.
+    # "HTTP_X_FORWARDED_FOR" (its last entry is used); None: REMOTE_ADDR
+    "CLIENT_IP_HEADER": None,
+}
+
+
+def get_setting(name):
+    return getattr(settings, "AI_MATCH_JOBS", {}).get(name, DEFAULTS[name])
+
+
+class JobLimitExceeded(Exception):
+    """The client already has the allowed number of jobs in flight"""
+
+
+# -------------------------------------------------
+# Queue
+# -------------------------------------------------
+def job_key(user_ingredients):
+    """Digest shared by every spelling and order of an ingredient set"""
+    names = "\n".join(normalize_ingredient_set(user_ingredients))
+    return hashlib.sha256(names.encode()).hexdigest()
+
+
+def request_owner(request):
+    """Whom a job counts against for ``PER_USER``"""
+    if request.user.is_authenticated:
+        return f"user:{request.user.pk}"
+    header = get_setting("CLIENT_IP_HEADER")
+    forwarded = request.META.get(header, "") if header else ""
+    # The entry appended by the trusted proxy; earlier ones are client supplied
+    address = forwarded.split(",")[-1].strip() or request.META.get("REMOTE_ADDR", "")
+    return f"ip:{address}"
+
+
+def wants_background(request):
+    """Whether an AI match request asked to be answered with a job"""
+    flag = request.data.get("async") if hasattr(request.data, "get") else None
+    if flag in (True, 1, "1", "true", "True"):
+        return True
+    return "respond-async" in request.headers.get("Prefer", "")
+
+
+def expire_jobs():
+    """
+    Fail jobs whose worker died or that no worker picked up, and delete old
+    finished ones
+    """
+    now = timezone.now()
+    stale = now - timedelta(seconds=get_setting("STALE_AFTER"))
+    MatchJob.objects.filter(status=MatchJob.RUNNING, started_at__lt=stale).update(
+        status=MatchJob.FAILED,
+        result_status=500,
+        result={"error": "AI matching was interrupted"},
+        finished_at=now,
+    )
+    MatchJob.objects.filter(status=MatchJob.QUEUED, created_at__lt=stale).update(
+        status=MatchJob.FAILED,
+        result_status=503,
+        result={"error": "AI matching was not started in time"},
+        finished_at=now,
+    )
+    MatchJob.objects.filter(
+        finished_at__lt=now - timedelta(seconds=get_setting("RESULT_TTL"))
+    ).delete()
+
+
+def submit(user_input, user_ingredients, owner):
+    """
+    ``(job, created)``: the job in flight for this ingredient set, or a new
+    one queued for ``owner``. Raises ``JobLimitExceeded`` when ``owner``
+    has too many jobs in flight.
+    """
+    expire_jobs()
+    key = job_key(user_ingredients)
+    in_flight = MatchJob.objects.filter(status__in=MatchJob.IN_FLIGHT)
+    for _ in range(2):
+        job = in_flight.filter(key=key).first()
+        if job is not None:
+            adopt(job)
+            return job, False
+        limit = get_setting("PER_USER")
+        if limit and in_flight.filter(owner=owner).count() >= limit:
+            raise JobLimitExceeded(limit)
+        try:
+            with transaction.atomic():
+                job = MatchJob.objects.create(
+                    key=key, user_input=user_input, owner=owner
+                )
+        except IntegrityError:
+            # Another request queued the same pantry since the lookup
+            continue
+        transaction.on_commit(lambda: worker_pool.submit(job.id))
+        return job, True
+    raise IntegrityError(f"Could not queue a match job for {key}")
+
+
+def adopt(job):
+    """
+    Hand a job queued ``ADOPT_AFTER`` seconds ago to this process's workers,
+    in case the process that queued it is gone. Running it twice is harmless:
+    only one worker claims it.
+    """
+    queued_before = timezone.now() - timedelta(seconds=get_setting("ADOPT_AFTER"))
+    if job.status == MatchJob.QUEUED and job.created_at < queued_before:
+        worker_pool.submit(job.id)
+
+
+# -------------------------------------------------
+# Workers
+# -------------------------------------------------
+_finished = threading.Condition()
+
+
+def run_job(job_id):
+    """Claim and run a queued job; ``False`` if another worker got it first"""
+    claimed = MatchJob.objects.filter(id=job_id, status=MatchJob.QUEUED).update(
+        status=MatchJob.RUNNING, started_at=timezone.now()
+    )
+    if not claimed:
+        return False
+    user_input = MatchJob.objects.values_list("user_input", flat=True).get(id=job_id)
+    try:
+        user_ingredients = parse_user_ingredients(user_input)
+        version = match_cache.version()
+        status_code, body = coalesced(
+            user_ingredients,
+            lambda: llm_match(user_input, user_ingredients, version),
+            version,
+        )
+    except Exception as e:
+        logger.exception("Match job %s failed", job_id)
+        status_code, body = 500, {"error": f"AI matching failed: {str(e)}"}
+    MatchJob.objects.filter(id=job_id).update(
+        status=MatchJob.SUCCEEDED if status_code < 400 else MatchJob.FAILED,
+        result_status=status_code,
+        result=body,
+        finished_at=timezone.now(),
+    )
+    with _finished:
+        _finished.notify_all()
+    return True
+
+
+def run_next_job():
+    """Run the oldest queued job; ``False`` when the queue is empty"""
+    while True:
+        job_id = (
+            MatchJob.objects.filter(status=MatchJob.QUEUED)
+            .order_by("created_at")
+            .values_list("id", flat=True)
+            .first()
+        )
+        if job_id is None:
+            return False
+        if run_job(job_id):
+            return True
+
+
+def wait_for_job(job_id, timeout):
+    """The job, once finished or after ``timeout`` seconds; ``None`` if unknown"""
+    deadline = time.monotonic() + timeout
+    job = MatchJob.objects.filter(id=job_id).first()
+    if job is not None:
+        adopt(job)
+    while True:
+        remaining = deadline - time.monotonic()
+        if job is None or job.finished or remaining <= 0:
+            return job
+        # Woken early by jobs finishing in this process
+        with _finished:
+            _finished.wait(min(remaining, get_setting("POLL_INTERVAL")))
+        job = MatchJob.objects.filter(id=job_id).first()
+
+
+class WorkerPool:
+    """Threads of this process running the jobs it queued"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._executor = None
+
+    def submit(self, job_id):
+        workers = get_setting("WORKERS")
+        if not workers:
+            return
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    workers, thread_name_prefix="match-job"
+                )
+            executor = self._executor
+        executor.submit(self._run, job_id)
+
+    @staticmethod
+    def _run(job_id):
+        close_old_connections()
+        try:
+            run_job(job_id)
+        except Exception:
+            logger.exception("Match job %s could not be run", job_id)
+        finally:
+            close_old_connections()
+
+
+worker_pool = WorkerPool()
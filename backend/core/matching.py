@@ -0,0 +1,523 @@
+"""
+Building blocks of the AI recipe match pipeline, shared by the sync (DRF)
+and async views: input normalization (canonical names, typo correction), the
+local exact-match and cache passes, candidate retrieval, prompt
+construction, response parsing, the offline fallback used when the LLM is
+unavailable and the LLM pass putting them together.
+
+Every step touching the ORM has an ``a``-prefixed async twin.
+"""
+import asyncio
+import json
+import logging
+import re
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db.models import Prefetch
+
+from .ingredient_index import ingredient_index, normalize_ingredient_name
+from .instrumentation import timed
+from .match_backends import MatchBackendError, get_match_backend
+from .match_cache import match_cache
+from .models import Recipe, RecipeIngredient
+from .ranking import recipe_ranker
+from .serializers import RecipeListSerializer
+
+logger = logging.getLogger(__name__)
+
+PROMPT_TEMPLATE = """You are a whimsical recipe matching assistant. A user has these ingredients: "{user_input}"
+
+Here are the {scope}:
+
+{recipes}
+
+Find the SINGLE best matching recipe based on the user's ingredients.
+Priority order:
+1. EXACT ingredient match (if user ingredient appears exactly in recipe ingredients, this is the best match)
+2. Direct ingredient matches (same ingredient name)
+3. Similar ingredients or substitutes
+4. Recipe category relevance
+
+Return a JSON object with two fields:
+1. "recipe_id": the single best matching recipe ID (just the number)
+2. "justification": a whimsical, friendly message explaining why this recipe was chosen, in the style of:
+   "With your [user ingredients], you could make [recipe name]! Check you have the right amounts, but then the only thing you'd need is [missing ingredients or encouragement]."
+
+Make it warm, encouraging, and slightly playful. Reference the user's ingredients and what they'd need.
+
+Example format:
+{{
+  "recipe_id": 23,
+  "justification": "With your curry paste, you could make Vegetable Curry! Check you have the right amounts, but then the only thing you'd need is some fresh vegetables and a bit of time to let those flavors meld together."
+}}
+
+Return ONLY the JSON object, no other text."""  # noqa: E501
+
+
+def get_top_k():
+    """Number of recipes sent to Gemini; 0 or None sends the whole catalog"""
+    return getattr(settings, "AI_MATCH_TOP_K", 25)
+
+
+def get_timeout():
+    """Hard limit (seconds) on a single LLM call"""
+    return getattr(settings, "AI_MATCH_TIMEOUT", 20.0)
+
+
+def use_ranking_fallback():
+    """Answer with the best locally ranked recipe when the LLM fails"""
+    return getattr(settings, "AI_MATCH_RANKING_FALLBACK", True)
+
+
+def parse_user_ingredients(user_input):
+    """
+    'Chicken, , Tomatos ' -> ['chicken', 'tomato']: canonical names, typos
+    corrected against the ingredient index
+    """
+    names = [normalize_ingredient_name(name) for name in user_input.split(",")]
+    return ingredient_index.resolve([name for name in names if name])
+
+
+async def aparse_user_ingredients(user_input):
+    # Building the index reads the database, so it must not run on the loop
+    await sync_to_async(ingredient_index.ensure_built)()
+    return parse_user_ingredients(user_input)
+
+
+def match_payload(recipe, justification):
+    """Response body shared by every successful match"""
+    return {
+        "count": 1,
+        "recipe": RecipeListSerializer(recipe).data,
+        "justification": justification,
+    }
+
+
+def recipe_queryset():
+    return Recipe.objects.for_list()
+
+
+# -------------------------------------------------
+# 1. Exact-match pass (ingredient index, no LLM)
+# -------------------------------------------------
+def exact_match_justification(recipe, match, user_ingredients):
+    matched_ings = [ing for ing in user_ingredients if ing in match.matched]
+
+    if matched_ings:
+        # Format matched ingredients nicely
+        matched_display = ", ".join([ing.title() for ing in matched_ings])
+        missing_ings = match.missing
+
+        return overlap_justification(recipe, matched_display, missing_ings)
+    return (
+        f"Great news! You have the perfect ingredients to make {recipe.title}. "
+        f"Check you have the right amounts, and you're ready to cook!"
+    )
+
+
+def overlap_justification(recipe, matched_display, missing):
+    if missing:
+        missing_display = ", ".join(missing[:3])  # Show first 3 missing
+        if len(missing) > 3:
+            extra = len(missing) - 3
+            missing_display += f", and {extra} more thing{'s' if extra > 1 else ''}"
+        return (
+            f"With your {matched_display}, you could make {recipe.title}! "
+            f"Check you have the right amounts, but then the only thing "
+            f"you'd need is {missing_display}."
+        )
+    return (
+        f"Perfect match! With your {matched_display}, you have everything "
+        f"you need to make {recipe.title}. You're all set to create "
+        f"something delicious!"
+    )
+
+
+def find_exact_match(user_ingredients):
+    """``(recipe, justification)`` for the best exact match, or ``None``"""
+    matches = ingredient_index.rank(user_ingredients, limit=1)
+    if not matches:
+        return None
+    recipe = recipe_queryset().filter(id=matches[0].recipe_id).first()
+    if recipe is None:
+        return None
+    return recipe, exact_match_justification(recipe, matches[0], user_ingredients)
+
+
+async def afind_exact_match(user_ingredients):
+    # Building the index reads the database, so it must not run on the loop
+    await sync_to_async(ingredient_index.ensure_built)()
+    matches = ingredient_index.rank(user_ingredients, limit=1)
+    if not matches:
+        return None
+    recipe = await recipe_queryset().filter(id=matches[0].recipe_id).afirst()
+    if recipe is None:
+        return None
+    return recipe, exact_match_justification(recipe, matches[0], user_ingredients)
+
+
+# -------------------------------------------------
+# 2. Response cache
+# -------------------------------------------------
+def find_cached_match(user_ingredients, version=None):
+    cached = match_cache.get(user_ingredients, version)
+    if cached is None:
+        return None
+    recipe = recipe_queryset().filter(id=cached["recipe_id"]).first()
+    if recipe is None:
+        return None
+    return recipe, cached["justification"]
+
+
+async def afind_cached_match(user_ingredients, version=None):
+    cached = await sync_to_async(match_cache.get)(user_ingredients, version)
+    if cached is None:
+        return None
+    recipe = await recipe_queryset().filter(id=cached["recipe_id"]).afirst()
+    if recipe is None:
+        return None
+    return recipe, cached["justification"]
+
+
+def remember_match(user_ingredients, recipe, justification, version=None):
+    match_cache.set(
+        user_ingredients,
+        {"recipe_id": recipe.id, "justification": justification},
+        version,
+    )
+
+
+# -------------------------------------------------
+# 3. Candidate retrieval and prompt
+# -------------------------------------------------
+def candidate_queryset():
+    return recipe_queryset().prefetch_related(
+        Prefetch(
+            "recipe_ingredients",
+            queryset=RecipeIngredient.objects.select_related("ingredient"),
+        )
+    )
+
+
+def select_candidate_recipes(user_ingredients, top_k=None):
+    """
+    The recipes worth showing to Gemini, best first.
+
+    Recipes are scored locally (BM25 over ingredient names); when fewer than
+    ``top_k`` recipes share a token with the user's input the shortlist is
+    padded with the newest recipes so the model still has options to pick
+    substitutes from.
+    """
+    if top_k is None:
+        top_k = get_top_k()
+    if not top_k:
+        return list(candidate_queryset().all())
+
+    ranked_ids = ingredient_index.candidates(user_ingredients, top_k)
+    if len(ranked_ids) < top_k:
+        ranked_ids += list(
+            Recipe.objects.exclude(id__in=ranked_ids)
+            .order_by("-created_at")
+            .values_list("id", flat=True)[: top_k - len(ranked_ids)]
+        )
+
+    recipes = candidate_queryset().in_bulk(ranked_ids)
+    return [recipes[recipe_id] for recipe_id in ranked_ids if recipe_id in recipes]
+
+
+async def aselect_candidate_recipes(user_ingredients, top_k=None):
+    if top_k is None:
+        top_k = get_top_k()
+    if not top_k:
+        return [recipe async for recipe in candidate_queryset().all()]
+
+    await sync_to_async(ingredient_index.ensure_built)()
+    ranked_ids = ingredient_index.candidates(user_ingredients, top_k)
+    if len(ranked_ids) < top_k:
+        newest = (
+            Recipe.objects.exclude(id__in=ranked_ids)
+            .order_by("-created_at")
+            .values_list("id", flat=True)[: top_k - len(ranked_ids)]
+        )
+        ranked_ids += [recipe_id async for recipe_id in newest]
+
+    recipes = await candidate_queryset().ain_bulk(ranked_ids)
+    return [recipes[recipe_id] for recipe_id in ranked_ids if recipe_id in recipes]
+
+
+def format_recipe(recipe):
+    ingredients_list = [
+        f"{ri.ingredient.name} ({ri.quantity})"
+        for ri in recipe.recipe_ingredients.all()
+    ]
+    return f"""Recipe ID: {recipe.id}
+Title: {recipe.title}
+Category: {recipe.category.name if recipe.category else 'N/A'}
+Ingredients: {', '.join(ingredients_list) if ingredients_list else 'N/A'}
+Description: {recipe.description[:200] if recipe.description else 'N/A'}
+"""
+
+
+def build_match_prompt(user_input, recipes, shortlisted=True):
+    return PROMPT_TEMPLATE.format(
+        user_input=user_input,
+        scope="candidate recipes" if shortlisted else "all available recipes",
+        recipes="\n".join(format_recipe(recipe) for recipe in recipes),
+    )
+
+
+def estimate_tokens(text):
+    """Rough token count (~4 characters per token for Gemini/English text)"""
+    return (len(text) + 3) // 4
+
+
+# -------------------------------------------------
+# 4. LLM response parsing
+# -------------------------------------------------
+def parse_match_response(response_text):
+    """
+    Extract ``(recipe_id, justification)`` from the model's answer.
+
+    Accepts the JSON object the prompt asks for, the legacy array-of-ids
+    format, and either of them wrapped in markdown code fences or prose.
+    Raises ``ValueError`` when nothing usable is found.
+    """
+    response_text = response_text.strip()
+
+    # Remove markdown code blocks if present
+    if "```" in response_text:
+        # Extract content between code blocks
+        match = re.search(r"```(?:json)?\s*(.*?)\s*```", response_text, re.DOTALL)
+        if match:
+            response_text = match.group(1).strip()
+
+    # Try to parse as JSON object (with recipe_id and justification)
+    try:
+        ai_response = json.loads(response_text)
+
+        # Handle both old format (array) and new format (object)
+        if isinstance(ai_response, list):
+            # Old format: just an array of IDs
+            matched_ids = ai_response
+            justification = None
+        elif isinstance(ai_response, dict):
+            # New format: object with recipe_id and justification
+            matched_ids = [ai_response.get("recipe_id")]
+            justification = ai_response.get("justification")
+        else:
+            raise ValueError(f"Unexpected response format: {type(ai_response)}")
+
+    except json.JSONDecodeError:
+        # Try to extract array from text (fallback for old format)
+        array_match = re.search(r"\[[\d,\s]+\]", response_text)
+        object_match = re.search(r"\{[^}]+\}", response_text)
+        if array_match:
+            matched_ids = json.loads(array_match.group(0))
+            justification = None
+        elif object_match:
+            # Try to extract object
+            try:
+                ai_response = json.loads(object_match.group(0))
+            except json.JSONDecodeError:
+                raise ValueError(
+                    f"Could not parse JSON from response: {response_text}"
+                )
+            matched_ids = [ai_response.get("recipe_id")]
+            justification = ai_response.get("justification")
+        else:
+            raise ValueError(f"Could not parse JSON from response: {response_text}")
+
+    # Validate that matched_ids is a list
+    if not isinstance(matched_ids, list) or not matched_ids:
+        raise ValueError(f"Expected non-empty list, got {matched_ids}")
+
+    return matched_ids[0], justification
+
+
+def fallback_justification(recipe, user_input):
+    """Simple justification for when the model did not provide one"""
+    recipe_ingredients = [
+        ri.ingredient.name.lower() for ri in recipe.recipe_ingredients.all()
+    ]
+    user_ing_list = [ing.strip() for ing in user_input.split(",")]
+    matched_ings = [
+        ing
+        for ing in user_ing_list
+        if any(ing.lower() in ri or ri in ing.lower() for ri in recipe_ingredients)
+    ]
+
+    if matched_ings:
+        return (
+            f"With your {', '.join(matched_ings)}, you could make {recipe.title}! "
+            f"Check you have the right amounts, but then you're all set to "
+            f"create something delicious."
+        )
+    return (
+        f"You could make {recipe.title}! This recipe matches your ingredients "
+        f"and will be a great choice for your next meal."
+    )
+
+
+def resolve_match(response_text, candidates, user_input):
+    """
+    Turn the model's answer into ``(recipe, justification)``; the chosen id
+    must be one of the candidates that were offered
+    """
+    recipe_id, justification = parse_match_response(response_text)
+    recipe_id_map = {recipe.id: recipe for recipe in candidates}
+    if recipe_id not in recipe_id_map:
+        raise ValueError(f"Recipe ID {recipe_id} not found in available recipes")
+
+    recipe = recipe_id_map[recipe_id]
+    return recipe, justification or fallback_justification(recipe, user_input)
+
+
+# -------------------------------------------------
+# 5. Offline fallback (local ranking, no LLM)
+# -------------------------------------------------
+def find_ranked_match(user_ingredients):
+    """
+    ``(recipe, justification)`` for the recipe ``core.ranking`` puts first,
+    or ``None`` (no recipe shares a word with the pantry, or the fallback is
+    off). Not cached: the LLM gets the next request for this pantry.
+    """
+    if not use_ranking_fallback():
+        return None
+    ranked = recipe_ranker.rank(user_ingredients, limit=1)
+    if not ranked:
+        return None
+    recipe = recipe_queryset().filter(id=ranked[0].recipe_id).first()
+    if recipe is None:
+        return None
+    return recipe, ranked_justification(recipe, ranked[0])
+
+
+async def afind_ranked_match(user_ingredients):
+    if not use_ranking_fallback():
+        return None
+    # A first ranking builds the ingredient index from the database
+    ranked = await sync_to_async(recipe_ranker.rank)(user_ingredients, limit=1)
+    if not ranked:
+        return None
+    recipe = await recipe_queryset().filter(id=ranked[0].recipe_id).afirst()
+    if recipe is None:
+        return None
+    return recipe, ranked_justification(recipe, ranked[0])
+
+
+def ranked_justification(recipe, ranked):
+    return overlap_justification(recipe, ", ".join(ranked.matched), ranked.missing)
+
+
+# -------------------------------------------------
+# 6. LLM pass
+# -------------------------------------------------
+def llm_match(user_input, user_ingredients, version=None):
+    """
+    ``(status code, body)`` of an AI match that the exact-match and cache
+    passes could not answer: the LLM's pick, or the local ranking's when the
+    LLM is unavailable. The pick is cached under ``version``, the catalog
+    version the request started with.
+    """
+    # Make sure the LLM backend is usable before doing any catalog work
+    backend = get_match_backend()
+    try:
+        backend.prepare()
+    except MatchBackendError as e:
+        # Offline: the best locally ranked recipe, if any is close enough
+        match = find_ranked_match(user_ingredients)
+        if match is not None:
+            return 200, match_payload(*match)
+        return 500, {"error": str(e)}
+
+    # Shortlist candidate recipes locally; only the top K go into the prompt
+    try:
+        candidates = select_candidate_recipes(user_ingredients)
+    except Exception as e:
+        return 500, {"error": f"Failed to fetch recipes: {str(e)}"}
+    if not candidates:
+        return 404, {"error": "No recipes found"}
+
+    prompt = build_match_prompt(user_input, candidates, shortlisted=bool(get_top_k()))
+
+    try:
+        with timed("llm"):
+            response_text = backend.generate(prompt, timeout=get_timeout())
+    except Exception as e:
+        match = find_ranked_match(user_ingredients)
+        if match is None:
+            return 500, {"error": f"AI matching failed: {str(e)}"}
+        logger.warning("AI match answered by local ranking: %s", e)
+        return 200, match_payload(*match)
+
+    try:
+        best_match, justification = resolve_match(
+            response_text, candidates, user_input
+        )
+        remember_match(user_ingredients, best_match, justification, version)
+        return 200, match_payload(best_match, justification)
+    except json.JSONDecodeError as e:
+        return 500, {"error": f"Failed to parse AI response as JSON: {str(e)}"}
+    except Exception as e:
+        return 500, {"error": f"AI matching failed: {str(e)}"}
+
+
+async def allm_match(user_input, user_ingredients, version=None):
+    """
+    ``llm_match`` awaiting the LLM, bounded by ``AI_MATCH_TIMEOUT`` (504) and
+    cancelled with the calling task
+    """
+    backend = get_match_backend()
+    try:
+        await sync_to_async(backend.prepare)()
+    except MatchBackendError as e:
+        match = await afind_ranked_match(user_ingredients)
+        if match is not None:
+            return 200, match_payload(*match)
+        return 500, {"error": str(e)}
+
+    try:
+        candidates = await aselect_candidate_recipes(user_ingredients)
+    except Exception as e:
+        return 500, {"error": f"Failed to fetch recipes: {str(e)}"}
+    if not candidates:
+        return 404, {"error": "No recipes found"}
+
+    prompt = build_match_prompt(user_input, candidates, shortlisted=bool(get_top_k()))
+
+    try:
+        try:
+            with timed("llm"):
+                response_text = await asyncio.wait_for(
+                    backend.agenerate(prompt, timeout=get_timeout()),
+                    timeout=get_timeout(),
+                )
+        except asyncio.TimeoutError:
+            match = await afind_ranked_match(user_ingredients)
+            if match is not None:
+                logger.warning("AI match timed out; answered by local ranking")
+                return 200, match_payload(*match)
+            return 504, {"error": "AI matching timed out"}
+        except asyncio.CancelledError:
+            # Client went away: the upstream call is already cancelled
+            logger.info("AI match cancelled by client disconnect")
+            raise
+        except Exception as e:
+            match = await afind_ranked_match(user_ingredients)
+            if match is None:
+                raise
+            logger.warning("AI match answered by local ranking: %s", e)
+            return 200, match_payload(*match)
+
+        best_match, justification = resolve_match(
+            response_text, candidates, user_input
+        )
+        await sync_to_async(remember_match)(
+            user_ingredients, best_match, justification, version
+        )
+        return 200, match_payload(best_match, justification)
+    except json.JSONDecodeError as e:
+        return 500, {"error": f"Failed to parse AI response as JSON: {str(e)}"}
+    except Exception as e:
+        return 500, {"error": f"AI matching failed: {str(e)}"}
@@ -0,0 +1,86 @@
+from django.db import DatabaseError, migrations
+
+# The full-text tables of core.search as of this migration. Frozen here so
+# later changes to core.search do not rewrite history; they get their own
+# migration.
+SQLITE_CREATE = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS core_recipe_fts "
+    "USING fts5(title, body, tokenize='porter unicode61')",
+]
+SQLITE_INSERT = "INSERT INTO core_recipe_fts (rowid, title, body) VALUES (%s, %s, %s)"
+SQLITE_DROP = "DROP TABLE IF EXISTS core_recipe_fts"
+
+POSTGRES_CREATE = [
+    "CREATE TABLE IF NOT EXISTS core_recipe_search ("
+    "recipe_id integer PRIMARY KEY "
+    "REFERENCES core_recipe (id) ON DELETE CASCADE "
+    "DEFERRABLE INITIALLY DEFERRED, "
+    "document tsvector NOT NULL)",
+    "CREATE INDEX IF NOT EXISTS core_recipe_search_document_gin "
+    "ON core_recipe_search USING GIN (document)",
+]
+POSTGRES_INSERT = (
+    "INSERT INTO core_recipe_search (recipe_id, document) VALUES (%s, "
+    "setweight(to_tsvector('english', %s), 'A') || "
+    "setweight(to_tsvector('english', %s), 'B'))"
+)
+POSTGRES_DROP = "DROP TABLE IF EXISTS core_recipe_search"
+
+SQL = {
+    "sqlite": (SQLITE_CREATE, SQLITE_INSERT, SQLITE_DROP),
+    "postgresql": (POSTGRES_CREATE, POSTGRES_INSERT, POSTGRES_DROP),
+}
+
+
+def recipe_documents(apps):
+    """``(recipe_id, title, body)`` of every recipe"""
+    Recipe = apps.get_model("core", "Recipe")
+    RecipeIngredient = apps.get_model("core", "RecipeIngredient")
+    Instruction = apps.get_model("core", "Instruction")
+
+    parts = {}
+    for recipe_id, name in RecipeIngredient.objects.order_by(
+        "recipe_id", "id"
+    ).values_list("recipe_id", "ingredient__name"):
+        parts.setdefault(recipe_id, ([], []))[0].append(name)
+    for recipe_id, content in Instruction.objects.order_by(
+        "recipe_id", "step_number"
+    ).values_list("recipe_id", "content"):
+        parts.setdefault(recipe_id, ([], []))[1].append(content)
+
+    for recipe_id, title, description in Recipe.objects.order_by("id").values_list(
+        "id", "title", "description"
+    ):
+        names, steps = parts.get(recipe_id, ([], []))
+        yield recipe_id, title, "\n".join([description or "", " ".join(names), *steps])
+
+
+def create_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor not in SQL:
+        return
+    create, insert, _ = SQL[schema_editor.connection.vendor]
+    with schema_editor.connection.cursor() as cursor:
+        try:
+            for statement in create:
+                cursor.execute(statement)
+        except DatabaseError:
+            # No full-text support in this database: the Python backend is used
+            return
+        cursor.executemany(insert, list(recipe_documents(apps)))
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor in SQL:
+        _, _, drop = SQL[schema_editor.connection.vendor]
+        schema_editor.execute(drop)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0004_alter_recipe_options_recipe_author"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
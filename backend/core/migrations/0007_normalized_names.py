@@ -0,0 +1,64 @@
+from django.db import migrations, models
+
+
+def _normalize(name):
+    # Frozen copy of core.normalization.normalize_name
+    return " ".join((name or "").split()).lower()
+
+
+def _merge(model, referencing):
+    """
+    Fill ``normalized_name`` and fold case/whitespace duplicates into the
+    oldest row, repointing ``referencing`` (model, foreign key field) rows
+    """
+    keepers = {}
+    duplicates = {}
+    for instance in model.objects.order_by("id").only("id", "name"):
+        key = _normalize(instance.name)
+        keeper = keepers.setdefault(key, instance)
+        if keeper is instance:
+            instance.normalized_name = key
+        else:
+            duplicates.setdefault(keeper.id, []).append(instance.id)
+
+    related_model, field = referencing
+    for keeper_id, duplicate_ids in duplicates.items():
+        related_model.objects.filter(**{f"{field}__in": duplicate_ids}).update(
+            **{field: keeper_id}
+        )
+        model.objects.filter(id__in=duplicate_ids).delete()
+    model.objects.bulk_update(keepers.values(), ["normalized_name"], batch_size=1000)
+
+
+def merge_duplicates(apps, schema_editor):
+    _merge(
+        apps.get_model("core", "Ingredient"),
+        (apps.get_model("core", "RecipeIngredient"), "ingredient_id"),
+    )
+    _merge(
+        apps.get_model("core", "Category"),
+        (apps.get_model("core", "Recipe"), "category_id"),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0006_recipe_created_id_idx"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="ingredient",
+            name="normalized_name",
+            field=models.CharField(default="", editable=False, max_length=200),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name="category",
+            name="normalized_name",
+            field=models.CharField(default="", editable=False, max_length=255),
+            preserve_default=False,
+        ),
+        migrations.RunPython(merge_duplicates, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,25 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # Separate from 0007: PostgreSQL cannot alter a table with pending
+    # foreign key checks from the merge in the same transaction
+
+    dependencies = [
+        ("core", "0007_normalized_names"),
+    ]
+
+    operations = [
+        migrations.AddConstraint(
+            model_name="ingredient",
+            constraint=models.UniqueConstraint(
+                fields=["normalized_name"], name="ingredient_normalized_name_uniq"
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="category",
+            constraint=models.UniqueConstraint(
+                fields=["normalized_name"], name="category_normalized_name_uniq"
+            ),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.8 on 2026-10-17 21:08
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0008_normalized_name_unique"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="recipe",
+            index=models.Index(
+                fields=["category", "-created_at", "-id"],
+                name="recipe_category_created_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="recipeingredient",
+            index=models.Index(
+                fields=["ingredient", "recipe"], name="recipe_ingredient_lookup_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.8 on 2026-10-17 21:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0009_hot_path_indexes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="recipeingredient",
+            name="amount",
+            field=models.FloatField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name="recipeingredient",
+            name="amount_max",
+            field=models.FloatField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name="recipeingredient",
+            name="quantity_version",
+            field=models.PositiveSmallIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name="recipeingredient",
+            name="unit",
+            field=models.CharField(
+                blank=True, default="", editable=False, max_length=20
+            ),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.8 on 2026-10-17 21:17
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def initialize(apps, schema_editor):
+    # Existing recipes were last modified when they were created, as far as
+    # anyone can tell
+    Recipe = apps.get_model("core", "Recipe")
+    Recipe.objects.update(updated_at=models.F("created_at"))
+    apps.get_model("core", "CatalogVersion").objects.get_or_create(id=1)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0010_recipe_ingredient_amounts"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="CatalogVersion",
+            fields=[
+                ("id", models.AutoField(primary_key=True, serialize=False)),
+                ("version", models.PositiveBigIntegerField(default=1)),
+                ("changed_at", models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+        migrations.AddField(
+            model_name="recipe",
+            name="updated_at",
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.RunPython(initialize, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.8 on 2026-10-17 22:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0011_recipe_updated_at"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="ingredient",
+            name="canonical_name",
+            field=models.CharField(
+                blank=True, default="", editable=False, max_length=200
+            ),
+        ),
+        migrations.AddField(
+            model_name="ingredient",
+            name="canonical_version",
+            field=models.PositiveSmallIntegerField(default=0, editable=False),
+        ),
+    ]
@@ -1,5 +1,13 @@
+import uuid
+
+from django.core.exceptions import ValidationError
 from django.db import models
 from django.contrib.auth.models import User
+from django.utils import timezone
+from django.utils.text import capfirst
+
+from .normalization import canonical_fields, normalize_name
+from .quantities import QUANTITY_FIELDS, quantity_fields
 
 
 class SkillLevel(models.Model):
@@ -10,22 +18,124 @@ class SkillLevel(models.Model):
         return self.level
 
 
-class Ingredient(models.Model):
+class NormalizedNameMixin:
+    """Keeps ``normalized_name`` (``name_fields``) in sync with ``name`` on save"""
+
+    @classmethod
+    def name_fields(cls, name):
+        """Columns derived from ``name``; bulk inserts must pass them"""
+        return {"normalized_name": normalize_name(name)}
+
+    def clean(self):
+        super().clean()
+        # Derived before validate_constraints(), which runs after clean()
+        for field, value in self.name_fields(self.name).items():
+            setattr(self, field, value)
+
+    def validate_constraints(self, exclude=None):
+        """
+        Also check ``normalized_name``, which model forms exclude (it is not
+        editable), and report its clash on ``name``
+        """
+        if exclude is not None and "name" not in exclude:
+            exclude = set(exclude) - {"normalized_name"}
+        try:
+            super().validate_constraints(exclude=exclude)
+        except ValidationError as e:
+            errors = e.update_error_dict({})
+            if errors.pop("normalized_name", None):
+                errors.setdefault("name", []).append(
+                    ValidationError(
+                        "%(model)s with this name already exists.",
+                        code="unique",
+                        params={"model": capfirst(self._meta.verbose_name)},
+                    )
+                )
+            raise ValidationError(errors)
+
+    def save(self, *args, **kwargs):
+        fields = self.name_fields(self.name)
+        for field, value in fields.items():
+            setattr(self, field, value)
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and "name" in update_fields:
+            kwargs["update_fields"] = {*update_fields, *fields}
+        super().save(*args, **kwargs)
+
+
+class Ingredient(NormalizedNameMixin, models.Model):
     id = models.AutoField(primary_key=True)
     name = models.CharField(max_length=200)
+    # Set on save; bulk inserts must pass Ingredient.name_fields(name)
+    normalized_name = models.CharField(max_length=200, editable=False)
+    # Matching form (see core.normalization), not unique: "Tomatoes" and
+    # "tomato" stay two rows with one canonical name
+    canonical_name = models.CharField(
+        max_length=200, blank=True, default="", editable=False
+    )
+    canonical_version = models.PositiveSmallIntegerField(default=0, editable=False)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["normalized_name"], name="ingredient_normalized_name_uniq"
+            ),
+        ]
+
+    @classmethod
+    def name_fields(cls, name):
+        return {**super().name_fields(name), **canonical_fields(name)}
 
     def __str__(self):
         return self.name
 
 
-class Category(models.Model):
+class Category(NormalizedNameMixin, models.Model):
     id = models.AutoField(primary_key=True)
     name = models.CharField(max_length=255, unique=True)
+    normalized_name = models.CharField(max_length=255, editable=False)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["normalized_name"], name="category_normalized_name_uniq"
+            ),
+        ]
 
     def __str__(self):
         return self.name
 
 
+class RecipeQuerySet(models.QuerySet):
+    def for_list(self):
+        """Everything RecipeListSerializer needs, in one query"""
+        return self.select_related("category", "skill_level", "author")
+
+    def for_detail(self):
+        """Everything RecipeDetailSerializer needs, in three queries"""
+        return (
+            self.for_list()
+            .prefetch_related(
+                models.Prefetch(
+                    "instructions",
+                    queryset=Instruction.objects.order_by("step_number", "id"),
+                )
+            )
+            .with_ingredients()
+        )
+
+    def with_ingredients(self):
+        """Prefetch recipe_ingredients and their ingredients (one query)"""
+        return self.prefetch_related(
+            models.Prefetch(
+                "recipe_ingredients",
+                queryset=RecipeIngredient.objects.select_related(
+                    "ingredient"
+                ).order_by("id"),
+            ),
+        )
+
+
 class Recipe(models.Model):
     id = models.AutoField(primary_key=True)
     title = models.CharField(max_length=500)
@@ -54,9 +164,24 @@ class Recipe(models.Model):
         help_text="User who created this recipe. Null for legacy recipes.",
     )
     created_at = models.DateTimeField(auto_now_add=True)
+    # Also moved by core.catalog.touch_recipes when related rows change
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = RecipeQuerySet.as_manager()
 
     class Meta:
         ordering = ["-created_at"]
+        indexes = [
+            # Keyset pagination of the newest-first feeds
+            models.Index(
+                fields=["-created_at", "-id"], name="recipe_created_id_idx"
+            ),
+            # RecipeByCategoryView: filter by category, newest first
+            models.Index(
+                fields=["category", "-created_at", "-id"],
+                name="recipe_category_created_idx",
+            ),
+        ]
 
     def __str__(self):
         return self.title
@@ -91,6 +216,93 @@ class RecipeIngredient(models.Model):
         on_delete=models.CASCADE
     )
     quantity = models.CharField(max_length=200)  # "2 cups", "100g", etc.
+    # Parsed from quantity on save (see core.quantities); bulk inserts must
+    # pass quantity_fields(text) instead of a bare quantity
+    amount = models.FloatField(null=True, blank=True, editable=False)
+    amount_max = models.FloatField(null=True, blank=True, editable=False)
+    unit = models.CharField(max_length=20, blank=True, default="", editable=False)
+    quantity_version = models.PositiveSmallIntegerField(default=0, editable=False)
+
+    class Meta:
+        indexes = [
+            # Recipes using an ingredient (ingredient matching, index refresh
+            # on rename) without visiting the table
+            models.Index(
+                fields=["ingredient", "recipe"], name="recipe_ingredient_lookup_idx"
+            ),
+        ]
+
+    def save(self, *args, **kwargs):
+        for name, value in quantity_fields(self.quantity).items():
+            setattr(self, name, value)
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and "quantity" in update_fields:
+            kwargs["update_fields"] = {*update_fields, *QUANTITY_FIELDS}
+        super().save(*args, **kwargs)
 
     def __str__(self):
         return f"{self.quantity} {self.ingredient.name} for {self.recipe.title}"
+
+
+class CatalogVersion(models.Model):
+    """
+    Single row counting writes to the recipe catalog (see ``core.catalog``);
+    list endpoints derive their ETag / Last-Modified from it
+    """
+    id = models.AutoField(primary_key=True)
+    version = models.PositiveBigIntegerField(default=1)
+    changed_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"Catalog v{self.version}"
+
+
+class MatchJob(models.Model):
+    """An AI match run in the background (see ``core.match_jobs``)"""
+
+    QUEUED = "queued"
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+    STATUS_CHOICES = [
+        (QUEUED, "Queued"),
+        (RUNNING, "Running"),
+        (SUCCEEDED, "Succeeded"),
+        (FAILED, "Failed"),
+    ]
+    IN_FLIGHT = (QUEUED, RUNNING)
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    # Digest of the normalized ingredient set: identical pantries share a job
+    key = models.CharField(max_length=64)
+    user_input = models.TextField()
+    # "user:<id>", or "ip:<address>" for anonymous clients
+    owner = models.CharField(max_length=150)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=QUEUED)
+    # HTTP status and body the synchronous endpoint would have answered
+    result_status = models.PositiveSmallIntegerField(null=True, blank=True)
+    result = models.JSONField(null=True, blank=True)
+    created_at = models.DateTimeField(default=timezone.now)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            # At most one job in flight per pantry
+            models.UniqueConstraint(
+                fields=["key"],
+                condition=models.Q(status__in=["queued", "running"]),
+                name="match_job_in_flight_uniq",
+            ),
+        ]
+        indexes = [
+            models.Index(fields=["status", "created_at"], name="match_job_queue_idx"),
+            models.Index(fields=["owner", "status"], name="match_job_owner_idx"),
+        ]
+
+    @property
+    def finished(self):
+        return self.status not in self.IN_FLIGHT
+
+    def __str__(self):
+        return f"Match job {self.id} ({self.status})"
@@ -0,0 +1,154 @@
+"""
+Canonical form of ingredient and category names.
+
+``normalize_name`` is stored in the ``normalized_name`` columns (unique), so
+"Olive Oil", "olive oil" and " olive  OIL" are one row, and used by every
+lookup by name: the recipe writers and the category feed.
+
+``canonical_ingredient_name`` goes further for matching: punctuation is
+dropped, words are singularized and aliases are replaced by one spelling, so
+"Tomatoes", "tomato" and "Cherry-tomatoes" become "tomato" and "cherry
+tomato", and "Spring Onions" and "scallion" both become "green onion". It is
+stored in ``Ingredient.canonical_name`` on write (rows keep their own
+``normalized_name`` and display name) and applied to user input by the match,
+ranking and search endpoints. ``INGREDIENT_ALIASES`` in the settings adds to
+or overrides the built-in aliases.
+
+A variety keeps its own name: "cherry tomato" is not "tomato", as "sweet
+potato" is not "potato", so the exact-match pass does not pair them. Word
+level lookups (BM25 candidates, search, the pantry matrix) still do.
+"""
+import functools
+import re
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+# Bump when the rules below change, so backfill_canonical_names rewrites the
+# stored names
+CANONICAL_VERSION = 1
+CANONICAL_FIELDS = ("canonical_name", "canonical_version")
+
+WORD_RE = re.compile(r"[^\W_]+")
+
+# Plurals the suffix rules get wrong, and words that only look plural
+IRREGULAR_PLURALS = {
+    "leaves": "leaf",
+    "loaves": "loaf",
+    "halves": "half",
+    "knives": "knife",
+    "cookies": "cookie",
+    "brownies": "brownie",
+    "geese": "goose",
+}
+INVARIANT_WORDS = {"brussels", "grits", "molasses"}
+
+# alias -> canonical spelling, both as written (singularized when compiled)
+INGREDIENT_ALIASES = {
+    "scallion": "green onion",
+    "spring onion": "green onion",
+    "aubergine": "eggplant",
+    "courgette": "zucchini",
+    "garbanzo": "chickpea",
+    "garbanzo bean": "chickpea",
+    "capsicum": "bell pepper",
+    "coriander leaves": "cilantro",
+    "fresh coriander": "cilantro",
+    "rocket": "arugula",
+    "beetroot": "beet",
+    "swede": "rutabaga",
+    "mangetout": "snow pea",
+    "prawn": "shrimp",
+    "chilli": "chili",
+    "chile": "chili",
+    "minced beef": "ground beef",
+    "beef mince": "ground beef",
+    "icing sugar": "powdered sugar",
+    "confectioners sugar": "powdered sugar",
+    "caster sugar": "superfine sugar",
+    "plain flour": "all purpose flour",
+    "ap flour": "all purpose flour",
+    "cornflour": "cornstarch",
+    "corn starch": "cornstarch",
+    "bicarbonate of soda": "baking soda",
+    "bicarb": "baking soda",
+    "double cream": "heavy cream",
+    "heavy whipping cream": "heavy cream",
+    "single cream": "light cream",
+    "soya sauce": "soy sauce",
+    "shoyu": "soy sauce",
+    "evoo": "extra virgin olive oil",
+}
+
+
+def normalize_name(name):
+    """' Olive  OIL ' -> 'olive oil'"""
+    return " ".join((name or "").split()).lower()
+
+
+def singularize(word):
+    """'tomatoes' -> 'tomato', 'berries' -> 'berry'; lowercase input"""
+    if word in IRREGULAR_PLURALS:
+        return IRREGULAR_PLURALS[word]
+    if (
+        len(word) <= 3
+        or word in INVARIANT_WORDS
+        or word.endswith(("ss", "us", "is"))
+    ):
+        return word
+    if word.endswith("ies") and len(word) > 4:
+        return word[:-3] + "y"
+    if word.endswith(("oes", "ches", "shes", "xes")):
+        return word[:-2]
+    if word.endswith("s"):
+        return word[:-1]
+    return word
+
+
+def _words(name):
+    return [singularize(word) for word in WORD_RE.findall(normalize_name(name))]
+
+
+@functools.cache
+def _aliases():
+    """``{alias words: canonical words}`` and the longest alias length"""
+    table = {**INGREDIENT_ALIASES, **getattr(settings, "INGREDIENT_ALIASES", {})}
+    aliases = {tuple(_words(alias)): _words(name) for alias, name in table.items()}
+    return aliases, max(map(len, aliases), default=0)
+
+
+@receiver(setting_changed)
+def _reset_aliases(setting, **kwargs):
+    if setting == "INGREDIENT_ALIASES":
+        _aliases.cache_clear()
+        canonical_ingredient_name.cache_clear()
+
+
+@functools.lru_cache(maxsize=4096)
+def canonical_ingredient_name(name):
+    """'Spring Onions' -> 'green onion', ' Cherry-Tomatoes' -> 'cherry tomato'"""
+    words = _words(name)
+    aliases, longest = _aliases()
+    canonical = []
+    start = 0
+    while start < len(words):
+        # Longest alias starting at this word, if any
+        for size in range(min(longest, len(words) - start), 0, -1):
+            replacement = aliases.get(tuple(words[start : start + size]))
+            if replacement is not None:
+                canonical.extend(replacement)
+                start += size
+                break
+        else:
+            canonical.append(words[start])
+            start += 1
+    return " ".join(canonical)
+
+
+def canonical_fields(name):
+    """``Ingredient`` columns derived from ``name`` for matching"""
+    return {
+        "canonical_name": canonical_ingredient_name(name),
+        "canonical_version": CANONICAL_VERSION,
+    }
@@ -0,0 +1,259 @@
+"""
+Server-side cache of serialized recipe pages: the detail payload of each
+recipe and the first ``RECIPE_PAGE_CACHE["LIST_PAGES"]`` pages of the
+landing and category feeds.
+
+Entries live in the Django cache alias ``RECIPE_PAGE_CACHE["ALIAS"]``, which
+must be shared between workers (file, database or Redis backend) since
+invalidation happens in whichever worker handles the write:
+
+* detail entries are keyed on the recipe's ``updated_at``, which moves
+  whenever anything shown on the recipe changes (``core.catalog``);
+* list entries are keyed on a generation token per feed (the landing feed,
+  one per category), replaced when a recipe of that feed is written.
+
+Neither can be refilled with a page read before a write: the page is stored
+under the ``updated_at`` or generation read before it was built. The signal
+handlers in ``core.signals`` replace the generations after the transaction
+commits. Entries stay fresh for ``TTL`` seconds and are then served stale
+for up to ``STALE_TTL`` more while a single worker, holding a short lock,
+rebuilds them; the others never queue up on the database for the same key.
+"""
+import hashlib
+import threading
+import time
+import uuid
+from functools import partial
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models import Q
+from rest_framework.response import Response
+
+from .models import Category, Recipe
+from .pagination import RecipeCursorPagination
+
+DEFAULTS = {
+    "ALIAS": "recipe_pages",
+    # Seconds an entry is served as is (0 disables the cache)
+    "TTL": 300,
+    # Seconds an expired entry may still be served while it is rebuilt
+    "STALE_TTL": 60,
+    # Seconds before an abandoned rebuild lock is released
+    "LOCK_TIMEOUT": 10,
+    # Page numbers cached per feed (1..LIST_PAGES)
+    "LIST_PAGES": 3,
+}
+
+KEY_PREFIX = "recipe-page"
+LANDING = "landing"
+
+
+def get_setting(name):
+    return getattr(settings, "RECIPE_PAGE_CACHE", {}).get(name, DEFAULTS[name])
+
+
+def _digest(text):
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()[:16]
+
+
+def category_scope(normalized_name):
+    return f"category:{normalized_name}"
+
+
+class RecipePageCache:
+    """Serialized pages with stale-while-revalidate rebuilds"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+
+    @property
+    def backend(self):
+        return caches[get_setting("ALIAS")]
+
+    @property
+    def enabled(self):
+        return get_setting("TTL") > 0
+
+    # -------------------------------------------------
+    # Keys
+    # -------------------------------------------------
+    def detail_key(self, recipe_id, updated_at):
+        return f"{KEY_PREFIX}:detail:{recipe_id}:{updated_at.timestamp()}"
+
+    def _generation_key(self, scope):
+        return f"{KEY_PREFIX}:generation:{_digest(scope)}"
+
+    def generation(self, scope):
+        key = self._generation_key(scope)
+        token = self.backend.get(key)
+        if token is None:
+            self.backend.add(key, uuid.uuid4().hex, timeout=None)
+            token = self.backend.get(key)
+        return token
+
+    def list_key(self, scope, request):
+        """
+        Key of a feed page, or ``None`` when the page is not cached (cursor
+        pages, pages past ``LIST_PAGES``)
+        """
+        if not self.enabled or RecipeCursorPagination.is_requested(request):
+            return None
+        page = request.query_params.get("page", "1")
+        if not page.isdigit() or not 0 < int(page) <= get_setting("LIST_PAGES"):
+            return None
+        # The absolute URL also fixes the next/previous links of the page
+        url = request.build_absolute_uri()
+        return (
+            f"{KEY_PREFIX}:list:{_digest(scope)}:{self.generation(scope)}:"
+            f"{_digest(url)}"
+        )
+
+    # -------------------------------------------------
+    # Lookups
+    # -------------------------------------------------
+    def get_or_build(self, key, build):
+        """
+        Cached value of ``key``, or ``build()`` stored under it. An expired
+        entry is returned as is unless this caller wins the rebuild lock.
+        """
+        now = time.time()
+        entry = self.backend.get(key)
+        lock_key = f"{key}:rebuild"
+        locked = False
+        if entry is not None:
+            fresh_until, value = entry
+            if fresh_until > now:
+                self._count("hits")
+                return value
+            locked = self.backend.add(
+                lock_key, 1, timeout=get_setting("LOCK_TIMEOUT")
+            )
+            if not locked:
+                # Another worker is rebuilding it
+                self._count("stale_hits")
+                return value
+        self._count("misses")
+
+        try:
+            value = build()
+            ttl = get_setting("TTL")
+            self.backend.set(
+                key, (now + ttl, value), timeout=ttl + get_setting("STALE_TTL")
+            )
+        finally:
+            if locked:
+                self.backend.delete(lock_key)
+        return value
+
+    def _count(self, counter):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    # -------------------------------------------------
+    # Invalidation
+    # -------------------------------------------------
+    def expire(self, list_ids=(), category_ids=()):
+        """
+        Drop the feeds listing ``list_ids`` or belonging to ``category_ids``,
+        once the current transaction commits
+        """
+        list_ids, category_ids = set(list_ids), set(category_ids)
+        if not self.enabled or not (list_ids or category_ids):
+            return
+        scopes = {LANDING}
+        names = Category.objects.filter(
+            Q(id__in=category_ids) | Q(recipes__id__in=list_ids)
+        ).values_list("normalized_name", flat=True)
+        scopes.update(category_scope(name) for name in names)
+        transaction.on_commit(partial(self._drop, scopes))
+
+    def expire_categories(self, normalized_names):
+        """Drop the feeds of categories by name (e.g. before a rename)"""
+        if self.enabled and normalized_names:
+            scopes = {category_scope(name) for name in normalized_names}
+            transaction.on_commit(partial(self._drop, scopes))
+
+    def _drop(self, scopes):
+        for scope in scopes:
+            # A new token orphans the old entries, which then age out
+            self.backend.set(
+                self._generation_key(scope), uuid.uuid4().hex, timeout=None
+            )
+
+    def clear(self):
+        """Forget every entry and reset the counters"""
+        self.backend.clear()
+        with self._lock:
+            self.hits = self.stale_hits = self.misses = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "stale_hits": self.stale_hits,
+                "misses": self.misses,
+            }
+
+
+recipe_page_cache = RecipePageCache()
+
+
+# -------------------------------------------------
+# View mixins
+# -------------------------------------------------
+def recipe_updated_at(request, recipe_id):
+    """``updated_at`` of a recipe, as read by the validators of the request"""
+    # Set on the Django request by core.conditional, seen through DRF's
+    if not hasattr(request, "_recipe_updated_at"):
+        request._recipe_updated_at = (
+            Recipe.objects.filter(id=recipe_id)
+            .values_list("updated_at", flat=True)
+            .first()
+        )
+    return request._recipe_updated_at
+
+
+class CachedDetailMixin:
+    """
+    Serve ``retrieve`` from the page cache, keyed on the ``id`` URL kwarg and
+    the recipe's ``updated_at`` (already read by ``recipe_conditional``)
+    """
+
+    def retrieve(self, request, *args, **kwargs):
+        updated_at = None
+        if recipe_page_cache.enabled:
+            updated_at = recipe_updated_at(request, kwargs["id"])
+        if updated_at is None:
+            # Cache off, or no such recipe: the view answers 404
+            return Response(self.get_payload())
+        data = recipe_page_cache.get_or_build(
+            recipe_page_cache.detail_key(kwargs["id"], updated_at), self.get_payload
+        )
+        return Response(data)
+
+    def get_payload(self):
+        return self.get_serializer(self.get_object()).data
+
+
+class CachedListMixin:
+    """Serve the first pages of a feed from the page cache"""
+
+    page_cache_scope = LANDING
+
+    def get_page_cache_scope(self):
+        return self.page_cache_scope
+
+    def list(self, request, *args, **kwargs):
+        uncached = super().list
+        key = recipe_page_cache.list_key(self.get_page_cache_scope(), request)
+        if key is None:
+            return uncached(request, *args, **kwargs)
+        data = recipe_page_cache.get_or_build(
+            key, lambda: uncached(request, *args, **kwargs).data
+        )
+        return Response(data)
@@ -0,0 +1,307 @@
+"""
+"What can I cook": every recipe a pantry can make, short of at most a few
+ingredients.
+
+Recipes are numbered by row (recipe id order) and each set of recipes is a
+Python integer with one bit per row:
+
+* per normalized ingredient name, the recipes using it;
+* per ingredient count, the recipes with that many ingredients.
+
+A query adds the bitsets of the ingredient names the pantry covers into
+bit-sliced counters (plane ``i`` holds bit ``i`` of every recipe's count of
+covered ingredients), so counting is a few dozen whole-catalog integer
+operations rather than a loop over recipes. A recipe with ``size``
+ingredients fits a budget of ``max_missing`` when ``size - max_missing`` or
+more are covered, so ingredient counts above the number of covered names
+plus the budget are pruned before any counting, and each (missing, size)
+group is one equality test against the counters. Pages are cut from the
+groups by their bit counts; only the recipes on the page are decoded.
+
+Pantry items match ingredient names as in ``core.ranking``: the same
+normalized name or, when there is none, every name containing all of the
+item's tokens. The index follows ``core.ingredient_index`` through
+``snapshot(since)`` and applies changed recipes in place.
+"""
+import threading
+from dataclasses import dataclass, field
+
+from .ingredient_index import ingredient_index, normalize_ingredient_name
+from .retrieval import tokenize
+
+# Postings denser than one recipe in DENSE_RATIO are kept as bitsets; rarer
+# ingredient names keep a set of rows, turned into a bitset when queried
+DENSE_RATIO = 256
+
+
+@dataclass
+class CookableRecipe:
+    """A recipe the pantry covers but for ``missing``"""
+
+    recipe_id: int
+    matched: list = field(default_factory=list)
+    missing: list = field(default_factory=list)
+
+    @property
+    def missing_count(self):
+        return len(self.missing)
+
+
+def rows_to_bits(rows):
+    """Bitset of an iterable of row numbers"""
+    rows = list(rows)
+    if not rows:
+        return 0
+    buffer = bytearray((max(rows) >> 3) + 1)
+    for row in rows:
+        buffer[row >> 3] |= 1 << (row & 7)
+    return int.from_bytes(buffer, "little")
+
+
+def equal_to(planes, value):
+    """Bitset of the rows whose bit-sliced counter in ``planes`` is ``value``"""
+    if value >> len(planes):
+        return 0
+    bits = -1
+    for plane in planes:
+        bits &= plane if value & 1 else ~plane
+        value >>= 1
+    return bits
+
+
+def highest_rows(bits, skip, limit):
+    """Up to ``limit`` set bits of ``bits``, highest first, after ``skip``"""
+    if skip:
+        # Largest cut keeping at least `skip` bits above it, by bisection
+        low, high = 0, bits.bit_length()
+        while low < high:
+            middle = (low + high + 1) // 2
+            if (bits >> middle).bit_count() >= skip:
+                low = middle
+            else:
+                high = middle - 1
+        bits &= (1 << low) - 1
+    rows = []
+    while bits and len(rows) < limit:
+        row = bits.bit_length() - 1
+        rows.append(row)
+        bits ^= 1 << row
+    return rows
+
+
+class CookableRecipes:
+    """
+    Lazy, sliceable sequence of the recipes fitting a query for the
+    paginator: fewest missing ingredients first, then most ingredients
+    covered, then newest. Only the sliced recipes are decoded.
+    """
+
+    def __init__(self, groups, recipe_ids, ingredients, wanted):
+        # [(bitset, count)] in result order
+        self.groups = groups
+        self.recipe_ids = recipe_ids
+        self.ingredients = ingredients
+        self.wanted = wanted
+        self.total = sum(size for _, size in groups)
+
+    def __len__(self):
+        return self.total
+
+    def count(self):
+        return self.total
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            return self[index : index + 1][0]
+        start, stop, _ = index.indices(self.total)
+        page = []
+        for bits, size in self.groups:
+            if stop <= 0:
+                break
+            if start < size:
+                for row in highest_rows(bits, start, stop - start):
+                    page.append(self.decode(row))
+            start = max(start - size, 0)
+            stop -= size
+        return page
+
+    def decode(self, row):
+        ingredients = self.ingredients[row]
+        return CookableRecipe(
+            self.recipe_ids[row],
+            matched=[
+                name for normalized, name in ingredients.items()
+                if normalized in self.wanted
+            ],
+            missing=[
+                name for normalized, name in ingredients.items()
+                if normalized not in self.wanted
+            ],
+        )
+
+
+class PantryIndex:
+    """
+    Bitset index following ``source``: ``ingredient_index``, or anything
+    with the same ``snapshot(since)``
+    """
+
+    def __init__(self, source=ingredient_index):
+        self.source = source
+        self._lock = threading.Lock()
+        self._stamp = None
+        self._reset({})
+
+    def invalidate(self):
+        """Drop the bitsets; they are rebuilt on next use"""
+        with self._lock:
+            self._stamp = None
+            self._reset({})
+
+    def _reset(self, recipes):
+        recipe_ids = sorted(recipe_id for recipe_id, items in recipes.items() if items)
+        self._recipe_ids = recipe_ids
+        self._rows = {recipe_id: row for row, recipe_id in enumerate(recipe_ids)}
+        self._ingredients = [recipes[recipe_id] for recipe_id in recipe_ids]
+        postings = {}
+        sizes = {}
+        for row, ingredients in enumerate(self._ingredients):
+            for normalized in ingredients:
+                postings.setdefault(normalized, []).append(row)
+            sizes.setdefault(len(ingredients), []).append(row)
+        dense = len(recipe_ids) / DENSE_RATIO
+        self._postings = {
+            normalized: rows_to_bits(rows) if len(rows) > dense else set(rows)
+            for normalized, rows in postings.items()
+        }
+        self._by_size = {size: rows_to_bits(rows) for size, rows in sizes.items()}
+        self._names_by_token = {}
+        for normalized in self._postings:
+            self._add_tokens(normalized)
+
+    def _add_tokens(self, normalized):
+        for token in set(tokenize(normalized)):
+            self._names_by_token.setdefault(token, set()).add(normalized)
+
+    def _sync(self):
+        stamp, full, recipes = self.source.snapshot(self._stamp)
+        if not full:
+            last = self._recipe_ids[-1] if self._recipe_ids else 0
+            if any(
+                recipe_id not in self._rows and recipe_id < last and ingredients
+                for recipe_id, ingredients in recipes.items()
+            ):
+                # Rows must stay in recipe id order: renumber everything
+                stamp, full, recipes = self.source.snapshot()
+        if full:
+            self._reset(recipes)
+        else:
+            for recipe_id in sorted(recipes):
+                self._replace(recipe_id, recipes[recipe_id])
+        self._stamp = stamp
+
+    def _replace(self, recipe_id, ingredients):
+        row = self._rows.get(recipe_id)
+        if row is None:
+            if not ingredients:
+                return
+            row = self._rows[recipe_id] = len(self._recipe_ids)
+            self._recipe_ids.append(recipe_id)
+            self._ingredients.append({})
+        old = self._ingredients[row]
+        self._update(self._by_size, len(old), row, add=False)
+        for normalized in old:
+            self._update(self._postings, normalized, row, add=False)
+        self._ingredients[row] = ingredients
+        if ingredients:
+            self._update(self._by_size, len(ingredients), row, add=True)
+        for normalized in ingredients:
+            if normalized not in self._postings:
+                self._add_tokens(normalized)
+            self._update(self._postings, normalized, row, add=True)
+
+    def _update(self, postings, key, row, add):
+        rows = postings.get(key)
+        if rows is None:
+            # New ingredient names start sparse; counts are always bitsets
+            rows = set() if postings is self._postings else 0
+        if isinstance(rows, set):
+            if add:
+                rows.add(row)
+            else:
+                rows.discard(row)
+        elif add:
+            rows |= 1 << row
+        else:
+            rows &= ~(1 << row)
+        if rows:
+            postings[key] = rows
+            return
+        postings.pop(key, None)
+        if postings is self._postings:
+            for token in set(tokenize(key)):
+                names = self._names_by_token.get(token, set())
+                names.discard(key)
+                if not names:
+                    self._names_by_token.pop(token, None)
+
+    def _names_for(self, item):
+        """Ingredient names a normalized pantry item matches"""
+        if item in self._postings:
+            return {item}
+        tokens = set(tokenize(item))
+        if not tokens:
+            return set()
+        return set.intersection(
+            *(self._names_by_token.get(token, set()) for token in tokens)
+        )
+
+    def _bits(self, normalized):
+        rows = self._postings[normalized]
+        return rows_to_bits(rows) if isinstance(rows, set) else rows
+
+    def cookable(self, user_ingredients, max_missing=0):
+        """
+        ``CookableRecipes`` using at least one of ``user_ingredients`` and
+        missing at most ``max_missing`` of their ingredients
+        """
+        pantry = {normalize_ingredient_name(name) for name in user_ingredients}
+        with self._lock:
+            self._sync()
+            wanted = set().union(*(self._names_for(item) for item in pantry if item))
+            largest = len(wanted) + max_missing
+            sizes = sorted(
+                (size for size in self._by_size if size <= largest), reverse=True
+            )
+            if not wanted or not sizes:
+                return CookableRecipes([], [], [], wanted)
+
+            candidates = 0
+            for size in sizes:
+                candidates |= self._by_size[size]
+            # Bit-sliced count of covered ingredients, per recipe
+            planes = []
+            for normalized in wanted:
+                carry = self._bits(normalized) & candidates
+                for index, plane in enumerate(planes):
+                    planes[index] = plane ^ carry
+                    carry &= plane
+                    if not carry:
+                        break
+                if carry:
+                    planes.append(carry)
+
+            groups = []
+            for missing in range(max_missing + 1):
+                for size in sizes:
+                    if size <= missing:
+                        continue
+                    bits = self._by_size[size] & equal_to(planes, size - missing)
+                    if bits:
+                        groups.append((bits, bits.bit_count()))
+            # Rows keep their recipe until a rebuild, which replaces these
+            # lists, so the groups can be decoded after the lock is released
+            return CookableRecipes(groups, self._recipe_ids, self._ingredients, wanted)
+
+
+pantry_index = PantryIndex()
@@ -0,0 +1,209 @@
+"""
+Read-only fast path for the recipe feeds and detail page.
+
+``RecipeListSerializer`` and ``RecipeDetailSerializer`` instantiate models
+and walk DRF fields for every recipe, which costs more than the query behind
+the page. Here the same payloads are built straight from ``.values()`` rows
+with fixed column lists and key orders, so together with
+``core.renderers.FastJSONRenderer`` the response bytes are identical to the
+serializers' (``PayloadTests`` compares both). The serializers stay the
+source of truth for the API schema and for writes: a field added to one of
+them must be added here too.
+"""
+from collections import defaultdict
+
+from django.conf import settings
+from django.utils import timezone
+from rest_framework import ISO_8601, serializers
+from rest_framework.exceptions import NotFound
+from rest_framework.settings import api_settings
+
+from .instrumentation import timed
+from .models import Instruction, Recipe, RecipeIngredient
+
+_drf_datetime = serializers.DateTimeField().to_representation
+
+
+def datetime_zone():
+    """
+    Time zone of the datetimes in a payload, looked up once per page (it is
+    slow), or ``None`` where DRF's own formatting must be used
+    """
+    if settings.USE_TZ and api_settings.DATETIME_FORMAT == ISO_8601:
+        return timezone.get_current_timezone()
+    return None
+
+
+def format_datetime(value, zone):
+    """``serializers.DateTimeField`` output in ``zone`` (``datetime_zone()``)"""
+    if value is None or zone is None or timezone.is_naive(value):
+        return _drf_datetime(value)
+    text = value.astimezone(zone).isoformat()
+    return text[:-6] + "Z" if text.endswith("+00:00") else text
+
+
+LIST_COLUMNS = (
+    "id",
+    "title",
+    "preparation_duration",
+    "servings",
+    "category_id",
+    "category__name",
+    "skill_level_id",
+    "skill_level__level",
+    "author_id",
+    "author__username",
+    "created_at",
+)
+DETAIL_COLUMNS = LIST_COLUMNS + ("description", "updated_at")
+INSTRUCTION_COLUMNS = ("recipe_id", "id", "step_number", "content")
+INGREDIENT_COLUMNS = (
+    "recipe_id",
+    "id",
+    "ingredient_id",
+    "ingredient__name",
+    "quantity",
+    "amount",
+    "amount_max",
+    "unit",
+)
+
+
+def _related(row, key, **fields):
+    """Nested ``{"id": ..., field: ...}`` of a foreign key, ``None`` if unset"""
+    related_id = row[f"{key}_id"]
+    if related_id is None:
+        return None
+    nested = {"id": related_id}
+    for name, column in fields.items():
+        nested[name] = row[column]
+    return nested
+
+
+# -------------------------------------------------
+# Payloads (same keys, order and values as the serializers)
+# -------------------------------------------------
+def list_payload(row, zone):
+    """``RecipeListSerializer`` output for a ``LIST_COLUMNS`` row"""
+    return {
+        "id": row["id"],
+        "title": row["title"],
+        "preparation_duration": row["preparation_duration"],
+        "servings": row["servings"],
+        "category": _related(row, "category", name="category__name"),
+        "skill_level": _related(row, "skill_level", level="skill_level__level"),
+        "author": _related(row, "author", username="author__username"),
+        "created_at": format_datetime(row["created_at"], zone),
+    }
+
+
+def list_payloads(recipe_ids):
+    """``{recipe_id: list payload}`` of the recipes that exist, in one query"""
+    rows = Recipe.objects.filter(id__in=recipe_ids).values(*LIST_COLUMNS)
+    rows = list(rows)
+    with timed("serialize"):
+        zone = datetime_zone()
+        return {row["id"]: list_payload(row, zone) for row in rows}
+
+
+def instruction_payload(row):
+    return {
+        "id": row["id"],
+        "step_number": row["step_number"],
+        "content": row["content"],
+    }
+
+
+def ingredient_payload(row):
+    return {
+        "id": row["id"],
+        "ingredient": {"id": row["ingredient_id"], "name": row["ingredient__name"]},
+        "quantity": row["quantity"],
+        "amount": row["amount"],
+        "amount_max": row["amount_max"],
+        "unit": row["unit"],
+    }
+
+
+def detail_payload(row, instructions, ingredients, zone):
+    """``RecipeDetailSerializer`` output for a ``DETAIL_COLUMNS`` row"""
+    return {
+        "id": row["id"],
+        "title": row["title"],
+        "category": _related(row, "category", name="category__name"),
+        "description": row["description"],
+        "preparation_duration": row["preparation_duration"],
+        "servings": row["servings"],
+        "skill_level": _related(row, "skill_level", level="skill_level__level"),
+        "author": _related(row, "author", username="author__username"),
+        "created_at": format_datetime(row["created_at"], zone),
+        "updated_at": format_datetime(row["updated_at"], zone),
+        "instructions": [instruction_payload(step) for step in instructions],
+        "recipe_ingredients": [ingredient_payload(item) for item in ingredients],
+    }
+
+
+def detail_rows(recipe_ids):
+    """
+    ``(recipe rows, {recipe_id: instruction rows}, {recipe_id: ingredient
+    rows})`` in three queries whatever the number of recipes
+    """
+    recipe_ids = list(recipe_ids)
+    rows = list(Recipe.objects.filter(id__in=recipe_ids).values(*DETAIL_COLUMNS))
+    instructions = defaultdict(list)
+    for step in (
+        Instruction.objects.filter(recipe_id__in=recipe_ids)
+        .order_by("recipe_id", "step_number", "id")
+        .values(*INSTRUCTION_COLUMNS)
+    ):
+        instructions[step["recipe_id"]].append(step)
+    ingredients = defaultdict(list)
+    for item in (
+        RecipeIngredient.objects.filter(recipe_id__in=recipe_ids)
+        .order_by("recipe_id", "id")
+        .values(*INGREDIENT_COLUMNS)
+    ):
+        ingredients[item["recipe_id"]].append(item)
+    return rows, instructions, ingredients
+
+
+def detail_payloads(recipe_ids=None, rows=None):
+    """
+    ``{recipe_id: detail payload}`` for the recipes that exist, from
+    ``detail_rows(recipe_ids)`` or already fetched ``rows``
+    """
+    rows, instructions, ingredients = rows or detail_rows(recipe_ids)
+    with timed("serialize"):
+        zone = datetime_zone()
+        return {
+            row["id"]: detail_payload(
+                row, instructions[row["id"]], ingredients[row["id"]], zone
+            )
+            for row in rows
+        }
+
+
+# -------------------------------------------------
+# View mixins
+# -------------------------------------------------
+class RowListMixin:
+    """``list()`` built from ``LIST_COLUMNS`` rows instead of serializers"""
+
+    def list(self, request, *args, **kwargs):
+        rows = self.filter_queryset(self.get_queryset()).values(*LIST_COLUMNS)
+        page = self.paginate_queryset(rows)
+        with timed("serialize"):
+            zone = datetime_zone()
+            data = [list_payload(row, zone) for row in page]
+        return self.get_paginated_response(data)
+
+
+class RowDetailMixin:
+    """Detail payload from rows, keyed on the ``id`` URL kwarg"""
+
+    def get_payload(self):
+        payload = detail_payloads([self.kwargs["id"]]).get(self.kwargs["id"])
+        if payload is None:
+            # Same message as get_object_or_404
+            raise NotFound(f"No {Recipe._meta.object_name} matches the given query.")
+        return payload
@@ -0,0 +1,140 @@
+"""
+Parsing of free-form ingredient quantities ("2 cups", "100g", "1½ tbsp",
+"2-3 cloves") into a numeric amount and a canonical unit.
+
+Quantities are parsed once, when a ``RecipeIngredient`` is written, and
+stored next to the raw text (``amount``, ``amount_max``, ``unit``), so
+serving scaling and other amount-aware features never re-parse strings.
+Rows written before a parser change are re-parsed by
+``manage.py backfill_quantities`` (``quantity_version`` tracks which parser
+produced them).
+"""
+import re
+from dataclasses import dataclass
+from functools import lru_cache
+
+# Bump when parsing changes, so backfill_quantities re-parses stored rows
+QUANTITY_PARSER_VERSION = 2
+
+UNITS = {
+    "g": ("g", "gr", "gram", "grams", "gramme", "grammes"),
+    "kg": ("kg", "kgs", "kilo", "kilos", "kilogram", "kilograms"),
+    "mg": ("mg", "milligram", "milligrams"),
+    "ml": ("ml", "millilitre", "millilitres", "milliliter", "milliliters"),
+    "cl": ("cl", "centilitre", "centilitres", "centiliter", "centiliters"),
+    "l": ("l", "litre", "litres", "liter", "liters"),
+    "tsp": ("tsp", "tsps", "teaspoon", "teaspoons"),
+    "tbsp": ("tbsp", "tbsps", "tbs", "tablespoon", "tablespoons"),
+    "cup": ("cup", "cups"),
+    "fl oz": ("floz",),
+    "oz": ("oz", "ounce", "ounces"),
+    "lb": ("lb", "lbs", "pound", "pounds"),
+    "pint": ("pint", "pints", "pt"),
+    "quart": ("quart", "quarts", "qt"),
+    "pinch": ("pinch", "pinches"),
+    "dash": ("dash", "dashes"),
+    "handful": ("handful", "handfuls"),
+    "bunch": ("bunch", "bunches"),
+    "clove": ("clove", "cloves"),
+    "slice": ("slice", "slices"),
+    "can": ("can", "cans", "tin", "tins"),
+    "piece": ("piece", "pieces", "pc", "pcs"),
+    "sprig": ("sprig", "sprigs"),
+    "stick": ("stick", "sticks"),
+}
+UNIT_ALIASES = {alias: unit for unit, aliases in UNITS.items() for alias in aliases}
+
+UNICODE_FRACTIONS = {
+    "½": "1/2", "⅓": "1/3", "⅔": "2/3", "¼": "1/4", "¾": "3/4", "⅕": "1/5",
+    "⅖": "2/5", "⅗": "3/5", "⅘": "4/5", "⅙": "1/6", "⅚": "5/6", "⅛": "1/8",
+    "⅜": "3/8", "⅝": "5/8", "⅞": "7/8",
+}
+FRACTION_RE = re.compile(rf"(\d?)([{''.join(UNICODE_FRACTIONS)}])")
+# "1,000" and "12,500.5" group thousands; any other comma is a decimal point
+# ("1,5 kg")
+THOUSANDS = r"[1-9]\d{0,2}(?:,\d{3})+(?!\d)(?:\.\d+)?"
+NUMBER = rf"(?:\d+\s+\d+/\d+|\d+/\d+|{THOUSANDS}|\d+(?:[.,]\d+)?)"
+THOUSANDS_RE = re.compile(THOUSANDS)
+QUANTITY_RE = re.compile(
+    rf"^(?P<amount>{NUMBER})"
+    rf"(?:\s*(?:-|–|to)\s*(?P<amount_max>{NUMBER}))?"
+    r"\s*(?P<unit>fl\.?\s*oz|[^\W\d_]+)?"
+)
+
+
+@dataclass(frozen=True)
+class ParsedQuantity:
+    """``amount`` is ``None`` when the text has no leading number ("to taste")"""
+
+    amount: float = None
+    amount_max: float = None
+    unit: str = ""
+
+
+def _number(text):
+    if THOUSANDS_RE.fullmatch(text):
+        return float(text.replace(",", ""))
+    text = text.replace(",", ".")
+    whole, _, fraction = text.rpartition(" ")
+    if "/" in fraction:
+        numerator, denominator = fraction.split("/")
+        # ZeroDivisionError for "1/0", handled by the caller
+        return int(numerator) / int(denominator) + (int(whole) if whole else 0)
+    return float(text)
+
+
+@lru_cache(maxsize=4096)
+def parse_quantity(text):
+    """'1½ cups' -> ParsedQuantity(amount=1.5, amount_max=None, unit='cup')"""
+    text = " ".join(str(text or "").lower().split())
+    # "1½" -> "1 1/2"
+    text = FRACTION_RE.sub(
+        lambda m: f"{m[1]} {UNICODE_FRACTIONS[m[2]]}".lstrip(), text
+    )
+    text = re.sub(r"^(?:an?|one)\s+", "1 ", text)
+
+    match = QUANTITY_RE.match(text)
+    if match is None:
+        # A bare unit means one of it: "handful of basil"
+        unit = UNIT_ALIASES.get(text.split(" ", 1)[0])
+        return ParsedQuantity(1.0, None, unit) if unit else ParsedQuantity()
+    try:
+        amount = _number(match["amount"])
+        amount_max = _number(match["amount_max"]) if match["amount_max"] else None
+    except ZeroDivisionError:
+        return ParsedQuantity()
+    unit = (match["unit"] or "").replace(".", "").replace(" ", "")
+    return ParsedQuantity(amount, amount_max, UNIT_ALIASES.get(unit, ""))
+
+
+# Stored next to RecipeIngredient.quantity
+QUANTITY_FIELDS = ("amount", "amount_max", "unit", "quantity_version")
+
+
+def quantity_fields(text):
+    """``RecipeIngredient`` field values for a raw quantity"""
+    # JSON clients may send numbers: 2 is stored as "2"
+    text = "" if text is None else str(text)
+    parsed = parse_quantity(text)
+    return {
+        "quantity": text,
+        "amount": parsed.amount,
+        "amount_max": parsed.amount_max,
+        "unit": parsed.unit,
+        "quantity_version": QUANTITY_PARSER_VERSION,
+    }
+
+
+def format_amount(value):
+    """3.0 -> '3', 0.3333 -> '0.33'"""
+    if value is None:
+        return ""
+    return f"{value:.2f}".rstrip("0").rstrip(".")
+
+
+def format_quantity(amount, amount_max=None, unit=""):
+    """Readable quantity from stored numbers: '1.5-3 cup'"""
+    text = format_amount(amount)
+    if amount_max is not None:
+        text += f"-{format_amount(amount_max)}"
+    return f"{text} {unit}".strip()
@@ -0,0 +1,322 @@
+"""
+Deterministic ranking of the whole catalog against a pantry.
+
+Each recipe is a row of a sparse 0/1 matrix over the ingredient vocabulary
+(normalized names). A pantry selects a few columns and every recipe is
+scored at once with SciPy sparse products:
+
+* ``coverage``: IDF-weighted share of the recipe's ingredients the pantry
+  covers, so a missing staple costs less than a missing rarity;
+* ``missing``: number of the recipe's ingredients the pantry lacks;
+* ``jaccard``: covered ingredients over the recipe's ingredients plus the
+  pantry items it does not use.
+
+A pantry item matches the ingredient with the same normalized name or, when
+there is none, every ingredient whose name contains all of its tokens
+("tomatoes" matches "cherry tomato"). Unlike the exact-match pass of the AI
+match endpoint, the ranker therefore has answers for near misses, and it
+stands in for the LLM when that is down or too slow.
+
+The matrix is derived from ``core.ingredient_index``, which the signal
+handlers keep current: recipes changed since the matrix was built are scored
+from a small overlay, and the matrix is rebuilt once the overlay grows past
+``MIN_OVERLAY`` recipes or ``OVERLAY_RATIO`` of the catalog.
+"""
+import math
+import threading
+from dataclasses import dataclass, field
+
+import numpy as np
+from scipy import sparse
+
+from .ingredient_index import ingredient_index, normalize_ingredient_name
+from .retrieval import tokenize
+
+ORDERINGS = ("coverage", "missing", "jaccard")
+MIN_OVERLAY = 256
+OVERLAY_RATIO = 0.01
+
+
+@dataclass
+class RankedRecipe:
+    """A recipe scored against a pantry"""
+
+    recipe_id: int
+    coverage: float
+    jaccard: float
+    matched: list = field(default_factory=list)
+    missing: list = field(default_factory=list)
+
+
+def sort_keys(order, coverage, missing, jaccard):
+    """Primary and secondary ascending sort keys of an ordering"""
+    if order == "missing":
+        return missing, -coverage
+    if order == "jaccard":
+        return -jaccard, missing
+    return -coverage, missing
+
+
+class IngredientMatrix:
+    """Recipes x ingredients 0/1 matrix with IDF weights"""
+
+    def __init__(self, recipes):
+        """``recipes``: ``{recipe_id: {normalized name: display name}}``"""
+        self.columns = {}
+        self.names = []
+        recipe_ids = []
+        indptr = [0]
+        indices = []
+        for recipe_id, ingredients in recipes.items():
+            if not ingredients:
+                continue
+            recipe_ids.append(recipe_id)
+            for normalized, display in ingredients.items():
+                column = self.columns.get(normalized)
+                if column is None:
+                    column = self.columns[normalized] = len(self.names)
+                    self.names.append(display)
+                indices.append(column)
+            indptr.append(len(indices))
+
+        self.recipe_ids = np.array(recipe_ids, dtype=np.int64)
+        self.rows = {recipe_id: row for row, recipe_id in enumerate(recipe_ids)}
+        shape = (len(recipe_ids), len(self.names))
+        self.csr = sparse.csr_matrix(
+            (np.ones(len(indices)), np.array(indices, dtype=np.int32), indptr),
+            shape=shape,
+        )
+        self.csc = self.csr.tocsc()
+        self.sizes = np.diff(self.csr.indptr)
+        document_frequency = np.bincount(self.csr.indices, minlength=shape[1])
+        self.idf = np.log((1 + shape[0]) / (1 + document_frequency)) + 1
+        self.unseen_idf = math.log(1 + shape[0]) + 1
+        self.weighted_sizes = self.csr @ self.idf
+
+        self._columns_by_token = {}
+        for normalized, column in self.columns.items():
+            for token in set(tokenize(normalized)):
+                self._columns_by_token.setdefault(token, set()).add(column)
+
+    def __len__(self):
+        return len(self.recipe_ids)
+
+    def columns_for(self, item):
+        """Columns a normalized pantry item matches"""
+        column = self.columns.get(item)
+        if column is not None:
+            return {column}
+        tokens = set(tokenize(item))
+        if not tokens:
+            return set()
+        postings = [self._columns_by_token.get(token, set()) for token in tokens]
+        return set.intersection(*postings)
+
+    def score(self, pantry_columns, live):
+        """
+        ``(rows, matched, items_hit, weighted)`` of the live recipes using at
+        least one of ``pantry_columns`` (one set of columns per pantry item)
+        """
+        columns = sorted(set().union(*pantry_columns))
+        if not columns:
+            empty = np.empty(0, dtype=np.int64)
+            return empty, empty, empty, np.empty(0)
+        position = {column: index for index, column in enumerate(columns)}
+        # columns x pantry items: which item each selected column stands for
+        links = [
+            (position[column], item)
+            for item, item_columns in enumerate(pantry_columns)
+            for column in item_columns
+        ]
+        column_items = sparse.csr_matrix(
+            (np.ones(len(links)), tuple(np.array(links).T)),
+            shape=(len(columns), len(pantry_columns)),
+        )
+        selected = self.csc[:, columns].tocsr()
+        matched = np.asarray(selected.sum(axis=1)).ravel()
+        rows = np.flatnonzero((matched > 0) & live)
+        selected = selected[rows]
+        items_hit = (selected @ column_items).getnnz(axis=1)
+        weighted = selected @ self.idf[columns]
+        return rows, matched[rows].astype(np.int64), items_hit, weighted
+
+    def ingredients(self, row):
+        """``[(column, display name)]`` of a row"""
+        start, end = self.csr.indptr[row], self.csr.indptr[row + 1]
+        return [(column, self.names[column]) for column in self.csr.indices[start:end]]
+
+
+class RecipeRanker:
+    """
+    Ranker following ``source``: ``ingredient_index``, or anything with the
+    same ``snapshot(since)``
+    """
+
+    def __init__(self, source=ingredient_index):
+        self.source = source
+        self._lock = threading.Lock()
+        self._stamp = None
+        self._matrix = None
+        self._live = None
+        # recipe id -> {normalized: display} of recipes changed since the
+        # matrix was built
+        self._overlay = {}
+
+    def invalidate(self):
+        """Drop the matrix; it is rebuilt on next use"""
+        with self._lock:
+            self._stamp = None
+            self._matrix = None
+            self._overlay = {}
+
+    def _sync(self):
+        stamp, full, recipes = self.source.snapshot(self._stamp)
+        if not full:
+            for recipe_id, ingredients in recipes.items():
+                row = self._matrix.rows.get(recipe_id)
+                if row is not None:
+                    self._live[row] = False
+                self._overlay[recipe_id] = ingredients
+            limit = max(MIN_OVERLAY, OVERLAY_RATIO * len(self._matrix))
+            if len(self._overlay) <= limit:
+                self._stamp = stamp
+                return
+            stamp, full, recipes = self.source.snapshot()
+        self._matrix = IngredientMatrix(recipes)
+        self._live = np.ones(len(self._matrix), dtype=bool)
+        self._overlay = {}
+        self._stamp = stamp
+
+    def rank(self, user_ingredients, limit=10, order="coverage"):
+        """
+        The ``limit`` best recipes for ``user_ingredients`` under ``order``
+        (one of ``ORDERINGS``), as ``RankedRecipe``. Ties go to the other
+        metric, then to the newest recipe.
+        """
+        pantry = []
+        for name in user_ingredients:
+            normalized = normalize_ingredient_name(name)
+            if normalized and normalized not in pantry:
+                pantry.append(normalized)
+        if not pantry or limit <= 0:
+            return []
+
+        with self._lock:
+            self._sync()
+            matrix = self._matrix
+            pantry_columns = [matrix.columns_for(item) for item in pantry]
+            rows, matched, items_hit, weighted = matrix.score(
+                pantry_columns, self._live
+            )
+            recipe_ids = matrix.recipe_ids[rows]
+            sizes = matrix.sizes[rows]
+            weighted_sizes = matrix.weighted_sizes[rows]
+            overlay = self._score_overlay(matrix, pantry, pantry_columns)
+
+            if overlay:
+                extra = np.array(overlay, dtype=float).T
+                recipe_ids = np.concatenate([recipe_ids, extra[0].astype(np.int64)])
+                matched = np.concatenate([matched, extra[1]])
+                items_hit = np.concatenate([items_hit, extra[2]])
+                weighted = np.concatenate([weighted, extra[3]])
+                sizes = np.concatenate([sizes, extra[4]])
+                weighted_sizes = np.concatenate([weighted_sizes, extra[5]])
+                rows = np.concatenate([rows, np.full(len(overlay), -1)])
+
+            coverage = weighted / weighted_sizes
+            missing = sizes - matched
+            jaccard = matched / (sizes + len(pantry) - items_hit)
+            primary, secondary = sort_keys(order, coverage, missing, jaccard)
+            if len(primary) > limit:
+                # Only the recipes tied with or above the limit-th are sorted
+                cutoff = np.partition(primary, limit - 1)[limit - 1]
+                keep = np.flatnonzero(primary <= cutoff)
+            else:
+                keep = np.arange(len(primary))
+            ordered = keep[
+                np.lexsort((-recipe_ids[keep], secondary[keep], primary[keep]))
+            ][:limit]
+
+            wanted = set().union(*pantry_columns)
+            results = []
+            for index in ordered:
+                recipe_id = int(recipe_ids[index])
+                if rows[index] >= 0:
+                    ingredients = matrix.ingredients(rows[index])
+                    used = [column in wanted for column, _ in ingredients]
+                else:
+                    overlay_ingredients = self._overlay[recipe_id]
+                    ingredients = list(overlay_ingredients.items())
+                    used = [
+                        bool(
+                            self._used_items(
+                                matrix, pantry, pantry_columns, normalized
+                            )
+                        )
+                        for normalized in overlay_ingredients
+                    ]
+                names = [name for _, name in ingredients]
+                results.append(
+                    RankedRecipe(
+                        recipe_id,
+                        coverage=float(coverage[index]),
+                        jaccard=float(jaccard[index]),
+                        matched=[name for name, hit in zip(names, used) if hit],
+                        missing=[name for name, hit in zip(names, used) if not hit],
+                    )
+                )
+            return results
+
+    # -------------------------------------------------
+    # Overlay (recipes changed since the matrix was built)
+    # -------------------------------------------------
+    @staticmethod
+    def _matches(matrix, item, item_columns, normalized):
+        """Whether pantry ``item`` matches an ingredient, as ``columns_for``"""
+        column = matrix.columns.get(normalized)
+        if column is not None:
+            return column in item_columns
+        # A name the matrix has not seen yet
+        return item == normalized or (
+            item not in matrix.columns
+            and set(tokenize(item)) <= set(tokenize(normalized))
+        )
+
+    def _used_items(self, matrix, pantry, pantry_columns, normalized):
+        return [
+            index
+            for index, (item, columns) in enumerate(zip(pantry, pantry_columns))
+            if self._matches(matrix, item, columns, normalized)
+        ]
+
+    def _score_overlay(self, matrix, pantry, pantry_columns):
+        """``[(recipe_id, matched, items_hit, weighted, size, weighted size)]``"""
+        scored = []
+        for recipe_id, ingredients in self._overlay.items():
+            matched = 0
+            weighted = weighted_size = 0.0
+            hit_items = set()
+            for normalized in ingredients:
+                column = matrix.columns.get(normalized)
+                idf = matrix.unseen_idf if column is None else matrix.idf[column]
+                weighted_size += idf
+                used = self._used_items(matrix, pantry, pantry_columns, normalized)
+                if used:
+                    matched += 1
+                    weighted += idf
+                    hit_items.update(used)
+            if matched:
+                scored.append(
+                    (
+                        recipe_id,
+                        matched,
+                        len(hit_items),
+                        weighted,
+                        len(ingredients),
+                        weighted_size,
+                    )
+                )
+        return scored
+
+
+recipe_ranker = RecipeRanker()
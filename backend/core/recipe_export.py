@@ -0,0 +1,39 @@
+"""
+Streaming export of the recipe catalog as NDJSON, one
+``RecipeDetailSerializer`` record per line.
+
+Recipes are walked with ``iterator(chunk_size=...)`` (a server-side cursor on
+PostgreSQL), and their instructions and ingredients are prefetched per chunk,
+so memory stays flat however large the catalog is. The output is the input
+format of ``core.recipe_import``.
+"""
+from rest_framework.utils.encoders import JSONEncoder
+
+from .models import Recipe
+from .serializers import RecipeDetailSerializer
+
+CONTENT_TYPE = "application/x-ndjson"
+
+
+def export_recipes(chunk_size=500, queryset=None):
+    """
+    Yield the catalog as NDJSON text, one block of up to ``chunk_size``
+    newline-terminated records at a time
+    """
+    if queryset is None:
+        queryset = Recipe.objects.all()
+    # One serializer for every record: building its fields is the slow part
+    serializer = RecipeDetailSerializer()
+    encoder = JSONEncoder(ensure_ascii=False)
+    recipes = queryset.for_detail().order_by("id").iterator(chunk_size=chunk_size)
+    block = []
+    for recipe in recipes:
+        block.append(encoder.encode(serializer.to_representation(recipe)))
+        # Prefetched rows point back at their recipe; dropping the cache breaks
+        # the cycle so every chunk is freed at once instead of by the GC
+        recipe._prefetched_objects_cache = {}
+        if len(block) == chunk_size:
+            yield "\n".join(block) + "\n"
+            block = []
+    if block:
+        yield "\n".join(block) + "\n"
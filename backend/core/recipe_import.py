@@ -0,0 +1,302 @@
+"""
+Bulk recipe import from JSON Lines or CSV, used by the import endpoint and
+``manage.py import_recipes``.
+
+Input is read as a stream and written in chunks: every row is validated
+with ``RecipeCreateSerializer``, valid rows of a chunk are inserted with
+``core.recipe_writer.create_recipes`` in one transaction, and ingredients and
+categories are resolved once for the whole batch. When a chunk fails at the
+database level its rows are retried one by one, so a single bad row only
+costs itself.
+
+JSON Lines rows use the ``POST /api/recipes/create/`` body, or the records
+written by the export (``core.recipe_export``). CSV rows have
+the columns ``title``, ``description``, ``preparation_duration``,
+``servings``, ``skill_level_id`` and ``category``, plus:
+
+* ``ingredients``: ``name: quantity`` pairs separated by ``;``
+  (``Flour: 200g; Eggs: 2``);
+* ``instructions``: one step per line, numbered in order.
+
+Either cell may instead hold the JSON list used by JSON Lines.
+"""
+import csv
+import itertools
+import json
+import time
+from dataclasses import dataclass, field
+
+from django.db import DatabaseError, transaction
+from rest_framework.exceptions import ValidationError
+
+from .models import SkillLevel
+from .recipe_writer import NameCache, create_recipes
+from .serializers import RecipeCreateSerializer
+from .signals import deferred_index_updates
+
+FORMATS = ("jsonl", "csv")
+
+
+class ImportFormatError(ValueError):
+    """The input cannot be read in the requested format"""
+
+
+# -------------------------------------------------
+# Readers: (line number, row, errors) triples
+# -------------------------------------------------
+def read_jsonl(lines):
+    for number, line in enumerate(lines, start=1):
+        if isinstance(line, bytes):
+            line = line.decode("utf-8")
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except json.JSONDecodeError as exc:
+            yield number, None, {"non_field_errors": [f"Invalid JSON: {exc.msg}"]}
+            continue
+        if not isinstance(row, dict):
+            yield number, None, {"non_field_errors": ["Expected a JSON object"]}
+            continue
+        try:
+            row = from_export_record(row)
+        except (KeyError, TypeError, AttributeError):
+            yield number, None, {"recipe_ingredients": ["Malformed export record"]}
+            continue
+        yield number, row, None
+
+
+def from_export_record(row):
+    """Turn a ``RecipeDetailSerializer`` record into a create-endpoint body"""
+    if "recipe_ingredients" not in row and not isinstance(row.get("category"), dict):
+        return row
+    row = dict(row)
+    category = row.pop("category", None)
+    if category:
+        row["category"] = category["name"] if isinstance(category, dict) else category
+    skill_level = row.pop("skill_level", None)
+    if isinstance(skill_level, dict):
+        row["skill_level_id"] = skill_level["id"]
+    if "recipe_ingredients" in row:
+        row["ingredients"] = [
+            {"name": item["ingredient"]["name"], "quantity": item["quantity"]}
+            for item in row.pop("recipe_ingredients")
+        ]
+    return row
+
+
+def _json_cell(value):
+    value = (value or "").strip()
+    if value.startswith("["):
+        return json.loads(value)
+    return None
+
+
+def parse_csv_ingredients(value):
+    """'Flour: 200g; Eggs' -> [{'name': 'Flour', 'quantity': '200g'}, ...]"""
+    items = _json_cell(value)
+    if items is not None:
+        return items
+    items = []
+    for part in (value or "").split(";"):
+        name, _, quantity = part.partition(":")
+        if name.strip():
+            items.append({"name": name.strip(), "quantity": quantity.strip()})
+    return items
+
+
+def parse_csv_instructions(value):
+    steps = _json_cell(value)
+    if steps is not None:
+        return steps
+    lines = [line.strip() for line in (value or "").splitlines() if line.strip()]
+    return [
+        {"step_number": number, "content": line}
+        for number, line in enumerate(lines, start=1)
+    ]
+
+
+def read_csv(lines):
+    lines = (
+        line.decode("utf-8") if isinstance(line, bytes) else line for line in lines
+    )
+    reader = csv.DictReader(lines)
+    if reader.fieldnames is None:
+        return
+    if "title" not in reader.fieldnames:
+        raise ImportFormatError("CSV input needs a header row with a 'title' column")
+    for row in reader:
+        number = reader.line_num
+        try:
+            data = {
+                key: value
+                for key, value in row.items()
+                if key and key not in ("ingredients", "instructions") and value != ""
+            }
+            data["ingredients"] = parse_csv_ingredients(row.get("ingredients"))
+            data["instructions"] = parse_csv_instructions(row.get("instructions"))
+        except json.JSONDecodeError as exc:
+            yield number, None, {"non_field_errors": [f"Invalid JSON cell: {exc.msg}"]}
+            continue
+        yield number, data, None
+
+
+def read_rows(lines, fmt):
+    if fmt == "jsonl":
+        return read_jsonl(lines)
+    if fmt == "csv":
+        return read_csv(lines)
+    raise ImportFormatError(f"Unknown import format {fmt!r}, expected one of {FORMATS}")
+
+
+# -------------------------------------------------
+# Importer
+# -------------------------------------------------
+@dataclass
+class ChunkReport:
+    chunk: int
+    rows: int
+    created: int
+    failed: int
+    seconds: float
+
+    @property
+    def rows_per_second(self):
+        return round(self.rows / self.seconds, 1) if self.seconds else None
+
+    def as_dict(self):
+        return {
+            "chunk": self.chunk,
+            "rows": self.rows,
+            "created": self.created,
+            "failed": self.failed,
+            "seconds": round(self.seconds, 4),
+            "rows_per_second": self.rows_per_second,
+        }
+
+
+@dataclass
+class ImportReport:
+    chunks: list = field(default_factory=list)
+    errors: list = field(default_factory=list)
+
+    @property
+    def created(self):
+        return sum(chunk.created for chunk in self.chunks)
+
+    @property
+    def failed(self):
+        return sum(chunk.failed for chunk in self.chunks)
+
+    def as_dict(self):
+        seconds = sum(chunk.seconds for chunk in self.chunks)
+        rows = self.created + self.failed
+        return {
+            "rows": rows,
+            "created": self.created,
+            "failed": self.failed,
+            "seconds": round(seconds, 4),
+            "rows_per_second": round(rows / seconds, 1) if seconds else None,
+            "chunks": [chunk.as_dict() for chunk in self.chunks],
+            "errors": self.errors,
+        }
+
+
+class RecipeImporter:
+    """
+    Validate and write recipe rows in chunks of ``chunk_size``.
+
+    ``on_chunk`` is called with every ``ChunkReport`` as soon as the chunk is
+    written (progress output); ``max_errors`` caps the rows kept in the
+    error report.
+    """
+
+    def __init__(self, author=None, chunk_size=500, on_chunk=None, max_errors=1000):
+        self.author = author
+        self.chunk_size = chunk_size
+        self.on_chunk = on_chunk
+        self.max_errors = max_errors
+        self.names = NameCache()
+        # One instance for every row: building a serializer's fields (deep
+        # copies) costs as much as validating a row
+        self.serializer = RecipeCreateSerializer()
+        self.skill_level_ids = None
+        self.last_error = None
+
+    def run(self, rows):
+        """Import ``(line number, row, errors)`` triples (see ``read_rows``)"""
+        report = ImportReport()
+        self.skill_level_ids = set(SkillLevel.objects.values_list("id", flat=True))
+        rows = iter(rows)
+        for number in itertools.count(1):
+            chunk = list(itertools.islice(rows, self.chunk_size))
+            if not chunk:
+                break
+            chunk_report = self.import_chunk(number, chunk, report)
+            report.chunks.append(chunk_report)
+            if self.on_chunk:
+                self.on_chunk(chunk_report)
+        return report
+
+    def add_error(self, report, line, errors):
+        if len(report.errors) < self.max_errors:
+            report.errors.append({"line": line, "errors": errors})
+
+    def validate(self, line, row, errors, report):
+        if errors:
+            self.add_error(report, line, errors)
+            return None
+        try:
+            data = self.serializer.run_validation(row)
+        except ValidationError as exc:
+            self.add_error(report, line, exc.detail)
+            return None
+        skill_level_id = data.get("skill_level_id")
+        if skill_level_id and skill_level_id not in self.skill_level_ids:
+            errors = {"skill_level_id": [f"Unknown skill level {skill_level_id}"]}
+            self.add_error(report, line, errors)
+            return None
+        return data
+
+    def import_chunk(self, number, chunk, report):
+        start = time.perf_counter()
+        valid = []
+        for line, row, errors in chunk:
+            data = self.validate(line, row, errors, report)
+            if data is not None:
+                valid.append((line, data))
+
+        created = self.write([data for _, data in valid])
+        if created is None:
+            # Isolate the offending rows: one transaction per row
+            created = 0
+            for line, data in valid:
+                if self.write([data]) is None:
+                    self.add_error(
+                        report, line, {"non_field_errors": [self.last_error]}
+                    )
+                else:
+                    created += 1
+
+        return ChunkReport(
+            chunk=number,
+            rows=len(chunk),
+            created=created,
+            failed=len(chunk) - created,
+            seconds=time.perf_counter() - start,
+        )
+
+    def write(self, rows):
+        """Number of recipes created, or ``None`` if the transaction failed"""
+        if not rows:
+            return 0
+        try:
+            with deferred_index_updates() as pending, transaction.atomic():
+                recipes = create_recipes(rows, author=self.author, cache=self.names)
+                pending.add([recipe.id for recipe in recipes])
+        except DatabaseError as exc:
+            # Cached names may point at rows that were just rolled back
+            self.names.clear()
+            self.last_error = f"Database error: {exc}"
+            return None
+        return len(recipes)
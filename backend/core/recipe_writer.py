@@ -0,0 +1,182 @@
+"""
+Set-based recipe writes shared by ``RecipeCreateSerializer`` and the bulk
+import: ingredients, categories and skill levels are resolved with one query
+per table for the whole batch, and rows are inserted with ``bulk_create``.
+
+Callers own the transaction and the index refresh (see
+``core.signals.deferred_index_updates``); ``bulk_create`` sends no signals.
+"""
+from django.db import connection
+
+from .models import (
+    Category,
+    Ingredient,
+    Instruction,
+    Recipe,
+    RecipeIngredient,
+    SkillLevel,
+)
+from .normalization import normalize_name
+from .quantities import quantity_fields
+
+RECIPE_FIELDS = ("title", "description", "preparation_duration", "servings")
+
+
+def _normalized(names):
+    """First spelling of every distinct name, keyed by its normalized form"""
+    spellings = {}
+    for name in names:
+        key = normalize_name(name)
+        if key:
+            spellings.setdefault(key, name.strip())
+    return spellings
+
+
+def _insert_names(model, spellings):
+    """
+    Insert ``{normalized name: spelling}``, tolerating rows that another
+    transaction inserted first; returns the instances for every name
+    """
+    instances = [
+        model(name=name, **model.name_fields(name)) for name in spellings.values()
+    ]
+    features = connection.features
+    if (
+        features.can_return_rows_from_bulk_insert
+        and features.supports_update_conflicts_with_target
+    ):
+        # The no-op update makes the conflicting rows return their id too
+        return model.objects.bulk_create(
+            instances,
+            update_conflicts=True,
+            unique_fields=["normalized_name"],
+            update_fields=["normalized_name"],
+        )
+    model.objects.bulk_create(instances, ignore_conflicts=True)
+    return model.objects.filter(normalized_name__in=list(spellings))
+
+
+def _resolve_by_name(model, names, cache=None):
+    """
+    ``{normalized name: instance}``, inserting the missing names with their
+    first spelling. Lookups go through the unique ``normalized_name`` index.
+
+    ``cache`` (a dict of the same shape) is consulted first and updated, so
+    a batch split into chunks looks each name up only once.
+    """
+    if cache is None:
+        cache = {}
+    spellings = _normalized(names)
+    found = {key: cache[key] for key in spellings if key in cache}
+    lookup = [key for key in spellings if key not in found]
+    if not lookup:
+        return found
+
+    for instance in model.objects.filter(normalized_name__in=lookup):
+        found[instance.normalized_name] = instance
+
+    missing = {key: spellings[key] for key in lookup if key not in found}
+    if missing:
+        for instance in _insert_names(model, missing):
+            found[instance.normalized_name] = instance
+    cache.update(found)
+    return found
+
+
+def resolve_ingredients(names, cache=None):
+    return _resolve_by_name(Ingredient, names, cache)
+
+
+def resolve_categories(names, cache=None):
+    return _resolve_by_name(Category, names, cache)
+
+
+def resolve_skill_levels(ids):
+    """``{id: SkillLevel}``; raises ``SkillLevel.DoesNotExist`` for unknown ids"""
+    ids = {skill_level_id for skill_level_id in ids if skill_level_id}
+    skill_levels = SkillLevel.objects.in_bulk(ids)
+    unknown = ids - set(skill_levels)
+    if unknown:
+        raise SkillLevel.DoesNotExist(
+            f"SkillLevel matching query does not exist: {sorted(unknown)}"
+        )
+    return skill_levels
+
+
+class NameCache:
+    """Ingredients and categories already resolved, by normalized name"""
+
+    def __init__(self):
+        self.ingredients = {}
+        self.categories = {}
+
+    def clear(self):
+        """Forget everything, e.g. after rolling back rows it referenced"""
+        self.ingredients.clear()
+        self.categories.clear()
+
+
+def _insert_recipes(recipes):
+    if connection.features.can_return_rows_from_bulk_insert:
+        return Recipe.objects.bulk_create(recipes)
+    for recipe in recipes:
+        recipe.save()
+    return recipes
+
+
+def create_recipes(rows, author=None, cache=None):
+    """
+    Create recipes from validated ``RecipeCreateSerializer`` data.
+
+    Runs a constant number of queries whatever the number of recipes,
+    ingredients and steps, and returns the new ``Recipe`` objects in input
+    order. Must run inside a transaction. ``cache`` is a ``NameCache``
+    shared by the chunks of one batch.
+    """
+    cache = cache or NameCache()
+    categories = resolve_categories(
+        (row.get("category") for row in rows), cache.categories
+    )
+    skill_levels = resolve_skill_levels(row.get("skill_level_id") for row in rows)
+    ingredients = resolve_ingredients(
+        (item.get("name") for row in rows for item in row.get("ingredients", [])),
+        cache.ingredients,
+    )
+
+    recipes = _insert_recipes(
+        [
+            Recipe(
+                category=categories.get(normalize_name(row.get("category"))),
+                skill_level=skill_levels.get(row.get("skill_level_id")),
+                author=author,
+                **{field: row[field] for field in RECIPE_FIELDS if field in row},
+            )
+            for row in rows
+        ]
+    )
+
+    recipe_ingredients = []
+    instructions = []
+    for recipe, row in zip(recipes, rows):
+        for item in row.get("ingredients", []):
+            key = normalize_name(item.get("name"))
+            if not key:
+                continue
+            recipe_ingredients.append(
+                RecipeIngredient(
+                    recipe=recipe,
+                    ingredient=ingredients[key],
+                    **quantity_fields(item.get("quantity") or ""),
+                )
+            )
+        for step in row.get("instructions", []):
+            instructions.append(
+                Instruction(
+                    recipe=recipe,
+                    step_number=step.get("step_number"),
+                    content=step.get("content", ""),
+                )
+            )
+    RecipeIngredient.objects.bulk_create(recipe_ingredients)
+    Instruction.objects.bulk_create(instructions)
+    return recipes
@@ -0,0 +1,67 @@
+"""
+JSON rendering through ``orjson`` with DRF's exact output.
+
+``FastJSONRenderer`` is a drop-in replacement for DRF's ``JSONRenderer``: the
+bytes are the same (compact separators, UTF-8 instead of ``\\uXXXX``
+escapes, escaped U+2028/U+2029, DRF's encoder for dates, decimals and other
+non-JSON types), only produced by a C encoder that skips the per-object
+Python calls. Anything orjson renders differently falls back to DRF:
+
+* floats outside ``[1e-4, 1e16)``, which Python writes as ``1e+16`` and
+  orjson as ``1e16``;
+* integers wider than 64 bits, non-string keys and dataclasses, which orjson
+  refuses;
+* indented output (``?format=json; indent=4``, the browsable API).
+
+Non-finite floats are the one gap: orjson writes ``null`` where DRF raises.
+Without orjson installed the renderer is DRF's own.
+"""
+import re
+
+from rest_framework.renderers import JSONRenderer
+
+from .instrumentation import timed
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional speed-up
+    orjson = None
+
+ORJSON_OPTIONS = (
+    orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS
+    if orjson is not None
+    else 0
+)
+# A digit followed by an exponent: "1e16", "2.5e-7" (or the same text inside
+# a string, which only costs a fallback)
+EXPONENT_RE = re.compile(rb"\de-?\d")
+LINE_SEPARATORS = ((b"\xe2\x80\xa8", b"\\u2028"), (b"\xe2\x80\xa9", b"\\u2029"))
+
+
+class FastJSONRenderer(JSONRenderer):
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        with timed("serialize"):
+            return self._render(data, accepted_media_type, renderer_context)
+
+    def _render(self, data, accepted_media_type, renderer_context):
+        if (
+            orjson is None
+            or data is None
+            or self.ensure_ascii
+            or not self.compact
+            or self.get_indent(accepted_media_type, renderer_context or {})
+        ):
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            ret = orjson.dumps(
+                data, default=self.encoder_class().default, option=ORJSON_OPTIONS
+            )
+        except TypeError:
+            # orjson.JSONEncodeError: let DRF render it, or raise its own error
+            return super().render(data, accepted_media_type, renderer_context)
+        if EXPONENT_RE.search(ret):
+            return super().render(data, accepted_media_type, renderer_context)
+        for raw, escaped in LINE_SEPARATORS:
+            if raw in ret:
+                ret = ret.replace(raw, escaped)
+        return ret
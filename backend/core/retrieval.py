@@ -0,0 +1,194 @@
+"""
+Lightweight lexical retrieval used to shortlist recipes locally: BM25 over
+tokens, and typo-tolerant lookup of names in a vocabulary (trigrams).
+
+Scores are computed from incrementally maintained inverted indexes, so a
+query touches only the postings of its own tokens or trigrams instead of the
+whole catalog.
+"""
+import heapq
+import math
+import re
+from collections import Counter
+
+from .normalization import singularize
+
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text):
+    """Lowercase words, singularized like canonical ingredient names"""
+    return [singularize(token) for token in TOKEN_RE.findall((text or "").lower())]
+
+
+class BM25Index:
+    """In-memory Okapi BM25 index over arbitrary documents (lists of tokens)"""
+
+    def __init__(self, k1=1.2, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self._postings = {}  # token -> {doc_id: term frequency}
+        self._doc_lengths = {}
+        self._total_length = 0
+
+    def __len__(self):
+        return len(self._doc_lengths)
+
+    def __contains__(self, doc_id):
+        return doc_id in self._doc_lengths
+
+    def clear(self):
+        self._postings = {}
+        self._doc_lengths = {}
+        self._total_length = 0
+
+    def remove(self, doc_id):
+        length = self._doc_lengths.pop(doc_id, None)
+        if length is None:
+            return
+        self._total_length -= length
+        for token in list(self._postings):
+            docs = self._postings[token]
+            if docs.pop(doc_id, None) is not None and not docs:
+                del self._postings[token]
+
+    def replace(self, doc_id, tokens, previous_tokens=None):
+        """
+        Index ``tokens`` as the content of ``doc_id``.
+
+        Passing the document's ``previous_tokens`` avoids a scan of every
+        posting list when removing the old version.
+        """
+        if previous_tokens is not None and doc_id in self._doc_lengths:
+            self._total_length -= self._doc_lengths.pop(doc_id)
+            for token in set(previous_tokens):
+                docs = self._postings.get(token)
+                if docs is not None:
+                    docs.pop(doc_id, None)
+                    if not docs:
+                        del self._postings[token]
+        else:
+            self.remove(doc_id)
+
+        if not tokens:
+            return
+        for token, frequency in Counter(tokens).items():
+            self._postings.setdefault(token, {})[doc_id] = frequency
+        self._doc_lengths[doc_id] = len(tokens)
+        self._total_length += len(tokens)
+
+    def scores(self, query_tokens):
+        """BM25 score of every document matching at least one query token"""
+        doc_count = len(self._doc_lengths)
+        if not doc_count:
+            return {}
+        avg_length = self._total_length / doc_count
+        scores = {}
+        for token in set(query_tokens):
+            docs = self._postings.get(token)
+            if not docs:
+                continue
+            idf = math.log(1 + (doc_count - len(docs) + 0.5) / (len(docs) + 0.5))
+            for doc_id, frequency in docs.items():
+                norm = self.k1 * (
+                    1 - self.b + self.b * self._doc_lengths[doc_id] / avg_length
+                )
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * (
+                    frequency * (self.k1 + 1) / (frequency + norm)
+                )
+        return scores
+
+    def top(self, query_tokens, k):
+        """``[(doc_id, score), ...]`` for the ``k`` best documents"""
+        scores = self.scores(query_tokens)
+        return heapq.nsmallest(k, scores.items(), key=lambda item: (-item[1], -item[0]))
+
+
+def trigrams(term):
+    """Character trigrams of ``term``, padded so both ends count"""
+    padded = f"  {term} "
+    return {padded[index : index + 3] for index in range(len(padded) - 2)}
+
+
+def edit_distance(first, second, limit):
+    """
+    Damerau-Levenshtein distance (adjacent transpositions count as one edit),
+    or ``limit + 1`` as soon as it is known to exceed ``limit``
+    """
+    if abs(len(first) - len(second)) > limit:
+        return limit + 1
+    previous = None
+    row = list(range(len(second) + 1))
+    for i, char in enumerate(first, 1):
+        before, previous, row = previous, row, [i] + [0] * len(second)
+        for j, other in enumerate(second, 1):
+            row[j] = min(
+                previous[j] + 1,
+                row[j - 1] + 1,
+                previous[j - 1] + (char != other),
+            )
+            if (
+                before is not None
+                and j > 1
+                and char == second[j - 2]
+                and first[i - 2] == other
+            ):
+                row[j] = min(row[j], before[j - 2] + 1)
+        if min(row) > limit:
+            return limit + 1
+    return row[-1]
+
+
+class TrigramIndex:
+    """
+    Vocabulary searchable by edit distance. Candidates come from the trigram
+    postings (an edit changes at most three trigrams, so a term within ``k``
+    edits shares all but ``3 * k`` of the query's) and are then verified.
+    """
+
+    def __init__(self, terms=()):
+        self._postings = {}  # trigram -> terms
+        self._terms = set()
+        for term in terms:
+            self.add(term)
+
+    def __len__(self):
+        return len(self._terms)
+
+    def __contains__(self, term):
+        return term in self._terms
+
+    def add(self, term):
+        if term in self._terms:
+            return
+        self._terms.add(term)
+        for gram in trigrams(term):
+            self._postings.setdefault(gram, set()).add(term)
+
+    def discard(self, term):
+        if term not in self._terms:
+            return
+        self._terms.discard(term)
+        for gram in trigrams(term):
+            terms = self._postings.get(gram)
+            if terms is not None:
+                terms.discard(term)
+                if not terms:
+                    del self._postings[gram]
+
+    def closest(self, term, max_distance):
+        """``[(distance, term)]`` within ``max_distance`` edits, nearest first"""
+        grams = trigrams(term)
+        shared = Counter()
+        for gram in grams:
+            shared.update(self._postings.get(gram, ()))
+        needed = len(grams) - 3 * max_distance
+        found = []
+        for candidate, count in shared.items():
+            if count < needed or candidate == term:
+                continue
+            distance = edit_distance(term, candidate, max_distance)
+            if distance <= max_distance:
+                found.append((distance, candidate))
+        found.sort()
+        return found
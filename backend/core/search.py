@@ -0,0 +1,481 @@
+"""
+Full-text recipe search.
+
+Every recipe is indexed as a small document: its title plus a body made of
+the description, ingredient names and instruction steps. Three backends
+implement the same interface:
+
+* ``SQLiteSearchBackend``: an FTS5 virtual table ranked with ``bm25()``;
+* ``PostgresSearchBackend``: a ``tsvector`` side table with a GIN index,
+  ranked with ``ts_rank``;
+* ``PythonSearchBackend``: a process-local BM25 index (``core.retrieval``),
+  used when the database offers neither.
+
+The side tables are created by migration ``0005_recipe_search_index``. The
+active backend follows the database vendor, or ``RECIPE_SEARCH_BACKEND``
+(dotted path) when set, and is kept up to date by ``core.signals``. Queries
+are widened with ingredient aliases and typo corrections (``expand_query``)
+before they reach a backend.
+"""
+import re
+import threading
+import time
+
+from django.apps import apps as global_apps
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.db import DatabaseError, connections, transaction
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+
+from .catalog import catalog_version
+from .ingredient_index import get_setting as get_index_setting, ingredient_index
+from .normalization import canonical_ingredient_name, singularize
+from .retrieval import BM25Index, tokenize
+
+QUERY_TOKEN_RE = re.compile(r"[^\W_]+")
+
+
+def query_terms(query):
+    """Search terms of a user query, safe to splice into FTS/tsquery syntax"""
+    return QUERY_TOKEN_RE.findall((query or "").lower())
+
+
+def expand_query(query):
+    """
+    ``query`` plus the canonical spelling of the ingredient aliases in it
+    ("aubergine" adds "eggplant") and corrections of words no ingredient
+    uses ("chiken" adds "chicken"). Terms are OR-ed, so this only widens the
+    hits.
+    """
+    terms = query_terms(query)
+    words = canonical_ingredient_name(" ".join(terms)).split()
+    seen = {singularize(term) for term in terms}
+    extra = []
+    for word in words + ingredient_index.correct_words(words):
+        if singularize(word) not in seen:
+            seen.add(singularize(word))
+            extra.append(word)
+    return " ".join([query, *extra])
+
+
+def get_max_results():
+    """Upper bound on ranked hits computed for one query (all pages)"""
+    return getattr(settings, "RECIPE_SEARCH_MAX_RESULTS", 1000)
+
+
+def recipe_documents(recipe_ids=None, apps=global_apps):
+    """
+    ``(recipe_id, title, body)`` for the given recipes (all when ``None``).
+
+    Three queries regardless of the number of recipes. ``apps`` lets
+    migrations pass their historical app registry.
+    """
+    Recipe = apps.get_model("core", "Recipe")
+    RecipeIngredient = apps.get_model("core", "RecipeIngredient")
+    Instruction = apps.get_model("core", "Instruction")
+
+    recipes = Recipe.objects.order_by("id")
+    ingredients = RecipeIngredient.objects.order_by("recipe_id", "id")
+    instructions = Instruction.objects.order_by("recipe_id", "step_number")
+    if recipe_ids is not None:
+        recipes = recipes.filter(id__in=recipe_ids)
+        ingredients = ingredients.filter(recipe_id__in=recipe_ids)
+        instructions = instructions.filter(recipe_id__in=recipe_ids)
+
+    parts = {}
+    for recipe_id, name in ingredients.values_list(
+        "recipe_id", "ingredient__name"
+    ).iterator(chunk_size=2000):
+        parts.setdefault(recipe_id, ([], []))[0].append(name)
+    for recipe_id, content in instructions.values_list(
+        "recipe_id", "content"
+    ).iterator(chunk_size=2000):
+        parts.setdefault(recipe_id, ([], []))[1].append(content)
+
+    for recipe_id, title, description in recipes.values_list(
+        "id", "title", "description"
+    ).iterator(chunk_size=2000):
+        names, steps = parts.get(recipe_id, ([], []))
+        body = "\n".join([description or "", " ".join(names), *steps])
+        yield recipe_id, title, body
+
+
+class SearchBackend:
+    """
+    Interface of a recipe search backend.
+
+    ``search()`` returns ``[(recipe_id, rank), ...]``, best first, where a
+    higher rank means a more relevant recipe.
+    """
+
+    name = "base"
+
+    def __init__(self, using="default"):
+        self.using = using
+
+    @property
+    def connection(self):
+        return connections[self.using]
+
+    def search(self, query, limit):
+        raise NotImplementedError
+
+    def write(self, documents):
+        """Insert or replace ``(recipe_id, title, body)`` documents"""
+        raise NotImplementedError
+
+    def remove_recipe(self, recipe_id):
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+    def refresh_recipe(self, recipe_id):
+        self.refresh_recipes([recipe_id])
+
+    def follow_write(self, version):
+        """This process moved the catalog to ``version``; tables need not know"""
+
+    def refresh_recipes(self, recipe_ids):
+        recipe_ids = set(recipe_ids)
+        documents = list(recipe_documents(recipe_ids))
+        self.write(documents)
+        for recipe_id in recipe_ids - {document[0] for document in documents}:
+            self.remove_recipe(recipe_id)
+
+    def rebuild(self, batch_size=2000):
+        # One transaction: searches never see a half-empty index, and SQLite
+        # does not sync the file after every statement
+        with transaction.atomic(using=self.using):
+            self.clear()
+            batch = []
+            for document in recipe_documents():
+                batch.append(document)
+                if len(batch) == batch_size:
+                    self.write(batch)
+                    batch = []
+            self.write(batch)
+
+
+class SQLiteSearchBackend(SearchBackend):
+    """FTS5 table keyed by recipe id (rowid), Porter-stemmed"""
+
+    name = "sqlite-fts5"
+    table = "core_recipe_fts"
+    # Title matches weigh more than matches in the body
+    weights = (5.0, 1.0)
+
+    def install(self):
+        """Create the FTS5 table; ``False`` when SQLite lacks FTS5"""
+        try:
+            with self.connection.cursor() as cursor:
+                cursor.execute(
+                    f"CREATE VIRTUAL TABLE IF NOT EXISTS {self.table} "
+                    f"USING fts5(title, body, tokenize='porter unicode61')"
+                )
+        except DatabaseError:
+            return False
+        return True
+
+    def uninstall(self):
+        with self.connection.cursor() as cursor:
+            cursor.execute(f"DROP TABLE IF EXISTS {self.table}")
+
+    def is_installed(self):
+        return self.table in self.connection.introspection.table_names()
+
+    def search(self, query, limit):
+        terms = query_terms(query)
+        if not terms:
+            return []
+        match = " OR ".join(f'"{term}"' for term in terms)
+        bm25 = f"bm25({self.table}, {self.weights[0]}, {self.weights[1]})"
+        with self.connection.cursor() as cursor:
+            # bm25() is lower-is-better; negate it so rank grows with relevance
+            cursor.execute(
+                f"SELECT rowid, -{bm25} FROM {self.table} "
+                f"WHERE {self.table} MATCH %s ORDER BY {bm25}, rowid DESC LIMIT %s",
+                [match, limit],
+            )
+            return cursor.fetchall()
+
+    def write(self, documents):
+        documents = list(documents)
+        if not documents:
+            return
+        with transaction.atomic(using=self.using), self.connection.cursor() as cursor:
+            cursor.executemany(
+                f"DELETE FROM {self.table} WHERE rowid = %s",
+                [(recipe_id,) for recipe_id, _, _ in documents],
+            )
+            cursor.executemany(
+                f"INSERT INTO {self.table} (rowid, title, body) VALUES (%s, %s, %s)",
+                documents,
+            )
+
+    def remove_recipe(self, recipe_id):
+        with self.connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {self.table} WHERE rowid = %s", [recipe_id])
+
+    def clear(self):
+        with self.connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {self.table}")
+
+
+class PostgresSearchBackend(SearchBackend):
+    """``tsvector`` side table with a GIN index (title weighted A, body B)"""
+
+    name = "postgres"
+    table = "core_recipe_search"
+    config = "english"
+
+    def install(self):
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                f"CREATE TABLE IF NOT EXISTS {self.table} ("
+                f"recipe_id integer PRIMARY KEY "
+                f"REFERENCES core_recipe (id) ON DELETE CASCADE "
+                f"DEFERRABLE INITIALLY DEFERRED, "
+                f"document tsvector NOT NULL)"
+            )
+            cursor.execute(
+                f"CREATE INDEX IF NOT EXISTS {self.table}_document_gin "
+                f"ON {self.table} USING GIN (document)"
+            )
+        return True
+
+    def uninstall(self):
+        with self.connection.cursor() as cursor:
+            cursor.execute(f"DROP TABLE IF EXISTS {self.table}")
+
+    def is_installed(self):
+        return self.table in self.connection.introspection.table_names()
+
+    def search(self, query, limit):
+        terms = query_terms(query)
+        if not terms:
+            return []
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT recipe_id, ts_rank(document, query) AS rank "
+                f"FROM {self.table}, to_tsquery(%s, %s) query "
+                f"WHERE document @@ query "
+                f"ORDER BY rank DESC, recipe_id DESC LIMIT %s",
+                [self.config, " | ".join(terms), limit],
+            )
+            return cursor.fetchall()
+
+    def write(self, documents):
+        documents = list(documents)
+        if not documents:
+            return
+        with self.connection.cursor() as cursor:
+            cursor.executemany(
+                f"INSERT INTO {self.table} (recipe_id, document) VALUES (%s, "
+                f"setweight(to_tsvector(%s, %s), 'A') || "
+                f"setweight(to_tsvector(%s, %s), 'B')) "
+                f"ON CONFLICT (recipe_id) DO UPDATE SET document = EXCLUDED.document",
+                [
+                    (recipe_id, self.config, title, self.config, body)
+                    for recipe_id, title, body in documents
+                ],
+            )
+
+    def remove_recipe(self, recipe_id):
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                f"DELETE FROM {self.table} WHERE recipe_id = %s", [recipe_id]
+            )
+
+    def clear(self):
+        with self.connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {self.table}")
+
+
+class PythonSearchBackend(SearchBackend):
+    """
+    Process-local BM25 index, built lazily from the database on first search.
+    Title tokens are counted twice so title matches outrank body matches.
+
+    Like the ingredient index, it follows other processes' writes by the
+    catalog version, checked at most once per ``INGREDIENT_INDEX
+    ["CHECK_INTERVAL"]`` seconds, and is rebuilt when it moved.
+    """
+
+    name = "python"
+
+    def __init__(self, using="default"):
+        super().__init__(using)
+        self._lock = threading.RLock()
+        self._built = False
+        self._bm25 = BM25Index()
+        # Catalog version the index reflects, and when to check it next
+        self._catalog_version = None
+        self._next_check = 0.0
+        self._check_lock = threading.Lock()
+
+    def _tokens(self, title, body):
+        title_tokens = tokenize(title)
+        return title_tokens + title_tokens + tokenize(body)
+
+    def ensure_built(self):
+        if not self._built:
+            with self._lock:
+                if not self._built:
+                    self.rebuild()
+            return
+        if time.monotonic() >= self._next_check:
+            self._follow_catalog()
+
+    def _follow_catalog(self):
+        """Rebuild if another process changed the catalog since the build"""
+        # One thread checks; the others keep using the current index
+        if not self._check_lock.acquire(blocking=False):
+            return
+        try:
+            self._next_check = time.monotonic() + get_index_setting("CHECK_INTERVAL")
+            if catalog_version()[0] != self._catalog_version:
+                self.rebuild()
+        finally:
+            self._check_lock.release()
+
+    def follow_write(self, version):
+        """
+        Only a version skipping none is this process's write alone, applied
+        by the signal handlers (see ``IngredientIndex.follow_write``)
+        """
+        if self._check_lock.locked():
+            return
+        with self._lock:
+            if self._catalog_version is not None and (
+                version == self._catalog_version + 1
+            ):
+                self._catalog_version = version
+
+    def search(self, query, limit):
+        self.ensure_built()
+        with self._lock:
+            return self._bm25.top(tokenize(query), limit)
+
+    def write(self, documents):
+        with self._lock:
+            for recipe_id, title, body in documents:
+                self._bm25.replace(recipe_id, self._tokens(title, body))
+
+    def refresh_recipes(self, recipe_ids):
+        # Nothing to keep in sync until the index is first used
+        if self._built:
+            super().refresh_recipes(recipe_ids)
+
+    def remove_recipe(self, recipe_id):
+        with self._lock:
+            self._bm25.remove(recipe_id)
+
+    def clear(self):
+        with self._lock:
+            self._bm25 = BM25Index()
+
+    def rebuild(self, batch_size=None):
+        # Read first: a write landing during the build moves it again
+        version = catalog_version()[0]
+        bm25 = BM25Index()
+        for recipe_id, title, body in recipe_documents():
+            bm25.replace(recipe_id, self._tokens(title, body))
+        with self._lock:
+            self._bm25 = bm25
+            self._built = True
+            self._catalog_version = version
+            self._next_check = time.monotonic() + get_index_setting("CHECK_INTERVAL")
+
+    def invalidate(self):
+        with self._lock:
+            self._built = False
+            self._bm25 = BM25Index()
+            self._catalog_version = None
+
+
+NATIVE_BACKENDS = {
+    "sqlite": SQLiteSearchBackend,
+    "postgresql": PostgresSearchBackend,
+}
+
+
+def native_backend(connection):
+    """The in-database backend for ``connection``'s vendor, or ``None``"""
+    backend_class = NATIVE_BACKENDS.get(connection.vendor)
+    return backend_class(using=connection.alias) if backend_class else None
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def _build_backend():
+    path = getattr(settings, "RECIPE_SEARCH_BACKEND", "")
+    if path:
+        return import_string(path)()
+    backend = native_backend(connections["default"])
+    if backend is not None and backend.is_installed():
+        return backend
+    return PythonSearchBackend()
+
+
+def get_search_backend():
+    """The active search backend (chosen once per process)"""
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                _backend = _build_backend()
+    return _backend
+
+
+def reset_search_backend():
+    global _backend
+    with _backend_lock:
+        _backend = None
+
+
+@receiver(setting_changed)
+def _reset_on_setting_changed(setting, **kwargs):
+    if setting in ("RECIPE_SEARCH_BACKEND", "DATABASES"):
+        reset_search_backend()
+
+
+class RankedRecipes:
+    """
+    Lazy, sliceable sequence of search hits for the paginator: only the
+    recipes of the requested page are loaded, each with a ``rank``
+    attribute.
+    """
+
+    def __init__(self, hits, queryset):
+        self.hits = hits
+        self.queryset = queryset
+
+    def __len__(self):
+        return len(self.hits)
+
+    def count(self):
+        return len(self.hits)
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            return self[index : index + 1][0]
+        hits = self.hits[index]
+        recipes = self.queryset.in_bulk([recipe_id for recipe_id, _ in hits])
+        page = []
+        for recipe_id, rank in hits:
+            recipe = recipes.get(recipe_id)
+            if recipe is not None:
+                recipe.rank = round(rank, 6)
+                page.append(recipe)
+        return page
+
+
+def search_recipes(query, queryset, limit=None):
+    """Relevance-ranked ``RankedRecipes`` over ``queryset`` for ``query``"""
+    query = expand_query(query)
+    hits = get_search_backend().search(query, limit or get_max_results())
+    return RankedRecipes(hits, queryset)
@@ -1,5 +1,6 @@
 from rest_framework import serializers
 from django.contrib.auth.models import User
+from django.db import transaction
 from .models import (
     Recipe,
     Instruction,
@@ -8,6 +9,14 @@ from .models import (
     SkillLevel,
     Category,
 )
+from .instrumentation import TimedSerializerMixin
+from .quantities import format_quantity
+from .recipe_writer import create_recipes
+from .signals import deferred_index_updates
+
+
+class TimedListSerializer(TimedSerializerMixin, serializers.ListSerializer):
+    """``many=True`` counterpart of the timed response serializers"""
 
 
 # -------------------------------------------------
@@ -41,13 +50,14 @@ class UserInfoSerializer(serializers.ModelSerializer):
 # -------------------------------------------------
 # Lightweight serializer for lists / landing page
 # -------------------------------------------------
-class RecipeListSerializer(serializers.ModelSerializer):
+class RecipeListSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     category = CategorySerializer()
     skill_level = SkillLevelSerializer()
     author = UserInfoSerializer(read_only=True)
 
     class Meta:
         model = Recipe
+        list_serializer_class = TimedListSerializer
         fields = [
             "id",
             "title",
@@ -60,15 +70,53 @@ class RecipeListSerializer(serializers.ModelSerializer):
         ]
 
 
+class RecipeSearchResultSerializer(RecipeListSerializer):
+    """List fields plus the relevance score of a search hit"""
+    rank = serializers.FloatField(read_only=True, allow_null=True)
+
+    class Meta(RecipeListSerializer.Meta):
+        fields = RecipeListSerializer.Meta.fields + ["rank"]
+
+
 # -------------------------------------------------
 # Detailed serializer for recipe detail page
 # -------------------------------------------------
-class RecipeIngredientSerializer(serializers.ModelSerializer):
+class RecipeIngredientSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     ingredient = IngredientSerializer()
 
     class Meta:
         model = RecipeIngredient
-        fields = ["id", "ingredient", "quantity"]
+        list_serializer_class = TimedListSerializer
+        fields = ["id", "ingredient", "quantity", "amount", "amount_max", "unit"]
+
+
+class ScaledRecipeIngredientSerializer(RecipeIngredientSerializer):
+    """
+    Stored amounts multiplied by ``context["factor"]``. Quantities that could
+    not be parsed ("to taste") keep their text and a null amount.
+    """
+    amount = serializers.SerializerMethodField()
+    amount_max = serializers.SerializerMethodField()
+    scaled_quantity = serializers.SerializerMethodField()
+
+    class Meta(RecipeIngredientSerializer.Meta):
+        fields = RecipeIngredientSerializer.Meta.fields + ["scaled_quantity"]
+
+    def scale(self, value):
+        return None if value is None else round(value * self.context["factor"], 4)
+
+    def get_amount(self, obj):
+        return self.scale(obj.amount)
+
+    def get_amount_max(self, obj):
+        return self.scale(obj.amount_max)
+
+    def get_scaled_quantity(self, obj):
+        if obj.amount is None:
+            return obj.quantity
+        return format_quantity(
+            self.get_amount(obj), self.get_amount_max(obj), obj.unit
+        )
 
 
 class InstructionSerializer(serializers.ModelSerializer):
@@ -77,7 +125,7 @@ class InstructionSerializer(serializers.ModelSerializer):
         fields = ["id", "step_number", "content"]
 
 
-class RecipeDetailSerializer(serializers.ModelSerializer):
+class RecipeDetailSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     category = CategorySerializer()
     skill_level = SkillLevelSerializer()
     author = UserInfoSerializer(read_only=True)
@@ -96,6 +144,7 @@ class RecipeDetailSerializer(serializers.ModelSerializer):
             "skill_level",
             "author",
             "created_at",
+            "updated_at",
             "instructions",
             "recipe_ingredients",
         ]
@@ -118,66 +167,21 @@ class RecipeCreateSerializer(serializers.Serializer):
     instructions = serializers.ListField(child=serializers.DictField(), required=False)
 
     def create(self, validated_data):
-        category_name = validated_data.pop("category", None)
-        ingredients_data = validated_data.pop("ingredients", [])
-        instructions_data = validated_data.pop("instructions", [])
-
-        # CATEGORY: get or create (case-insensitive)
-        category = None
-        if category_name:
-            category, _ = Category.objects.get_or_create(
-                name__iexact=category_name,
-                defaults={"name": category_name}
-            )
-
-        # SKILL LEVEL: must exist
-        skill_level = None
-        skill_level_id = validated_data.pop("skill_level_id", None)
-        if skill_level_id:
-            skill_level = SkillLevel.objects.get(id=skill_level_id)
-
         # GET AUTHOR from request context (set by view)
         request = self.context.get('request')
         author = request.user if request and request.user.is_authenticated else None
 
-        # CREATE RECIPE
-        recipe = Recipe.objects.create(
-            category=category,
-            skill_level=skill_level,
-            author=author,
-            **validated_data
-        )
-
-        # INGREDIENTS + RECIPE INGREDIENTS
-        for item in ingredients_data:
-            name = item.get("name")
-            quantity = item.get("quantity")
-            if not name:
-                continue
-
-            ingredient, _ = Ingredient.objects.get_or_create(
-                name__iexact=name,
-                defaults={"name": name}
-            )
-
-            RecipeIngredient.objects.create(
-                recipe=recipe,
-                ingredient=ingredient,
-                quantity=quantity or "",
-            )
-
-        # INSTRUCTIONS
-        for step in instructions_data:
-            Instruction.objects.create(
-                recipe=recipe,
-                step_number=step.get("step_number"),
-                content=step.get("content", "")
-            )
+        # One transaction, set-based writes; indexes refresh once it commits
+        with deferred_index_updates() as pending, transaction.atomic():
+            recipe = create_recipes([validated_data], author=author)[0]
+            pending.add([recipe.id])
 
         return recipe
 
 
-class RecipeCreatedResponseSerializer(serializers.ModelSerializer):
+class RecipeCreatedResponseSerializer(
+    TimedSerializerMixin, serializers.ModelSerializer
+):
     author = UserInfoSerializer(read_only=True)
     category = CategorySerializer(read_only=True)
     skill_level = SkillLevelSerializer(read_only=True)
@@ -0,0 +1,249 @@
+"""
+Signal handlers keeping derived data in sync with the database: the
+process-local ingredient index, the full-text search index, the catalog
+freshness stamps behind the HTTP validators (``core.catalog``) and the
+server-side page cache (``core.page_cache``)
+"""
+import threading
+from contextlib import contextmanager
+from functools import partial
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from .catalog import bump_catalog_version, touch_recipes
+from .ingredient_index import ingredient_index
+from .models import (
+    Category,
+    Ingredient,
+    Instruction,
+    Recipe,
+    RecipeIngredient,
+    SkillLevel,
+)
+from .page_cache import recipe_page_cache
+from .search import get_search_backend
+
+
+# -------------------------------------------------
+# Deferred refreshes for bulk writes
+# -------------------------------------------------
+class PendingRefresh:
+    """Recipe ids whose derived data must be refreshed when a batch ends"""
+
+    def __init__(self):
+        self.ingredient_index = set()
+        self.search = set()
+        self.touched = set()
+        self.catalog_changed = False
+        # Page cache: feed entries, extra category feeds
+        self.listed = set()
+        self.categories = set()
+
+    def add(self, recipe_ids):
+        """Mark recipes written without signals (e.g. ``bulk_create``)"""
+        self.ingredient_index.update(recipe_ids)
+        self.search.update(recipe_ids)
+        self.listed.update(recipe_ids)
+        self.catalog_changed = True
+
+
+_local = threading.local()
+
+
+def bump_catalog():
+    """
+    Bump the catalog version; once committed, tell the in-process indexes
+    the version is this process's own write (their refresh is applied here)
+    """
+    version = bump_catalog_version()
+    transaction.on_commit(partial(_follow_write, version))
+
+
+def _follow_write(version):
+    ingredient_index.follow_write(version)
+    get_search_backend().follow_write(version)
+
+
+def refresh_indexes(ingredient_ids=(), search_ids=()):
+    """
+    Refresh the ingredient and search indexes of recipes once the current
+    transaction commits (right away outside one), so a rolled back write
+    never reaches them
+    """
+    ingredient_ids, search_ids = set(ingredient_ids), set(search_ids)
+    if ingredient_ids or search_ids:
+        transaction.on_commit(partial(_refresh_indexes, ingredient_ids, search_ids))
+
+
+def _refresh_indexes(ingredient_ids, search_ids):
+    if ingredient_ids:
+        ingredient_index.refresh_recipes(ingredient_ids)
+    if search_ids:
+        get_search_backend().refresh_recipes(search_ids)
+
+
+@contextmanager
+def deferred_index_updates():
+    """
+    Refresh the ingredient and search indexes once per recipe, and the
+    catalog freshness stamps once, when the block exits, instead of once per
+    saved row.
+
+    Yields a ``PendingRefresh``; rows created with ``bulk_create`` (which
+    sends no signals) must be registered with its ``add()``. Nothing is
+    refreshed if the block raises, and the indexes are only refreshed once
+    the enclosing transaction (if any) commits.
+    """
+    pending = getattr(_local, "pending", None)
+    if pending is not None:
+        # Nested: the outermost block refreshes
+        yield pending
+        return
+
+    _local.pending = pending = PendingRefresh()
+    try:
+        yield pending
+    finally:
+        _local.pending = None
+    touch_recipes(pending.touched)
+    if pending.catalog_changed:
+        bump_catalog()
+    recipe_page_cache.expire(pending.listed, pending.categories)
+    refresh_indexes(pending.ingredient_index, pending.search)
+
+
+def refresh_recipes(
+    recipe_ids,
+    ingredients=True,
+    search=True,
+    touch=True,
+    listed=True,
+    categories=(),
+):
+    """
+    Recipes changed: refresh the chosen indexes and, with ``touch``, move
+    their ``updated_at`` (which retires their cached detail pages). The
+    catalog version is always bumped; ``listed`` also drops the feeds showing
+    the recipes, ``categories`` the feeds of other categories (ids).
+    """
+    pending = getattr(_local, "pending", None)
+    if pending is not None:
+        if ingredients:
+            pending.ingredient_index.update(recipe_ids)
+        if search:
+            pending.search.update(recipe_ids)
+        if touch:
+            pending.touched.update(recipe_ids)
+        if listed:
+            pending.listed.update(recipe_ids)
+        pending.categories.update(categories)
+        pending.catalog_changed = True
+        return
+    if touch:
+        touch_recipes(recipe_ids)
+    bump_catalog()
+    recipe_page_cache.expire(recipe_ids if listed else (), categories)
+    refresh_indexes(recipe_ids if ingredients else (), recipe_ids if search else ())
+
+
+# -------------------------------------------------
+# Ingredient index and full-text search index
+# -------------------------------------------------
+@receiver(post_save, sender=RecipeIngredient)
+@receiver(post_delete, sender=RecipeIngredient)
+def refresh_for_recipe_ingredient(sender, instance, **kwargs):
+    # Feeds do not show ingredients
+    refresh_recipes([instance.recipe_id], listed=False)
+
+
+@receiver(post_save, sender=Ingredient)
+def refresh_for_ingredient(sender, instance, created, **kwargs):
+    if created:
+        # A brand new ingredient is not used by any recipe yet
+        return
+    recipe_ids = RecipeIngredient.objects.filter(ingredient=instance).values_list(
+        "recipe_id", flat=True
+    )
+    refresh_recipes(set(recipe_ids), listed=False)
+
+
+@receiver(pre_save, sender=Recipe)
+def remember_recipe_category(sender, instance, **kwargs):
+    # A recipe moving to another category leaves the old category's feed
+    if recipe_page_cache.enabled and not instance._state.adding:
+        instance._previous_category_id = (
+            Recipe.objects.filter(id=instance.id)
+            .values_list("category_id", flat=True)
+            .first()
+        )
+
+
+@receiver(post_save, sender=Recipe)
+def refresh_search_for_recipe(sender, instance, **kwargs):
+    # updated_at is already set by auto_now
+    previous = getattr(instance, "_previous_category_id", None)
+    refresh_recipes(
+        [instance.id],
+        ingredients=False,
+        touch=False,
+        categories=[previous] if previous else (),
+    )
+
+
+@receiver(post_save, sender=Instruction)
+@receiver(post_delete, sender=Instruction)
+def refresh_search_for_instruction(sender, instance, **kwargs):
+    refresh_recipes([instance.recipe_id], ingredients=False, listed=False)
+
+
+def _remove_from_indexes(recipe_id):
+    ingredient_index.remove_recipe(recipe_id)
+    get_search_backend().remove_recipe(recipe_id)
+
+
+@receiver(post_delete, sender=Recipe)
+def remove_recipe_from_indexes(sender, instance, **kwargs):
+    transaction.on_commit(partial(_remove_from_indexes, instance.id))
+    refresh_recipes(
+        [instance.id],
+        ingredients=False,
+        search=False,
+        touch=False,
+        listed=False,
+        categories=[instance.category_id] if instance.category_id else (),
+    )
+
+
+# -------------------------------------------------
+# Catalog freshness and cached pages only (names shown on the pages)
+# -------------------------------------------------
+@receiver(pre_save, sender=Category)
+def expire_renamed_category_feed(sender, instance, **kwargs):
+    if not recipe_page_cache.enabled or instance._state.adding:
+        return
+    previous = (
+        Category.objects.filter(id=instance.id)
+        .values_list("normalized_name", flat=True)
+        .first()
+    )
+    recipe_page_cache.expire_categories([previous] if previous else [])
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_save, sender=SkillLevel)
+def touch_recipes_for_lookup(sender, instance, created, **kwargs):
+    if created:
+        return
+    field = "category" if sender is Category else "skill_level"
+    recipe_ids = Recipe.objects.filter(**{field: instance}).values_list(
+        "id", flat=True
+    )
+    refresh_recipes(set(recipe_ids), ingredients=False, search=False)
+
+
+@receiver(pre_delete, sender=SkillLevel)
+def touch_recipes_for_skill_level_delete(sender, instance, **kwargs):
+    # Recipes keep existing with a null skill level (SET_NULL, no signals)
+    touch_recipes_for_lookup(sender, instance, created=False)
@@ -0,0 +1,300 @@
+"""
+Single-flight coalescing of the LLM pass of AI matches.
+
+When many clients send the same pantry at once ("chicken, rice" trending),
+only one of them runs the LLM pass (candidate retrieval, prompt, LLM call);
+the others wait for it and answer with its outcome. Pantries are the same
+when the match cache says so: the same normalized ingredient set, in any
+order or case, against the same catalog version.
+
+* Within a worker, concurrent threads (``SingleFlight``) or tasks of the
+  event loop (``AsyncSingleFlight``) share the leader's call directly.
+* Across workers, the leader holds a lock in the match cache alias (a
+  cache ``add`` with a ``LOCK_TTL`` in case it dies) and leaves its outcome
+  there for ``RESULT_TTL`` seconds. Workers that find the lock held poll for
+  that outcome every ``POLL_INTERVAL`` seconds, and run the pass themselves
+  if the lock is released without one or after ``WAIT`` seconds.
+
+  This needs a backend whose ``add`` is atomic: Redis, Memcached or the
+  database cache (``ATOMIC_ADD_BACKENDS``). The file based cache checks
+  then writes, so two workers could both lead; with it (or any backend not
+  listed) coalescing stays within each worker unless ``CROSS_WORKER`` is set
+  to ``True``. Cache backends have no compare-and-delete, so a leader only
+  deletes its lock while it is sure not to have expired (``RELEASE_MARGIN``
+  seconds before ``LOCK_TTL``); otherwise the lock is left to expire.
+
+Successful answers also land in the match cache, so later requests for the
+pantry never get here. Settings: ``AI_MATCH_SINGLE_FLIGHT``.
+"""
+import asyncio
+import threading
+import time
+import uuid
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+from .match_cache import get_setting as get_cache_setting, match_cache
+
+# Cache backends whose ``add`` is atomic across the processes sharing them.
+# LocMem is atomic but per process, which keeps the lock harmless there.
+ATOMIC_ADD_BACKENDS = {
+    "django.core.cache.backends.redis.RedisCache",
+    "django.core.cache.backends.memcached.PyMemcacheCache",
+    "django.core.cache.backends.memcached.PyLibMCCache",
+    "django.core.cache.backends.db.DatabaseCache",
+    "django.core.cache.backends.locmem.LocMemCache",
+}
+
+DEFAULTS = {
+    "ENABLED": True,
+    # Lock across workers: None picks it by the backend (ATOMIC_ADD_BACKENDS)
+    "CROSS_WORKER": None,
+    # Longest a worker may hold the cross-worker lock (a leader that died)
+    "LOCK_TTL": 60,
+    # A lock held longer than LOCK_TTL minus this is left to expire
+    "RELEASE_MARGIN": 5,
+    # Longest another worker waits for the leader before running the pass
+    "WAIT": 30,
+    "POLL_INTERVAL": 0.1,
+    # Seconds the leader's outcome stays readable by waiting workers
+    "RESULT_TTL": 10,
+}
+
+
+def get_setting(name):
+    return getattr(settings, "AI_MATCH_SINGLE_FLIGHT", {}).get(name, DEFAULTS[name])
+
+
+def cross_worker():
+    """Whether the match cache alias can hold the cross-worker lock"""
+    enabled = get_setting("CROSS_WORKER")
+    if enabled is not None:
+        return enabled
+    backend = settings.CACHES[get_cache_setting("ALIAS")]["BACKEND"]
+    return backend in ATOMIC_ADD_BACKENDS
+
+
+# -------------------------------------------------
+# Within a worker
+# -------------------------------------------------
+class Call:
+    """The outcome of one in-flight call, once ``done`` is set"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Concurrent calls with the same key, across threads, share one run"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self.leaders = 0
+        self.shared = 0
+
+    def do(self, key, function):
+        """``function()``'s result (or exception), run once per key at a time"""
+        with self._lock:
+            call = self._calls.get(key)
+            if call is None:
+                call = self._calls[key] = Call()
+                self.leaders += 1
+                leader = True
+            else:
+                self.shared += 1
+                leader = False
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = function()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result
+
+    def stats(self):
+        with self._lock:
+            return {
+                "leaders": self.leaders,
+                "shared": self.shared,
+                "in_flight": len(self._calls),
+            }
+
+
+class AsyncSingleFlight:
+    """
+    Concurrent coroutines with the same key, on one event loop, share one
+    task. The task is cancelled with its leader; waiters then start over.
+    """
+
+    def __init__(self):
+        self._tasks = {}
+        self.leaders = 0
+        self.shared = 0
+
+    async def do(self, key, factory):
+        """The result of ``await factory()``, run once per key at a time"""
+        loop = asyncio.get_running_loop()
+        while True:
+            task = self._tasks.get(key)
+            # A finished task is only forgotten on the next turn of the loop
+            if task is None or task.done() or task.get_loop() is not loop:
+                task = self._tasks[key] = loop.create_task(factory())
+                task.add_done_callback(lambda done: self._forget(key, done))
+                self.leaders += 1
+                return await task
+            self.shared += 1
+            try:
+                # Shielded: a waiter going away must not cancel the others
+                return await asyncio.shield(task)
+            except asyncio.CancelledError:
+                if not task.cancelled():
+                    raise
+
+    def _forget(self, key, task):
+        if self._tasks.get(key) is task:
+            del self._tasks[key]
+
+    def stats(self):
+        return {
+            "leaders": self.leaders,
+            "shared": self.shared,
+            "in_flight": len(self._tasks),
+        }
+
+
+# -------------------------------------------------
+# Across workers
+# -------------------------------------------------
+class CacheFlight:
+    """
+    The cross-worker lock and outcome of one key in the match cache. An
+    outcome is stored with its leader's lock token and only taken by workers
+    that saw that leader hold the lock, so it is never served to a request
+    arriving after the flight.
+    """
+
+    def __init__(self, key):
+        self.backend = match_cache.backend
+        self.lock_key = f"{key}:flight"
+        self.result_key = f"{key}:flight-result"
+        self.token = uuid.uuid4().hex
+        self.leaders_seen = set()
+        self.acquired_at = None
+
+    def _still_held(self):
+        """
+        Whether the lock cannot have expired yet. Timed from before the
+        ``add``, so this errs on the side of leaving the lock to expire.
+        """
+        held = time.monotonic() - self.acquired_at
+        return held < get_setting("LOCK_TTL") - get_setting("RELEASE_MARGIN")
+
+    def _outcome(self, stored):
+        """The outcome of a leader this worker waited for, or ``None``"""
+        if stored is not None and stored[0] in self.leaders_seen:
+            return stored
+        return None
+
+    def run(self, compute):
+        deadline = time.monotonic() + get_setting("WAIT")
+        while True:
+            if self.leaders_seen:
+                stored = self._outcome(self.backend.get(self.result_key))
+                if stored is not None:
+                    return stored[1]
+            self.acquired_at = time.monotonic()
+            if self.backend.add(self.lock_key, self.token, get_setting("LOCK_TTL")):
+                try:
+                    outcome = compute()
+                    self.backend.set(
+                        self.result_key,
+                        (self.token, outcome),
+                        get_setting("RESULT_TTL"),
+                    )
+                    return outcome
+                finally:
+                    if self._still_held():
+                        self.backend.delete(self.lock_key)
+            holder = self.backend.get(self.lock_key)
+            if holder is None:
+                # Released since the add: look for its outcome right away
+                continue
+            self.leaders_seen.add(holder)
+            if time.monotonic() >= deadline:
+                return compute()
+            time.sleep(get_setting("POLL_INTERVAL"))
+
+    async def arun(self, compute):
+        deadline = time.monotonic() + get_setting("WAIT")
+        while True:
+            if self.leaders_seen:
+                stored = self._outcome(await self.backend.aget(self.result_key))
+                if stored is not None:
+                    return stored[1]
+            self.acquired_at = time.monotonic()
+            if await self.backend.aadd(
+                self.lock_key, self.token, get_setting("LOCK_TTL")
+            ):
+                try:
+                    outcome = await compute()
+                    await self.backend.aset(
+                        self.result_key,
+                        (self.token, outcome),
+                        get_setting("RESULT_TTL"),
+                    )
+                    return outcome
+                finally:
+                    if self._still_held():
+                        await self.backend.adelete(self.lock_key)
+            holder = await self.backend.aget(self.lock_key)
+            if holder is None:
+                continue
+            self.leaders_seen.add(holder)
+            if time.monotonic() >= deadline:
+                return await compute()
+            await asyncio.sleep(get_setting("POLL_INTERVAL"))
+
+
+# -------------------------------------------------
+# AI match LLM pass
+# -------------------------------------------------
+match_flights = SingleFlight()
+amatch_flights = AsyncSingleFlight()
+
+
+def coalesced(user_ingredients, compute, version=None):
+    """``compute()``, shared by concurrent requests for the same pantry"""
+    if not get_setting("ENABLED"):
+        return compute()
+    key = match_cache.make_key(user_ingredients, version)
+    if not cross_worker():
+        return match_flights.do(key, compute)
+    return match_flights.do(key, lambda: CacheFlight(key).run(compute))
+
+
+async def acoalesced(user_ingredients, compute, version=None):
+    """``await compute()``, shared by concurrent requests for the same pantry"""
+    if not get_setting("ENABLED"):
+        return await compute()
+    key = await sync_to_async(match_cache.make_key)(user_ingredients, version)
+    if not cross_worker():
+        return await amatch_flights.do(key, compute)
+    return await amatch_flights.do(key, lambda: CacheFlight(key).arun(compute))
+
+
+def stats():
+    return {"threads": match_flights.stats(), "tasks": amatch_flights.stats()}
@@ -1,9 +1,79 @@
+import asyncio
+import datetime
+import json
+import threading
+import time
+import tracemalloc
+import uuid
+from decimal import Decimal
+from io import StringIO
+from types import SimpleNamespace
+from unittest import mock, skipUnless
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.management import call_command
+from django.db import IntegrityError, connection, transaction
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
 from django.contrib.auth.models import User
 from rest_framework import status
+from rest_framework.renderers import JSONRenderer
 from rest_framework.test import APITestCase
+from rest_framework.utils.encoders import JSONEncoder as DRFJSONEncoder
+
+from .benchmarking import explain, full_scans, local_backend, seed_catalog
+from .catalog import bump_catalog_version, catalog_version
+from .gemini import GeminiModelResolver, GeminiUnavailable, gemini_resolver
+from .ingredient_index import ingredient_index
+from .instrumentation import request_metrics
+from .management.commands.bench_load import compare as compare_load_runs
+from .match_backends import get_match_backend, reset_match_backend
+from .match_cache import match_cache
+from .match_jobs import request_owner
+from .matching import build_match_prompt, select_candidate_recipes
+from .models import (
+    Recipe,
+    Category,
+    SkillLevel,
+    Ingredient,
+    Instruction,
+    MatchJob,
+    RecipeIngredient,
+)
+from .page_cache import recipe_page_cache
+from .pantry import PantryIndex, pantry_index
+from .payloads import (
+    LIST_COLUMNS,
+    RowDetailMixin,
+    datetime_zone,
+    detail_payloads,
+    format_datetime,
+    list_payload,
+)
+from .search import PythonSearchBackend, get_search_backend, reset_search_backend
+from .normalization import INGREDIENT_ALIASES, canonical_ingredient_name
+from .quantities import QUANTITY_PARSER_VERSION, parse_quantity
+from .ranking import RecipeRanker, recipe_ranker
+from .renderers import FastJSONRenderer
+from .retrieval import TrigramIndex
+from .recipe_export import CONTENT_TYPE as EXPORT_CONTENT_TYPE, export_recipes
+from .recipe_writer import _insert_names, resolve_ingredients
+from .single_flight import CacheFlight, SingleFlight, coalesced, cross_worker
+from .serializers import (
+    RecipeCreateSerializer,
+    RecipeDetailSerializer,
+    RecipeListSerializer,
+)
+
 
-from .models import Recipe, Category, SkillLevel
+def reset_match_cache():
+    # Each test rolls the catalog version back, so keys stored by an earlier
+    # test can be looked up again: empty the whole (test only) alias
+    match_cache.clear()
+    match_cache.backend.clear()
 
 
 class RecipeApiTests(APITestCase):
@@ -53,8 +123,20 @@ class AuthApiTests(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
 
 
+SCRIPTED_BACKEND = {
+    "BACKEND": "core.match_backends.LocalMatchBackend",
+    "OPTIONS": {"responses": ['{"recipe_id": 0, "justification": "Nope"}']},
+}
+
+
+@override_settings(AI_MATCH_BACKEND=local_backend())
 class AiMatchTests(APITestCase):
     def setUp(self):
+        ingredient_index.invalidate()
+        reset_match_cache()
+        gemini_resolver.reset()
+        self.addCleanup(gemini_resolver.reset)
+        reset_match_backend()
         category = Category.objects.create(name="Vegetarian")
         skill = SkillLevel.objects.create(level="low")
         self.recipe = Recipe.objects.create(
@@ -71,3 +153,1892 @@ class AiMatchTests(APITestCase):
         url = reverse("ai-recipe-match")
         response = self.client.post(url, {"ingredients": ""}, format="json")
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def _add_ingredients(self, recipe, *names):
+        with self.captureOnCommitCallbacks(execute=True):
+            for name in names:
+                ingredient, _ = Ingredient.objects.get_or_create(name=name)
+                RecipeIngredient.objects.create(
+                    recipe=recipe, ingredient=ingredient, quantity="1"
+                )
+
+    def test_exact_match_ranks_by_overlap(self):
+        """Exact matches prefer the recipe sharing the most ingredients"""
+        self._add_ingredients(self.recipe, "Rice", "Carrot")
+        better = Recipe.objects.create(
+            title="Chicken Fried Rice",
+            description="",
+            preparation_duration=20,
+        )
+        self._add_ingredients(better, "Chicken", "Rice", "Egg")
+
+        url = reverse("ai-recipe-match")
+        response = self.client.post(
+            url, {"ingredients": "rice, CHICKEN "}, format="json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["recipe"]["id"], better.id)
+        self.assertIn("Egg", response.data["justification"])
+
+    def test_index_follows_ingredient_writes(self):
+        """The ingredient index is kept in sync by signals"""
+        self._add_ingredients(self.recipe, "Potato")
+        top_match = ingredient_index.rank(["potato"])[0]
+        self.assertEqual(top_match.recipe_id, self.recipe.id)
+
+        potato = Ingredient.objects.get(name="Potato")
+        with self.captureOnCommitCallbacks(execute=True):
+            potato.name = "Sweet Potato"
+            potato.save()
+        self.assertEqual(ingredient_index.rank(["potato"]), [])
+        self.assertEqual(len(ingredient_index.rank(["sweet potato"])), 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            RecipeIngredient.objects.filter(recipe=self.recipe).delete()
+        self.assertEqual(ingredient_index.rank(["sweet potato"]), [])
+
+    @override_settings(INGREDIENT_INDEX={"CHECK_INTERVAL": 0})
+    def test_index_follows_other_processes_writes(self):
+        self._add_ingredients(self.recipe, "Potato")
+        self.assertEqual(len(ingredient_index.rank(["potato"])), 1)
+
+        # Another worker's write: no signals here, only its catalog version
+        leek = Ingredient.objects.create(name="Leek")
+        RecipeIngredient.objects.bulk_create(
+            [RecipeIngredient(recipe=self.recipe, ingredient=leek, quantity="1")]
+        )
+        self.assertEqual(ingredient_index.rank(["leek"]), [])
+        bump_catalog_version()
+        self.assertEqual(len(ingredient_index.rank(["leek"])), 1)
+        # ...and so do the indexes following it
+        self.assertEqual(len(recipe_ranker.rank(["leek"])), 1)
+        self.assertEqual(len(pantry_index.cookable(["leek", "potato"])), 1)
+
+        # This process's own writes are applied by its signals, not rebuilt
+        with mock.patch.object(
+            ingredient_index, "build", wraps=ingredient_index.build
+        ) as build:
+            ingredient_index.follow_write(bump_catalog_version())
+            ingredient_index.rank(["leek"])
+            build.assert_not_called()
+            bump_catalog_version()
+            bump_catalog_version()
+            ingredient_index.rank(["leek"])
+            build.assert_called_once()
+
+    def test_cached_ai_match_is_reused(self):
+        """A cached Gemini answer is served for the same pantry in any order"""
+        match_cache.set(["Tofu", "miso"], {
+            "recipe_id": self.recipe.id,
+            "justification": "Cached!",
+        })
+        url = reverse("ai-recipe-match")
+        response = self.client.post(url, {"ingredients": "MISO, tofu"}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["recipe"]["id"], self.recipe.id)
+        self.assertEqual(response.data["justification"], "Cached!")
+        self.assertEqual(match_cache.stats()["hits"], 1)
+
+    def test_ai_match_uses_backend(self):
+        """Without an exact match the LLM backend picks the recipe, once"""
+        url = reverse("ai-recipe-match")
+        for _ in range(2):
+            response = self.client.post(
+                url, {"ingredients": "lentils"}, format="json"
+            )
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(response.data["recipe"]["id"], self.recipe.id)
+        # The second request is answered from the match cache
+        self.assertEqual(get_match_backend().calls, 1)
+
+    def test_ai_match_picks_best_candidate(self):
+        self._add_ingredients(self.recipe, "Coconut Milk", "Curry Paste")
+        other = Recipe.objects.create(
+            title="Porridge", description="", preparation_duration=5
+        )
+        self._add_ingredients(other, "Oats", "Milk")
+        url = reverse("ai-recipe-match")
+        response = self.client.post(
+            url, {"ingredients": "red curry pastes"}, format="json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["recipe"]["id"], self.recipe.id)
+
+    @override_settings(AI_MATCH_BACKEND=SCRIPTED_BACKEND)
+    def test_ai_match_rejects_unknown_recipe_id(self):
+        url = reverse("ai-recipe-match")
+        response = self.client.post(url, {"ingredients": "lentils"}, format="json")
+        self.assertEqual(
+            response.status_code, status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+        self.assertIn("not found in available recipes", response.data["error"])
+
+    @override_settings(AI_MATCH_BACKEND={
+        "BACKEND": "core.match_backends.GeminiMatchBackend"
+    })
+    @mock.patch.dict("os.environ", {"GOOGLE_AI_API_KEY": ""})
+    def test_gemini_backend_requires_api_key(self):
+        url = reverse("ai-recipe-match")
+        response = self.client.post(url, {"ingredients": "lentils"}, format="json")
+        self.assertEqual(
+            response.status_code, status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+        self.assertEqual(response.data["error"], "Google AI API key not configured")
+
+    async def test_async_match_uses_exact_pass(self):
+        """POST /api/recipes/ai-match/async/ answers exact matches locally"""
+        await sync_to_async(self._add_ingredients)(self.recipe, "Chickpea")
+        url = reverse("ai-recipe-match-async")
+        response = await self.async_client.post(
+            url, {"ingredients": "chickpea"}, content_type="application/json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()["recipe"]["id"], self.recipe.id)
+
+    async def test_async_match_calls_backend(self):
+        url = reverse("ai-recipe-match-async")
+        response = await self.async_client.post(
+            url, {"ingredients": "saffron"}, content_type="application/json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()["recipe"]["id"], self.recipe.id)
+        self.assertEqual(get_match_backend().calls, 1)
+
+    async def test_async_match_rejects_non_object_bodies(self):
+        url = reverse("ai-recipe-match-async")
+        for body in ("[]", '"saffron"', "2"):
+            with self.subTest(body=body):
+                response = await self.async_client.post(
+                    url, body, content_type="application/json"
+                )
+                self.assertEqual(
+                    response.status_code, status.HTTP_400_BAD_REQUEST
+                )
+                self.assertEqual(
+                    response.json()["error"], "Request body must be a JSON object"
+                )
+        self.assertEqual(get_match_backend().calls, 0)
+
+    @override_settings(AI_MATCH_TIMEOUT=0.05, AI_MATCH_BACKEND=local_backend(5))
+    async def test_async_match_times_out(self):
+        url = reverse("ai-recipe-match-async")
+        response = await self.async_client.post(
+            url, {"ingredients": "saffron"}, content_type="application/json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_504_GATEWAY_TIMEOUT)
+
+
+@override_settings(
+    AI_MATCH_BACKEND=local_backend(), AI_MATCH_JOBS={"WORKERS": 0, "PER_USER": 2}
+)
+class MatchJobTests(APITestCase):
+    def setUp(self):
+        ingredient_index.invalidate()
+        reset_match_cache()
+        reset_match_backend()
+        self.recipe = Recipe.objects.create(
+            title="Saffron Rice", description="", preparation_duration=30
+        )
+        self.url = reverse("ai-recipe-match")
+
+    def _queue(self, ingredients):
+        return self.client.post(
+            self.url, {"ingredients": ingredients, "async": True}, format="json"
+        )
+
+    def test_job_is_queued_then_answered(self):
+        response = self._queue("saffron, butter")
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(response.data["status"], MatchJob.QUEUED)
+        status_url = response["Location"]
+
+        pending = self.client.get(status_url)
+        self.assertEqual(pending.status_code, status.HTTP_202_ACCEPTED)
+
+        call_command("run_match_jobs", "--once", stdout=StringIO())
+        done = self.client.get(status_url, {"wait": 1})
+        self.assertEqual(done.status_code, status.HTTP_200_OK)
+        self.assertEqual(done.data["status"], MatchJob.SUCCEEDED)
+        self.assertEqual(done.data["result_status"], 200)
+        self.assertEqual(done.data["result"]["recipe"]["id"], self.recipe.id)
+        self.assertEqual(get_match_backend().calls, 1)
+
+    def test_same_pantry_shares_the_job(self):
+        first = self._queue("saffron, butter")
+        second = self.client.post(
+            self.url,
+            {"ingredients": "Butter,SAFFRON"},
+            format="json",
+            HTTP_PREFER="respond-async",
+        )
+        self.assertEqual(first.data["job_id"], second.data["job_id"])
+        self.assertEqual(MatchJob.objects.count(), 1)
+
+    def test_jobs_in_flight_are_limited(self):
+        self._queue("saffron")
+        self._queue("butter")
+        response = self._queue("paprika")
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        # A pantry already queued still gets its job
+        self.assertEqual(self._queue("SAFFRON").status_code, 202)
+
+    def test_local_matches_are_answered_inline(self):
+        ingredient = Ingredient.objects.create(name="Saffron")
+        RecipeIngredient.objects.create(
+            recipe=self.recipe, ingredient=ingredient, quantity="1"
+        )
+        response = self._queue("saffron")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse(MatchJob.objects.exists())
+
+    def test_jobs_never_picked_up_are_failed(self):
+        stale = self._queue("saffron").data["job_id"]
+        self._queue("butter")
+        MatchJob.objects.update(created_at=timezone.now() - datetime.timedelta(hours=1))
+
+        # Neither the dead jobs nor their quota are handed out any more
+        response = self._queue("SAFFRON")
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertNotEqual(response.data["job_id"], stale)
+        self.assertEqual(self._queue("paprika").status_code, 202)
+        job = MatchJob.objects.get(id=stale)
+        self.assertEqual((job.status, job.result_status), (MatchJob.FAILED, 503))
+
+    def test_orphaned_queued_job_is_adopted(self):
+        status_url = self._queue("saffron")["Location"]
+        job = MatchJob.objects.get()
+        with mock.patch("core.match_jobs.worker_pool") as pool:
+            self.client.get(status_url)
+            pool.submit.assert_not_called()
+            MatchJob.objects.update(
+                created_at=timezone.now() - datetime.timedelta(seconds=30)
+            )
+            self.client.get(status_url)
+            self._queue("saffron")
+        self.assertEqual(pool.submit.call_args_list, [mock.call(job.id)] * 2)
+
+    def test_anonymous_quota_uses_the_trusted_proxy_header(self):
+        headers = {
+            "REMOTE_ADDR": "10.0.0.1",
+            "HTTP_X_FORWARDED_FOR": "1.1.1.1, 203.0.113.7",
+        }
+        request = SimpleNamespace(
+            user=SimpleNamespace(is_authenticated=False), META=headers
+        )
+        self.assertEqual(request_owner(request), "ip:10.0.0.1")
+        jobs = {"CLIENT_IP_HEADER": "HTTP_X_FORWARDED_FOR"}
+        with override_settings(AI_MATCH_JOBS=jobs):
+            self.assertEqual(request_owner(request), "ip:203.0.113.7")
+
+    def test_poll_rejects_bad_wait_and_unknown_jobs(self):
+        status_url = self._queue("saffron")["Location"]
+        for wait in ("soon", 600):
+            response = self.client.get(status_url, {"wait": wait})
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        unknown = reverse("ai-match-job", args=[uuid.uuid4()])
+        self.assertEqual(self.client.get(unknown).status_code, 404)
+
+
+class SingleFlightTests(APITestCase):
+    def setUp(self):
+        reset_match_cache()
+
+    def test_concurrent_threads_share_one_call(self):
+        flights = SingleFlight()
+        started = threading.Event()
+        release = threading.Event()
+        calls = []
+
+        def compute():
+            calls.append(1)
+            started.set()
+            release.wait(5)
+            return "answer"
+
+        results = []
+        threads = [
+            threading.Thread(
+                target=lambda: results.append(flights.do("rice", compute))
+            )
+            for _ in range(4)
+        ]
+        threads[0].start()
+        started.wait(5)
+        for thread in threads[1:]:
+            thread.start()
+        while flights.stats()["shared"] < 3:
+            time.sleep(0.001)
+        release.set()
+        for thread in threads:
+            thread.join(5)
+        self.assertEqual(results, ["answer"] * 4)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(flights.stats()["in_flight"], 0)
+
+    @override_settings(AI_MATCH_SINGLE_FLIGHT={"POLL_INTERVAL": 0.01})
+    def test_waits_for_the_leader_in_another_worker(self):
+        key = match_cache.make_key(["rice"])
+        backend = match_cache.backend
+        backend.add(f"{key}:flight", "other-worker", 60)
+
+        def finish():
+            time.sleep(0.05)
+            backend.set(f"{key}:flight-result", ("other-worker", (200, {})), 10)
+            backend.delete(f"{key}:flight")
+
+        leader = threading.Thread(target=finish)
+        leader.start()
+        compute = mock.Mock(return_value=(500, {}))
+        self.assertEqual(CacheFlight(key).run(compute), (200, {}))
+        leader.join()
+        compute.assert_not_called()
+
+        # The outcome only goes to requests that waited for it
+        self.assertEqual(CacheFlight(key).run(compute), (500, {}))
+        compute.assert_called_once()
+
+    def test_cross_worker_lock_needs_an_atomic_add(self):
+        def backend(path):
+            caches = {**settings.CACHES, "ai_match": {"BACKEND": path}}
+            return override_settings(CACHES=caches)
+
+        with backend("django.core.cache.backends.filebased.FileBasedCache"):
+            self.assertFalse(cross_worker())
+            with mock.patch("core.single_flight.CacheFlight") as flight:
+                self.assertEqual(coalesced(["rice"], lambda: (200, {})), (200, {}))
+            flight.assert_not_called()
+            with override_settings(AI_MATCH_SINGLE_FLIGHT={"CROSS_WORKER": True}):
+                self.assertTrue(cross_worker())
+        with backend("django.core.cache.backends.db.DatabaseCache"):
+            self.assertTrue(cross_worker())
+
+    @override_settings(AI_MATCH_SINGLE_FLIGHT={"LOCK_TTL": 60, "RELEASE_MARGIN": 5})
+    def test_lock_held_too_long_is_left_to_expire(self):
+        key = match_cache.make_key(["rice"])
+        flight = CacheFlight(key)
+        clock = [100.0]
+        with mock.patch("core.single_flight.time.monotonic", lambda: clock[0]):
+
+            def compute():
+                clock[0] += 56
+                return (200, {})
+
+            flight.run(compute)
+        # Past LOCK_TTL - RELEASE_MARGIN another worker may own it by now
+        self.assertEqual(match_cache.backend.get(f"{key}:flight"), flight.token)
+
+    @override_settings(AI_MATCH_BACKEND=local_backend(0.1))
+    async def test_concurrent_async_matches_share_one_llm_call(self):
+        await sync_to_async(reset_match_backend)()
+        await Recipe.objects.acreate(
+            title="Saffron Rice", description="", preparation_duration=30
+        )
+        url = reverse("ai-recipe-match-async")
+        responses = await asyncio.gather(*(
+            self.async_client.post(
+                url, {"ingredients": pantry}, content_type="application/json"
+            )
+            for pantry in ("saffron, butter", "Butter, saffron", "SAFFRON,butter")
+        ))
+        self.assertEqual([r.status_code for r in responses], [200] * 3)
+        self.assertEqual(get_match_backend().calls, 1)
+
+
+@mock.patch.dict("os.environ", {"GOOGLE_AI_API_KEY": "test-key"})
+@mock.patch("core.gemini.genai")
+class GeminiResolverTests(TestCase):
+    def test_model_is_resolved_once(self, genai):
+        genai.list_models.return_value = [
+            SimpleNamespace(
+                name="models/gemini-pro",
+                supported_generation_methods=["generateContent"],
+            ),
+        ]
+        resolver = GeminiModelResolver()
+        first = resolver.get_model()
+        second = resolver.get_model()
+
+        self.assertIs(first, second)
+        self.assertEqual(resolver.model_name, "gemini-pro")
+        genai.configure.assert_called_once_with(api_key="test-key")
+        genai.list_models.assert_called_once()
+
+    def test_failure_backs_off_before_resolving_again(self, genai):
+        genai.list_models.return_value = [
+            SimpleNamespace(
+                name="models/gemini-pro",
+                supported_generation_methods=["generateContent"],
+            ),
+        ]
+        resolver = GeminiModelResolver(backoff_base=60, backoff_max=60)
+        resolver.get_model()
+        resolver.report_failure("quota exceeded")
+
+        with self.assertRaises(GeminiUnavailable):
+            resolver.get_model()
+        genai.list_models.assert_called_once()
+
+    def test_failed_model_is_skipped_when_resolving_again(self, genai):
+        genai.list_models.return_value = [
+            SimpleNamespace(
+                name=f"models/{name}",
+                supported_generation_methods=["generateContent"],
+            )
+            for name in ("gemini-1.5-flash", "gemini-pro")
+        ]
+        resolver = GeminiModelResolver(backoff_base=0, backoff_max=0)
+        resolver.get_model()
+        self.assertEqual(resolver.model_name, "gemini-1.5-flash")
+        resolver.report_failure("model retired")
+
+        resolver.get_model()
+        self.assertEqual(resolver.model_name, "gemini-pro")
+        # Once every model has failed, they are all tried again
+        resolver.report_failure("quota exceeded")
+        resolver.get_model()
+        self.assertEqual(resolver.model_name, "gemini-1.5-flash")
+
+
+class MatchCacheTests(TestCase):
+    def setUp(self):
+        reset_match_cache()
+
+    def test_key_ignores_order_and_case(self):
+        self.assertEqual(
+            match_cache.make_key("Rice, chicken"),
+            match_cache.make_key(["CHICKEN", " rice", "rice"]),
+        )
+
+    def test_recipe_creation_invalidates(self):
+        match_cache.set(["rice"], {"recipe_id": 1, "justification": ""})
+        self.assertIsNotNone(match_cache.get(["rice"]))
+
+        serializer = RecipeCreateSerializer(data={
+            "title": "Rice Bowl",
+            "description": "Quick lunch",
+            "preparation_duration": 5,
+        })
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+
+        self.assertIsNone(match_cache.get(["rice"]))
+        self.assertEqual(match_cache.stats()["misses"], 1)
+
+    def test_catalog_edits_invalidate(self):
+        recipe = Recipe.objects.create(
+            title="Rice Bowl", description="Lunch", preparation_duration=5
+        )
+        rice = Ingredient.objects.create(name="Rice")
+        match_cache.set(["rice"], {"recipe_id": recipe.id, "justification": ""})
+
+        recipe.title = "Fried Rice"
+        recipe.save()
+        self.assertIsNone(match_cache.get(["rice"]))
+
+        match_cache.set(["rice"], {"recipe_id": recipe.id, "justification": ""})
+        rice.name = "Basmati rice"
+        rice.save()
+        self.assertIsNone(match_cache.get(["rice"]))
+
+    def test_clear_keeps_other_entries_of_the_alias(self):
+        match_cache.backend.set("ai-match:other-worker", 1)
+        match_cache.set(["rice"], {"recipe_id": 1, "justification": ""})
+        key = match_cache.make_key(["rice"])
+
+        match_cache.clear()
+        self.assertIsNone(match_cache.backend.get(key))
+        self.assertEqual(match_cache.backend.get("ai-match:other-worker"), 1)
+
+    @override_settings(AI_MATCH_CACHE={"LRU_SIZE": 2})
+    def test_lru_evicts_least_recently_used(self):
+        match_cache.set(["a"], 1)
+        match_cache.set(["b"], 2)
+        match_cache.get(["a"])
+        match_cache.set(["c"], 3)
+        self.assertEqual(list(match_cache._lru), [
+            match_cache.make_key(["a"]),
+            match_cache.make_key(["c"]),
+        ])
+
+
+class CandidateRetrievalTests(TestCase):
+    def setUp(self):
+        ingredient_index.invalidate()
+        self.recipes = {}
+        for title, names in [
+            ("Tomato Soup", ["Tomato", "Onion", "Stock"]),
+            ("Caprese", ["Tomato", "Mozzarella", "Basil"]),
+            ("Pancakes", ["Flour", "Egg", "Milk"]),
+            ("Omelette", ["Egg", "Cheese"]),
+        ]:
+            recipe = Recipe.objects.create(
+                title=title, description=title, preparation_duration=10
+            )
+            for name in names:
+                ingredient, _ = Ingredient.objects.get_or_create(name=name)
+                RecipeIngredient.objects.create(
+                    recipe=recipe, ingredient=ingredient, quantity="1"
+                )
+            self.recipes[title] = recipe
+
+    def test_bm25_shortlist_handles_plurals(self):
+        """'tomatoes' + 'basil' shortlists the tomato recipes, Caprese first"""
+        recipes = select_candidate_recipes(["tomatoes", "fresh basil"], top_k=2)
+        self.assertEqual(
+            [recipe.title for recipe in recipes], ["Caprese", "Tomato Soup"]
+        )
+
+    def test_shortlist_is_padded_and_capped(self):
+        recipes = select_candidate_recipes(["cheese"], top_k=3)
+        self.assertEqual(len(recipes), 3)
+        self.assertEqual(recipes[0].title, "Omelette")
+
+    def test_prompt_only_contains_candidates(self):
+        recipes = select_candidate_recipes(["eggs"], top_k=2)
+        prompt = build_match_prompt("eggs", recipes)
+        self.assertIn("Pancakes", prompt)
+        self.assertNotIn("Caprese", prompt)
+
+
+class RecipeSearchTests(APITestCase):
+    def setUp(self):
+        reset_search_backend()
+        self.url = reverse("recipe-search")
+        with self.captureOnCommitCallbacks(execute=True):
+            self.curry = Recipe.objects.create(
+                title="Chickpea Curry",
+                description="A weeknight curry",
+                preparation_duration=30,
+            )
+            self.salad = Recipe.objects.create(
+                title="Green Salad",
+                description="Crisp and fresh, goes well with curry",
+                preparation_duration=10,
+            )
+            self.bread = Recipe.objects.create(
+                title="Soda Bread",
+                description="No yeast needed",
+                preparation_duration=45,
+            )
+            buttermilk = Ingredient.objects.create(name="Buttermilk")
+            RecipeIngredient.objects.create(
+                recipe=self.bread, ingredient=buttermilk, quantity="400ml"
+            )
+            Instruction.objects.create(
+                recipe=self.salad,
+                step_number=1,
+                content="Toss the leaves in vinaigrette",
+            )
+
+    def search(self, query):
+        response = self.client.get(self.url, {"q": query})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data["results"]
+
+    def test_uses_fts5_on_sqlite(self):
+        self.assertEqual(get_search_backend().name, "sqlite-fts5")
+
+    def test_results_are_ranked_by_relevance(self):
+        """A title match outranks a description match, newer or not"""
+        results = self.search("curries")
+        self.assertEqual([r["id"] for r in results], [self.curry.id, self.salad.id])
+        self.assertGreater(results[0]["rank"], results[1]["rank"])
+
+    def test_indexes_ingredients_and_instructions(self):
+        self.assertEqual([r["id"] for r in self.search("buttermilk")], [self.bread.id])
+        self.assertEqual(
+            [r["id"] for r in self.search("vinaigrette")], [self.salad.id]
+        )
+
+    def test_index_follows_writes(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.bread.title = "Treacle Loaf"
+            self.bread.save()
+        self.assertEqual([r["id"] for r in self.search("treacle")], [self.bread.id])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Ingredient.objects.filter(name="Buttermilk").get().delete()
+        self.assertEqual(self.search("buttermilk"), [])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.salad.delete()
+        self.assertEqual([r["id"] for r in self.search("curry")], [self.curry.id])
+
+    def test_ingredient_typos_and_aliases(self):
+        ingredient_index.invalidate()
+        self.assertEqual([r["id"] for r in self.search("buttermlk")], [self.bread.id])
+        with self.captureOnCommitCallbacks(execute=True):
+            eggplant = Ingredient.objects.create(name="Eggplant")
+            RecipeIngredient.objects.create(
+                recipe=self.curry, ingredient=eggplant, quantity="1"
+            )
+        self.assertEqual([r["id"] for r in self.search("aubergines")], [self.curry.id])
+
+    def test_empty_query_lists_newest(self):
+        results = self.search("")
+        self.assertEqual(results[0]["id"], self.bread.id)
+        self.assertIsNone(results[0]["rank"])
+
+    def test_python_backend_matches(self):
+        backend = PythonSearchBackend()
+        hits = backend.search("curry", 10)
+        self.assertEqual(
+            [recipe_id for recipe_id, _ in hits], [self.curry.id, self.salad.id]
+        )
+
+    @override_settings(INGREDIENT_INDEX={"CHECK_INTERVAL": 0})
+    def test_python_backend_follows_other_processes_writes(self):
+        backend = PythonSearchBackend()
+        self.assertEqual(backend.search("treacle", 10), [])
+        # Another worker's write: no signals here, only its catalog version
+        Recipe.objects.filter(id=self.bread.id).update(title="Treacle Loaf")
+        self.assertEqual(backend.search("treacle", 10), [])
+        bump_catalog_version()
+        self.assertEqual([hit[0] for hit in backend.search("treacle", 10)], [
+            self.bread.id
+        ])
+
+        # This process's own writes are applied by its signals, not rebuilt
+        with mock.patch.object(backend, "rebuild", wraps=backend.rebuild) as rebuild:
+            backend.follow_write(bump_catalog_version())
+            backend.search("treacle", 10)
+            rebuild.assert_not_called()
+
+
+class CursorPaginationTests(APITestCase):
+    def setUp(self):
+        self.url = reverse("recipe-list-landing")
+        created_at = timezone.now()
+        self.recipes = [
+            Recipe.objects.create(
+                title=f"Recipe {i}", description="-", preparation_duration=5
+            )
+            for i in range(7)
+        ]
+        # Identical timestamps must still page deterministically (by id)
+        Recipe.objects.filter(id__in=[r.id for r in self.recipes[2:5]]).update(
+            created_at=created_at
+        )
+
+    def walk(self, url, params):
+        seen = []
+        response = self.client.get(url, params)
+        while True:
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            seen += [r["id"] for r in response.data["results"]]
+            if not response.data["next"]:
+                return seen
+            response = self.client.get(response.data["next"])
+
+    def test_walks_feed_without_count_query(self):
+        expected = list(
+            Recipe.objects.order_by("-created_at", "-id").values_list("id", flat=True)
+        )
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(
+                self.url, {"pagination": "cursor", "page_size": 3}
+            )
+        self.assertNotIn("count", response.data)
+        self.assertFalse(any("COUNT(" in q["sql"] for q in queries.captured_queries))
+        self.assertEqual(
+            self.walk(self.url, {"pagination": "cursor", "page_size": 3}), expected
+        )
+
+    def test_page_numbers_stay_the_default(self):
+        response = self.client.get(self.url, {"page": 2, "page_size": 3})
+        self.assertEqual(response.data["count"], 7)
+        self.assertIn("previous", response.data)
+
+    def test_invalid_cursor_is_404(self):
+        response = self.client.get(self.url, {"cursor": "not-a-cursor"})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_search_results_keep_rank_order(self):
+        url = reverse("recipe-search")
+        response = self.client.get(url, {"q": "recipe"})
+        ranked = [r["id"] for r in response.data["results"]]
+        self.assertEqual(
+            self.walk(url, {"q": "recipe", "pagination": "cursor", "page_size": 2}),
+            ranked,
+        )
+
+
+@override_settings(AI_MATCH_BACKEND=local_backend())
+class QueryCountTests(APITestCase):
+    """Read endpoints run a fixed number of queries, whatever the page size"""
+
+    def setUp(self):
+        reset_search_backend()
+        ingredient_index.invalidate()
+        reset_match_cache()
+        reset_match_backend()
+        author = User.objects.create(username="cook")
+        category = Category.objects.create(name="Italian")
+        skill = SkillLevel.objects.create(level="low")
+        with self.captureOnCommitCallbacks(execute=True):
+            for i in range(12):
+                recipe = Recipe.objects.create(
+                    title=f"Pasta {i}",
+                    description="Pasta night",
+                    preparation_duration=20,
+                    category=category,
+                    skill_level=skill,
+                    author=author,
+                )
+                for name in ("Pasta", "Garlic", f"Herb {i}"):
+                    ingredient, _ = Ingredient.objects.get_or_create(name=name)
+                    RecipeIngredient.objects.create(
+                        recipe=recipe, ingredient=ingredient, quantity="1"
+                    )
+                for step in (1, 2):
+                    Instruction.objects.create(
+                        recipe=recipe, step_number=step, content="Stir the pasta"
+                    )
+        self.recipe = recipe
+        # Built lazily on first use; keep it out of the counts below
+        ingredient_index.ensure_built()
+
+    def assertListQueries(self, count, url, params=None):
+        for page_size in (1, 12):
+            with self.assertNumQueries(count):
+                response = self.client.get(
+                    url, {**(params or {}), "page_size": page_size}
+                )
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(len(response.data["results"]), page_size)
+
+    def test_landing(self):
+        # Catalog version (conditional GET) + COUNT + page
+        self.assertListQueries(3, reverse("recipe-list-landing"))
+        self.assertListQueries(
+            2, reverse("recipe-list-landing"), {"pagination": "cursor"}
+        )
+
+    def test_category(self):
+        url = reverse("recipe-by-category", args=["italian"])
+        self.assertListQueries(3, url)
+
+    def test_search(self):
+        # Catalog version + FTS lookup + page
+        self.assertListQueries(3, reverse("recipe-search"), {"q": "pasta"})
+        self.assertListQueries(3, reverse("recipe-search"))
+
+    def test_detail(self):
+        # updated_at (conditional GET), recipe with its foreign keys,
+        # instructions, ingredients
+        url = reverse("recipe-detail", args=[self.recipe.id])
+        with self.assertNumQueries(4):
+            response = self.client.get(url)
+        self.assertEqual(len(response.data["recipe_ingredients"]), 3)
+        self.assertEqual(len(response.data["instructions"]), 2)
+
+    def test_ai_match(self):
+        url = reverse("ai-recipe-match")
+        # Exact match from the in-memory index: one query for the recipe
+        with self.assertNumQueries(1):
+            self.client.post(url, {"ingredients": "garlic"}, format="json")
+        # LLM path: catalog version (cache key), newest padding, candidates,
+        # their ingredients
+        with self.assertNumQueries(4):
+            response = self.client.post(url, {"ingredients": "basil"}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+
+class QuantityTests(APITestCase):
+    def test_parse_quantity(self):
+        cases = {
+            "2 cups": (2, None, "cup"),
+            "100g": (100, None, "g"),
+            "1½ Tbsp.": (1.5, None, "tbsp"),
+            "1 1/2 teaspoons": (1.5, None, "tsp"),
+            "2-3 cloves": (2, 3, "clove"),
+            "1,000 g": (1000, None, "g"),
+            "12,500.5ml": (12500.5, None, "ml"),
+            "1,5 kg": (1.5, None, "kg"),
+            "0,125 l": (0.125, None, "l"),
+            "a pinch": (1, None, "pinch"),
+            "Handful": (1, None, "handful"),
+            "3 large eggs": (3, None, ""),
+            "to taste": (None, None, ""),
+        }
+        for text, expected in cases.items():
+            parsed = parse_quantity(text)
+            self.assertEqual((parsed.amount, parsed.amount_max, parsed.unit), expected)
+
+    def make_recipe(self, servings=2):
+        recipe = Recipe.objects.create(
+            title="Pancakes", description="", preparation_duration=20, servings=servings
+        )
+        for name, quantity in (("Flour", "200g"), ("Eggs", "2"), ("Salt", "to taste")):
+            RecipeIngredient.objects.create(
+                recipe=recipe,
+                ingredient=Ingredient.objects.create(name=name),
+                quantity=quantity,
+            )
+        return recipe
+
+    def test_amounts_are_stored_on_write(self):
+        recipe = self.make_recipe()
+        flour = recipe.recipe_ingredients.get(ingredient__name="Flour")
+        self.assertEqual((flour.amount, flour.unit), (200, "g"))
+        flour.quantity = "1 kg"
+        flour.save(update_fields=["quantity"])
+        flour.refresh_from_db()
+        self.assertEqual((flour.amount, flour.unit), (1, "kg"))
+
+    def test_numeric_quantity_is_stored_as_text(self):
+        self.client.force_authenticate(User.objects.create(username="cook"))
+        response = self.client.post(
+            reverse("recipe-create"),
+            {
+                "title": "Boiled Eggs",
+                "description": "Breakfast",
+                "preparation_duration": 10,
+                "ingredients": [{"name": "Egg", "quantity": 2}],
+            },
+            format="json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        egg = RecipeIngredient.objects.get(ingredient__name="Egg")
+        self.assertEqual((egg.quantity, egg.amount), ("2", 2))
+        egg.quantity = 3
+        egg.save()
+        egg.refresh_from_db()
+        self.assertEqual((egg.quantity, egg.amount), ("3", 3))
+
+    def test_backfill_parses_old_rows(self):
+        recipe = self.make_recipe()
+        # As written before quantities were parsed
+        recipe.recipe_ingredients.update(amount=None, unit="", quantity_version=0)
+        yesterday = timezone.now() - datetime.timedelta(days=1)
+        Recipe.objects.update(updated_at=yesterday)
+        version = catalog_version()[0]
+        call_command("backfill_quantities", batch_size=2, stdout=StringIO())
+        # Validators and cached pages see the new amounts
+        recipe.refresh_from_db()
+        self.assertGreater(recipe.updated_at, yesterday)
+        self.assertEqual(catalog_version()[0], version + 1)
+        rows = recipe.recipe_ingredients.order_by("id")
+        self.assertEqual(
+            list(rows.values_list("amount", "unit", "quantity_version")),
+            [
+                (200, "g", QUANTITY_PARSER_VERSION),
+                (2, "", QUANTITY_PARSER_VERSION),
+                (None, "", QUANTITY_PARSER_VERSION),
+            ],
+        )
+
+    def test_scale_to_servings(self):
+        recipe = self.make_recipe(servings=2)
+        url = reverse("recipe-scale", args=[recipe.id])
+        # updated_at, recipe, ingredients
+        with self.assertNumQueries(3):
+            response = self.client.get(url, {"servings": 5})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["factor"], 2.5)
+        scaled = {
+            item["ingredient"]["name"]: item["scaled_quantity"]
+            for item in response.data["recipe_ingredients"]
+        }
+        self.assertEqual(scaled, {"Flour": "500 g", "Eggs": "5", "Salt": "to taste"})
+
+    def test_scale_keeps_thousands(self):
+        recipe = self.make_recipe(servings=2)
+        flour = recipe.recipe_ingredients.get(ingredient__name="Flour")
+        flour.quantity = "1,000 g"
+        flour.save()
+        url = reverse("recipe-scale", args=[recipe.id])
+        response = self.client.get(url, {"factor": 2})
+        scaled = {
+            item["ingredient"]["name"]: item["scaled_quantity"]
+            for item in response.data["recipe_ingredients"]
+        }
+        self.assertEqual(scaled["Flour"], "2000 g")
+
+    def test_scale_needs_a_valid_target(self):
+        url = reverse("recipe-scale", args=[self.make_recipe(servings=None).id])
+        self.assertEqual(
+            self.client.get(url, {"servings": 4}).status_code,
+            status.HTTP_400_BAD_REQUEST,
+        )
+        self.assertEqual(
+            self.client.get(url, {"factor": "-1"}).status_code,
+            status.HTTP_400_BAD_REQUEST,
+        )
+        response = self.client.get(url, {"factor": "0.5"})
+        self.assertEqual(response.data["recipe_ingredients"][0]["amount"], 100)
+
+
+class ConditionalGetTests(APITestCase):
+    def setUp(self):
+        reset_search_backend()
+        self.category = Category.objects.create(name="Italian")
+        self.recipe = Recipe.objects.create(
+            title="Risotto",
+            description="Creamy",
+            preparation_duration=40,
+            category=self.category,
+        )
+        self.detail_url = reverse("recipe-detail", args=[self.recipe.id])
+        self.list_url = reverse("recipe-list-landing")
+
+    def revalidate(self, url, response):
+        return self.client.get(url, HTTP_IF_NONE_MATCH=response["ETag"])
+
+    def test_unchanged_detail_is_not_modified(self):
+        response = self.client.get(self.detail_url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn("Last-Modified", response)
+        self.assertIn("s-maxage=30", response["Cache-Control"])
+        self.assertIn("Accept", response["Vary"])
+
+        serialize = "core.serializers.RecipeDetailSerializer.to_representation"
+        with mock.patch(serialize) as to_representation, self.assertNumQueries(1):
+            again = self.revalidate(self.detail_url, response)
+        self.assertEqual(again.status_code, status.HTTP_304_NOT_MODIFIED)
+        to_representation.assert_not_called()
+        self.assertIn("public", again["Cache-Control"])
+
+        since = self.client.get(
+            self.detail_url, HTTP_IF_MODIFIED_SINCE=response["Last-Modified"]
+        )
+        self.assertEqual(since.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_related_writes_change_the_detail_validator(self):
+        response = self.client.get(self.detail_url)
+        Instruction.objects.create(recipe=self.recipe, step_number=1, content="Stir")
+        response = self.revalidate(self.detail_url, response)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        self.category.name = "Northern Italian"
+        self.category.save()
+        response = self.revalidate(self.detail_url, response)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["category"]["name"], "Northern Italian")
+
+    def test_list_validator_follows_the_catalog_version(self):
+        response = self.client.get(self.list_url)
+        self.assertEqual(
+            self.revalidate(self.list_url, response).status_code,
+            status.HTTP_304_NOT_MODIFIED,
+        )
+        # Another page is another resource
+        other_page = f"{self.list_url}?page_size=5"
+        self.assertNotEqual(self.client.get(other_page)["ETag"], response["ETag"])
+
+        Recipe.objects.create(title="Soup", description="", preparation_duration=5)
+        response = self.revalidate(self.list_url, response)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["count"], 2)
+
+    def test_missing_recipe_is_not_found(self):
+        response = self.client.get(reverse("recipe-detail", args=[0]))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertNotIn("ETag", response)
+
+
+class PayloadTests(TestCase):
+    def setUp(self):
+        cook = User.objects.create_user("cook")
+        spicy = Category.objects.create(name="Spicy")
+        skill = SkillLevel.objects.create(level="high")
+        self.recipes = [
+            Recipe.objects.create(
+                title="Pho \u2028 bo",
+                description="Broth\u2029 with \u00e9pices and \"quotes\"",
+                preparation_duration=180,
+                servings=4,
+                category=spicy,
+                skill_level=skill,
+                author=cook,
+            ),
+            Recipe.objects.create(
+                title="Toast", description="", preparation_duration=2
+            ),
+        ]
+        for position, quantity in enumerate(["1½ cups", "2-3 cloves", "to taste"]):
+            ingredient = Ingredient.objects.create(name=f"ingredient {position}")
+            RecipeIngredient.objects.create(
+                recipe=self.recipes[0], ingredient=ingredient, quantity=quantity
+            )
+        for step in (2, 1):
+            Instruction.objects.create(
+                recipe=self.recipes[0], step_number=step, content=f"Step {step}"
+            )
+
+    def assertSameBytes(self, expected, fast):
+        self.assertEqual(
+            FastJSONRenderer().render(fast), JSONRenderer().render(expected)
+        )
+
+    def test_payloads_match_the_serializers(self):
+        recipes = Recipe.objects.for_detail().order_by("id")
+        rows = Recipe.objects.order_by("id").values(*LIST_COLUMNS)
+        self.assertSameBytes(
+            RecipeListSerializer(recipes, many=True).data,
+            [list_payload(row, datetime_zone()) for row in rows],
+        )
+        payloads = detail_payloads(recipe.id for recipe in recipes)
+        self.assertSameBytes(
+            RecipeDetailSerializer(recipes, many=True).data,
+            [payloads[recipe.id] for recipe in recipes],
+        )
+
+    def test_datetimes_match_drf(self):
+        field = RecipeDetailSerializer().fields["created_at"]
+        moment = timezone.now().replace(microsecond=0)
+        for zone in ("UTC", "Europe/Paris", "America/St_Johns"):
+            with self.subTest(zone=zone), timezone.override(zone):
+                for value in (moment, moment.replace(microsecond=5), None):
+                    self.assertEqual(
+                        format_datetime(value, datetime_zone()),
+                        field.to_representation(value),
+                    )
+
+    def test_views_serve_the_fast_payloads(self):
+        recipe = self.recipes[0]
+        response = self.client.get(reverse("recipe-detail", args=[recipe.id]))
+        expected = RecipeDetailSerializer(Recipe.objects.for_detail().get(id=recipe.id))
+        self.assertEqual(response.content, JSONRenderer().render(expected.data))
+
+        response = self.client.get(reverse("recipe-detail", args=[0]))
+        self.assertEqual(
+            response.json(), {"detail": "No Recipe matches the given query."}
+        )
+
+    def test_renderer_matches_drf_for_other_values(self):
+        for data in [
+            {"small": 1e-05, "large": 1e16, "plain": 0.1, "negative": -0.0},
+            {"when": datetime.datetime(2024, 5, 1, 12, 30, tzinfo=datetime.UTC)},
+            {"price": Decimal("1.50"), "day": datetime.date(2024, 5, 1)},
+            {1: "integer key", "big": 2**70},
+            ["\u2028", "e\u0301t\u00e9", None, True],
+        ]:
+            with self.subTest(data=data):
+                self.assertSameBytes(data, data)
+        self.assertEqual(
+            FastJSONRenderer().render({"a": 1}, "application/json; indent=2"),
+            JSONRenderer().render({"a": 1}, "application/json; indent=2"),
+        )
+
+        with mock.patch.object(JSONRenderer, "render") as drf_render:
+            FastJSONRenderer().render({"title": "Pho", "amount": 1.5})
+        drf_render.assert_not_called()
+
+
+@override_settings(RECIPE_PAGE_CACHE={"TTL": 300, "STALE_TTL": 60})
+class PageCacheTests(APITestCase):
+    def setUp(self):
+        reset_search_backend()
+        recipe_page_cache.clear()
+        self.italian = Category.objects.create(name="Italian")
+        self.asian = Category.objects.create(name="Asian")
+        self.recipe = Recipe.objects.create(
+            title="Risotto",
+            description="Creamy",
+            preparation_duration=40,
+            category=self.italian,
+        )
+        self.detail_url = reverse("recipe-detail", args=[self.recipe.id])
+
+    def feed(self, category):
+        return reverse("recipe-by-category", args=[category])
+
+    def titles(self, url):
+        return [recipe["title"] for recipe in self.client.get(url).data["results"]]
+
+    def test_detail_is_served_from_the_cache(self):
+        first = self.client.get(self.detail_url)
+        # Only the ETag / Last-Modified lookup is left
+        with self.assertNumQueries(1):
+            second = self.client.get(self.detail_url)
+        self.assertEqual(second.data, first.data)
+        self.assertEqual(recipe_page_cache.stats()["hits"], 1)
+
+    def test_writes_expire_the_detail_page(self):
+        self.client.get(self.detail_url)
+        with self.captureOnCommitCallbacks(execute=True):
+            Instruction.objects.create(
+                recipe=self.recipe, step_number=1, content="Stir"
+            )
+        response = self.client.get(self.detail_url)
+        self.assertEqual(len(response.data["instructions"]), 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.italian.name = "Northern Italian"
+            self.italian.save()
+        response = self.client.get(self.detail_url)
+        self.assertEqual(response.data["category"]["name"], "Northern Italian")
+
+    def test_page_built_across_a_write_is_not_served_after_it(self):
+        build = RowDetailMixin.get_payload
+
+        def racing_build(view):
+            payload = build(view)
+            # The write commits while this worker is still building
+            with self.captureOnCommitCallbacks(execute=True):
+                self.recipe.title = "Saffron Risotto"
+                self.recipe.save()
+            return payload
+
+        with mock.patch.object(
+            RowDetailMixin, "get_payload", autospec=True, side_effect=racing_build
+        ):
+            self.assertEqual(self.client.get(self.detail_url).data["title"], "Risotto")
+        response = self.client.get(self.detail_url)
+        self.assertEqual(response.data["title"], "Saffron Risotto")
+
+    def test_new_recipe_expires_only_its_feeds(self):
+        self.assertEqual(self.titles(self.feed("italian")), ["Risotto"])
+        self.assertEqual(self.titles(self.feed("asian")), [])
+        self.titles(reverse("recipe-list-landing"))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Recipe.objects.create(
+                title="Ramen",
+                description="",
+                preparation_duration=30,
+                category=self.asian,
+            )
+        hits = recipe_page_cache.stats()["hits"]
+        self.assertEqual(self.titles(self.feed("asian")), ["Ramen"])
+        self.assertEqual(
+            self.titles(reverse("recipe-list-landing")), ["Ramen", "Risotto"]
+        )
+        self.assertEqual(self.titles(self.feed("italian")), ["Risotto"])
+        self.assertEqual(recipe_page_cache.stats()["hits"], hits + 1)
+
+    def test_moved_and_renamed_categories_expire_their_feeds(self):
+        self.titles(self.feed("italian"))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.recipe.category = self.asian
+            self.recipe.save()
+        self.assertEqual(self.titles(self.feed("italian")), [])
+        self.assertEqual(self.titles(self.feed("asian")), ["Risotto"])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.asian.name = "Japanese"
+            self.asian.save()
+        self.assertEqual(self.titles(self.feed("asian")), [])
+        self.assertEqual(self.titles(self.feed("japanese")), ["Risotto"])
+
+    def test_cursor_and_deep_pages_are_not_cached(self):
+        url = reverse("recipe-list-landing")
+        self.client.get(url, {"pagination": "cursor"})
+        self.client.get(url, {"page": 4})
+        self.assertEqual(recipe_page_cache.stats()["misses"], 0)
+
+    def test_expired_entry_is_served_stale_during_a_rebuild(self):
+        build = mock.Mock(side_effect=["old", "new"])
+        self.assertEqual(recipe_page_cache.get_or_build("key", build), "old")
+
+        # Past TTL, still within TTL + STALE_TTL
+        later = timezone.now().timestamp() + 330
+        with mock.patch("core.page_cache.time.time", return_value=later):
+            # Another worker holds the rebuild lock
+            recipe_page_cache.backend.add("key:rebuild", 1)
+            self.assertEqual(recipe_page_cache.get_or_build("key", build), "old")
+            self.assertEqual(build.call_count, 1)
+
+            recipe_page_cache.backend.delete("key:rebuild")
+            self.assertEqual(recipe_page_cache.get_or_build("key", build), "new")
+        self.assertEqual(recipe_page_cache.stats()["stale_hits"], 1)
+        self.assertIsNone(recipe_page_cache.backend.get("key:rebuild"))
+
+
+@skipUnless(connection.vendor == "sqlite", "Index names in SQLite plans")
+class QueryPlanTests(TestCase):
+    """The hot read paths seek their indexes instead of scanning and sorting"""
+
+    def plan(self, queryset):
+        return explain(str(queryset.query))
+
+    def test_category_feed(self):
+        category = Category.objects.create(name="Italian")
+        queryset = Recipe.objects.filter(category=category).order_by(
+            "-created_at", "-id"
+        )[:10]
+        plan = self.plan(queryset)
+        self.assertIn("recipe_category_created_idx", " ".join(plan))
+        self.assertNotIn("TEMP B-TREE", " ".join(plan))
+        self.assertEqual(full_scans(plan), [])
+
+    def test_recipes_using_an_ingredient(self):
+        ingredient = Ingredient.objects.create(name="Garlic")
+        queryset = RecipeIngredient.objects.filter(ingredient=ingredient).values(
+            "recipe_id"
+        )
+        plan = self.plan(queryset)
+        self.assertIn("COVERING INDEX recipe_ingredient_lookup_idx", " ".join(plan))
+
+
+class RecipeCreateTests(TestCase):
+    def setUp(self):
+        reset_search_backend()
+        ingredient_index.invalidate()
+        ingredient_index.ensure_built()
+
+    def payload(self, ingredients, steps, prefix="Thing"):
+        return {
+            "title": "Big Stew",
+            "description": "Slow cooked",
+            "preparation_duration": 90,
+            "category": "Comfort",
+            "ingredients": [
+                {"name": f"{prefix} {i}", "quantity": "1"} for i in range(ingredients)
+            ],
+            "instructions": [
+                {"step_number": i + 1, "content": f"Step {i + 1}"}
+                for i in range(steps)
+            ],
+        }
+
+    def create(self, data):
+        serializer = RecipeCreateSerializer(data=data)
+        with self.captureOnCommitCallbacks(execute=True):
+            serializer.is_valid(raise_exception=True)
+            return serializer.save()
+
+    def test_query_count_does_not_grow_with_recipe_size(self):
+        # Same category, new ingredients in both cases
+        self.create(self.payload(ingredients=1, steps=1, prefix="Warm-up"))
+        with CaptureQueriesContext(connection) as small:
+            self.create(self.payload(ingredients=2, steps=1, prefix="Small"))
+        with CaptureQueriesContext(connection) as large:
+            self.create(self.payload(ingredients=20, steps=15, prefix="Large"))
+        self.assertEqual(len(large.captured_queries), len(small.captured_queries))
+
+    def test_ingredients_are_reused_case_insensitively(self):
+        Ingredient.objects.create(name="Onion")
+        data = self.payload(ingredients=0, steps=0)
+        data["ingredients"] = [
+            {"name": "onion", "quantity": "1"},
+            {"name": "Leek", "quantity": "2"},
+            {"name": "LEEK", "quantity": "3"},
+        ]
+        recipe = self.create(data)
+        self.assertEqual(
+            sorted(Ingredient.objects.values_list("name", flat=True)), ["Leek", "Onion"]
+        )
+        self.assertEqual(recipe.recipe_ingredients.count(), 3)
+        self.assertEqual(recipe.category.name, "Comfort")
+
+    def test_failure_leaves_nothing_behind(self):
+        data = self.payload(ingredients=3, steps=2)
+        data["instructions"].append({"content": "No step number"})
+        with self.assertRaises(IntegrityError):
+            self.create(data)
+        self.assertFalse(Recipe.objects.exists())
+        self.assertFalse(Ingredient.objects.exists())
+
+    def test_indexes_see_the_new_recipe(self):
+        recipe = self.create(self.payload(ingredients=3, steps=2))
+        self.assertEqual(ingredient_index.rank(["thing 1"])[0].recipe_id, recipe.id)
+        self.assertEqual(get_search_backend().search("stew", 10)[0][0], recipe.id)
+
+    def test_rolled_back_recipe_never_reaches_the_indexes(self):
+        serializer = RecipeCreateSerializer(data=self.payload(ingredients=3, steps=2))
+        serializer.is_valid(raise_exception=True)
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            with self.assertRaises(RuntimeError), transaction.atomic():
+                serializer.save()
+                raise RuntimeError("rolled back")
+        self.assertEqual(callbacks, [])
+        self.assertEqual(ingredient_index.rank(["thing 1"]), [])
+        self.assertEqual(get_search_backend().search("stew", 10), [])
+
+
+class NormalizedNameTests(TestCase):
+    def test_names_are_unique_ignoring_case_and_spacing(self):
+        onion = Ingredient.objects.create(name=" Red  Onion")
+        self.assertEqual(onion.normalized_name, "red onion")
+        with self.assertRaises(IntegrityError):
+            Ingredient.objects.create(name="red onion")
+
+    def test_admin_reports_names_differing_only_in_case(self):
+        self.client.force_login(
+            User.objects.create_superuser("admin", "admin@example.com", "pw")
+        )
+        Ingredient.objects.create(name="Salt")
+        Category.objects.create(name="Italian")
+        for model, name in (("ingredient", "salt"), ("category", "italian ")):
+            response = self.client.post(
+                reverse(f"admin:core_{model}_add"), {"name": name}
+            )
+            self.assertEqual(response.status_code, 200)
+            self.assertIn(
+                "with this name already exists",
+                str(response.context["adminform"].form.errors["name"]),
+            )
+        self.assertEqual(Ingredient.objects.count(), 1)
+        self.assertEqual(Category.objects.count(), 1)
+
+        # Editing a row keeps its own name
+        salt = Ingredient.objects.get()
+        response = self.client.post(
+            reverse("admin:core_ingredient_change", args=[salt.id]), {"name": "SALT"}
+        )
+        self.assertEqual(response.status_code, 302)
+
+    def test_renaming_updates_the_normalized_name(self):
+        category = Category.objects.create(name="Italian")
+        category.name = "Sicilian"
+        category.save(update_fields=["name"])
+        category.refresh_from_db()
+        self.assertEqual(category.normalized_name, "sicilian")
+
+    def test_resolving_reuses_rows_inserted_concurrently(self):
+        leek = Ingredient.objects.create(name="Leek")
+        # As if another request inserted "Leek" after our lookup missed it
+        inserted = {
+            ingredient.normalized_name: ingredient.id
+            for ingredient in _insert_names(
+                Ingredient, {"leek": "LEEK", "kale": "Kale"}
+            )
+        }
+        self.assertEqual(inserted["leek"], leek.id)
+        self.assertEqual(
+            sorted(Ingredient.objects.values_list("name", flat=True)), ["Kale", "Leek"]
+        )
+        self.assertEqual(resolve_ingredients(["  leek "])["leek"], leek)
+
+    def test_canonical_names_are_stored_on_write(self):
+        onion = Ingredient.objects.create(name="Spring Onions")
+        self.assertEqual(onion.canonical_name, "green onion")
+        tomato = resolve_ingredients(["Cherry-Tomatoes"])["cherry-tomatoes"]
+        tomato.refresh_from_db()
+        self.assertEqual(tomato.canonical_name, "cherry tomato")
+
+        # As written before canonical names were stored
+        Ingredient.objects.update(canonical_name="", canonical_version=0)
+        version = catalog_version()[0]
+        call_command("backfill_canonical_names", batch_size=1, stdout=StringIO())
+        self.assertEqual(catalog_version()[0], version + 1)
+        self.assertEqual(
+            sorted(Ingredient.objects.values_list("canonical_name", flat=True)),
+            ["cherry tomato", "green onion"],
+        )
+
+
+class IngredientNormalizationTests(APITestCase):
+    def test_canonical_names(self):
+        for name, canonical in [
+            ("Tomatoes", "tomato"),
+            (" Cherry-Tomatoes", "cherry tomato"),
+            ("Berries", "berry"),
+            ("bay leaves", "bay leaf"),
+            ("Asparagus", "asparagus"),
+            ("scallions", "green onion"),
+            ("Heavy Whipping Cream", "heavy cream"),
+        ]:
+            self.assertEqual(canonical_ingredient_name(name), canonical)
+        for alias in INGREDIENT_ALIASES:
+            canonical = canonical_ingredient_name(alias)
+            self.assertEqual(canonical_ingredient_name(canonical), canonical)
+        with override_settings(INGREDIENT_ALIASES={"rocket": "roquette"}):
+            self.assertEqual(canonical_ingredient_name("Rocket"), "roquette")
+
+    def test_typo_lookup(self):
+        vocabulary = TrigramIndex(["chicken", "chickpea", "tomato"])
+        self.assertEqual(vocabulary.closest("chiken", 1), [(1, "chicken")])
+        self.assertEqual(vocabulary.closest("tomaot", 1), [(1, "tomato")])
+        self.assertEqual(vocabulary.closest("potato", 1), [])
+
+    @override_settings(AI_MATCH_RANKING_FALLBACK=False, AI_MATCH_BACKEND={
+        "BACKEND": "core.match_backends.GeminiMatchBackend"
+    })
+    @mock.patch.dict("os.environ", {"GOOGLE_AI_API_KEY": ""})
+    def test_match_answers_misspelled_input_locally(self):
+        """Plurals, aliases and typos reach the exact-match pass, not the LLM"""
+        ingredient_index.invalidate()
+        reset_match_backend()
+        stew = Recipe.objects.create(
+            title="Stew", description="", preparation_duration=60
+        )
+        for name in ("Tomatoes", "Scallions", "Chickpeas"):
+            RecipeIngredient.objects.create(
+                recipe=stew,
+                ingredient=Ingredient.objects.create(name=name),
+                quantity="1",
+            )
+        response = self.client.post(
+            reverse("ai-recipe-match"),
+            {"ingredients": "tomatoe, spring onion"},
+            format="json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["recipe"]["id"], stew.id)
+        self.assertIn("Tomato, Green Onion", response.data["justification"])
+        self.assertEqual(ingredient_index.resolve(["rice", "chickpee"]), [
+            "rice", "chickpea"
+        ])
+
+    def test_variety_is_not_an_exact_match(self):
+        """"cherry tomato" only reaches "tomato" recipes through the LLM pass"""
+        ingredient_index.invalidate()
+        salad = Recipe.objects.create(
+            title="Salad", description="", preparation_duration=5
+        )
+        RecipeIngredient.objects.create(
+            recipe=salad,
+            ingredient=Ingredient.objects.create(name="Tomatoes"),
+            quantity="2",
+        )
+        self.assertEqual(ingredient_index.rank(["Cherry Tomatoes"]), [])
+        self.assertEqual(ingredient_index.candidates(["Cherry Tomatoes"], 5), [
+            salad.id
+        ])
+
+
+class RecipeImportTests(APITestCase):
+    def setUp(self):
+        reset_search_backend()
+        self.url = reverse("recipe-import")
+        self.admin = User.objects.create(username="admin", is_staff=True)
+        self.client.force_authenticate(self.admin)
+
+    def jsonl(self, *rows):
+        return "\n".join(
+            row if isinstance(row, str) else json.dumps(row) for row in rows
+        )
+
+    def recipe(self, title, *ingredients, **extra):
+        return {
+            "title": title,
+            "description": f"{title}, imported",
+            "preparation_duration": 10,
+            "ingredients": [{"name": name, "quantity": "1"} for name in ingredients],
+            "instructions": [{"step_number": 1, "content": "Cook"}],
+            **extra,
+        }
+
+    def post(self, body, content_type="application/x-ndjson"):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.generic(
+                "POST", self.url, body, content_type=content_type
+            )
+
+    def test_requires_admin(self):
+        self.client.force_authenticate(User.objects.create(username="cook"))
+        response = self.post(self.jsonl(self.recipe("Toast", "Bread")))
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    @override_settings(RECIPE_IMPORT_CHUNK_SIZE=2)
+    def test_jsonl_import_reports_chunks_and_errors(self):
+        response = self.post(
+            self.jsonl(
+                self.recipe("Toast", "Bread", "Butter", category="Breakfast"),
+                "{broken",
+                self.recipe("Eggy Bread", "bread", "EGG", category="breakfast"),
+                {"title": "No duration"},
+                self.recipe("Soldiers", "Bread", skill_level_id=99),
+            )
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            (response.data["created"], response.data["failed"]), (2, 3)
+        )
+        self.assertEqual(len(response.data["chunks"]), 3)
+        self.assertEqual(
+            [error["line"] for error in response.data["errors"]], [2, 4, 5]
+        )
+        # Ingredients and categories are shared across chunks, whatever the case
+        self.assertEqual(Ingredient.objects.filter(name__iexact="bread").count(), 1)
+        self.assertEqual(Category.objects.count(), 1)
+        self.assertEqual(Recipe.objects.get(title="Toast").author, self.admin)
+        eggy_bread = Recipe.objects.get(title="Eggy Bread")
+        self.assertEqual(get_search_backend().search("eggy", 5)[0][0], eggy_bread.id)
+
+    def test_failed_chunk_only_loses_bad_rows(self):
+        bad = self.recipe("Bad", "Salt")
+        bad["instructions"] = [{"content": "No step number"}]
+        response = self.post(
+            self.jsonl(self.recipe("Good", "Salt"), bad, self.recipe("Fine", "Pepper"))
+        )
+        self.assertEqual(response.data["created"], 2)
+        self.assertEqual(response.data["errors"][0]["line"], 2)
+        self.assertEqual(
+            sorted(Recipe.objects.values_list("title", flat=True)), ["Fine", "Good"]
+        )
+
+    def test_csv_import(self):
+        body = (
+            "title,description,preparation_duration,category,ingredients,instructions\n"
+            'Porridge,Warm oats,10,Breakfast,"Oats: 50g; Milk: 300ml",'
+            '"Simmer the oats\nAdd salt"\n'
+        )
+        response = self.post(body, content_type="text/csv")
+        self.assertEqual(response.data["created"], 1, response.data)
+        recipe = Recipe.objects.get(title="Porridge")
+        self.assertEqual(
+            list(recipe.recipe_ingredients.values_list("ingredient__name", "quantity")),
+            [("Oats", "50g"), ("Milk", "300ml")],
+        )
+        self.assertEqual(
+            list(recipe.instructions.values_list("step_number", "content")),
+            [(1, "Simmer the oats"), (2, "Add salt")],
+        )
+
+
+class RecipeExportTests(APITestCase):
+    def setUp(self):
+        reset_search_backend()
+        self.url = reverse("recipe-export")
+        self.client.force_authenticate(
+            User.objects.create(username="admin", is_staff=True)
+        )
+
+    def test_streams_detail_records(self):
+        seed_catalog(5, vocabulary=20)
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+        lines = b"".join(response.streaming_content).decode().splitlines()
+        expected = [
+            RecipeDetailSerializer(recipe).data
+            for recipe in Recipe.objects.order_by("id")
+        ]
+        self.assertEqual(
+            [json.loads(line) for line in lines],
+            json.loads(json.dumps(expected, cls=DRFJSONEncoder)),
+        )
+
+    def test_export_can_be_imported(self):
+        seed_catalog(3, vocabulary=20)
+        body = b"".join(self.client.get(self.url).streaming_content)
+        Recipe.objects.all().delete()
+
+        response = self.client.generic(
+            "POST", reverse("recipe-import"), body, content_type=EXPORT_CONTENT_TYPE
+        )
+        self.assertEqual(response.data["created"], 3, response.data["errors"])
+        recipe = Recipe.objects.order_by("id").first()
+        self.assertTrue(recipe.recipe_ingredients.exists())
+        self.assertTrue(recipe.instructions.exists())
+        self.assertIsNotNone(recipe.category)
+
+    def test_memory_stays_flat(self):
+        """Peak memory does not grow with the catalog (10x more recipes)"""
+
+        def peak_export_memory(queryset):
+            tracemalloc.start()
+            try:
+                for _ in export_recipes(chunk_size=100, queryset=queryset):
+                    pass
+                return tracemalloc.get_traced_memory()[1]
+            finally:
+                tracemalloc.stop()
+
+        seed_catalog(2000, vocabulary=50, steps_per_recipe=(1, 3))
+        first_ids = Recipe.objects.order_by("id").values_list("id", flat=True)[:200]
+        small = peak_export_memory(Recipe.objects.filter(id__in=list(first_ids)))
+        large = peak_export_memory(Recipe.objects.all())
+        self.assertLess(large, small * 1.5)
+
+
+@override_settings(AI_MATCH_BACKEND=local_backend())
+class InstrumentationTests(APITestCase):
+    def setUp(self):
+        request_metrics.clear()
+        recipe_page_cache.clear()
+        reset_match_cache()
+        reset_match_backend()
+        self.recipe = Recipe.objects.create(
+            title="Risotto", description="Creamy", preparation_duration=40
+        )
+
+    def test_server_timing_header(self):
+        response = self.client.get(reverse("recipe-detail", args=[self.recipe.id]))
+        timing = response["Server-Timing"]
+        self.assertRegex(timing, r'^db;dur=[\d.]+;desc="[1-9]\d* queries"')
+        self.assertIn("serialize;dur=", timing)
+        self.assertRegex(timing, r"total;dur=[\d.]+$")
+
+    @override_settings(REQUEST_TIMING={"SERVER_TIMING": False})
+    def test_server_timing_can_be_disabled(self):
+        response = self.client.get(reverse("recipe-list-landing"))
+        self.assertNotIn("Server-Timing", response)
+
+    def test_llm_time_is_recorded(self):
+        response = self.client.post(
+            reverse("ai-recipe-match"), {"ingredients": "rice"}, format="json"
+        )
+        self.assertIn("llm;dur=", response["Server-Timing"])
+
+    @override_settings(REQUEST_TIMING={"METRICS_PUBLIC": True})
+    def test_metrics_are_aggregated_per_view(self):
+        for _ in range(2):
+            self.client.get(reverse("recipe-detail", args=[self.recipe.id]))
+        body = self.client.get(reverse("metrics")).content.decode()
+        self.assertIn(
+            'recipes_request_duration_seconds_count{view="recipe-detail"} 2', body
+        )
+        self.assertIn(
+            'recipes_request_db_queries_bucket{view="recipe-detail",le="+Inf"} 2',
+            body,
+        )
+
+    @override_settings(REQUEST_TIMING={"METRICS_TOKEN": "secret"})
+    def test_metrics_token(self):
+        url = reverse("metrics")
+        self.assertEqual(self.client.get(url).status_code, 403)
+        response = self.client.get(url, HTTP_AUTHORIZATION="Bearer secret")
+        self.assertEqual(response.status_code, 200)
+
+    def test_metrics_hidden_without_token(self):
+        url = reverse("metrics")
+        self.assertEqual(self.client.get(url).status_code, 404)
+        with self.settings(DEBUG=True):
+            self.assertEqual(self.client.get(url).status_code, 200)
+        with self.settings(REQUEST_TIMING={"METRICS_PUBLIC": True}):
+            self.assertEqual(self.client.get(url).status_code, 200)
+
+
+class LoadComparisonTests(TestCase):
+    def run_result(self, p95_ms, throughput_rps, errors=0):
+        return {
+            "runs": [
+                {
+                    "recipes": 1000,
+                    "concurrency": 8,
+                    "endpoint": "recipe-detail",
+                    "errors": errors,
+                    "throughput_rps": throughput_rps,
+                    "latency": {"p95_ms": p95_ms},
+                }
+            ]
+        }
+
+    def metrics(self, baseline, results):
+        regressions = compare_load_runs(baseline, results, tolerance=0.2)
+        return [regression["metric"] for regression in regressions]
+
+    def test_regressions_beyond_tolerance(self):
+        baseline = self.run_result(p95_ms=10, throughput_rps=500)
+        self.assertEqual(self.metrics(baseline, self.run_result(11.5, 420)), [])
+        self.assertEqual(
+            self.metrics(baseline, self.run_result(13, 380, errors=1)),
+            ["p95_ms", "throughput_rps", "errors"],
+        )
+
+    def test_small_absolute_changes_are_noise(self):
+        baseline = self.run_result(p95_ms=1, throughput_rps=500)
+        self.assertEqual(self.metrics(baseline, self.run_result(1.4, 500)), [])
+
+    def test_runs_missing_from_the_baseline_are_ignored(self):
+        self.assertEqual(self.metrics({"runs": []}, self.run_result(50, 1)), [])
+
+
+class RankingTests(APITestCase):
+    def setUp(self):
+        ingredient_index.invalidate()
+        self.curry = self.recipe("Curry", "Rice", "Cherry Tomato", "Saffron")
+        self.salad = self.recipe("Salad", "Cherry Tomato", "Lettuce")
+        self.pilaf = self.recipe("Pilaf", "Rice", "Salt")
+
+    def recipe(self, title, *names):
+        recipe = Recipe.objects.create(
+            title=title, description="", preparation_duration=10
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            for name in names:
+                ingredient, _ = Ingredient.objects.get_or_create(name=name)
+                RecipeIngredient.objects.create(
+                    recipe=recipe, ingredient=ingredient, quantity="1"
+                )
+        return recipe
+
+    def ids(self, *args, **kwargs):
+        return [match.recipe_id for match in recipe_ranker.rank(*args, **kwargs)]
+
+    def test_orderings(self):
+        # Salad and Pilaf tie (one of two ingredients): newest first
+        self.assertEqual(
+            self.ids(["rice", "cherry tomato"]),
+            [self.curry.id, self.pilaf.id, self.salad.id],
+        )
+        # Rice is a larger share of Pilaf than of Curry
+        self.assertEqual(self.ids(["rice"]), [self.pilaf.id, self.curry.id])
+        self.assertEqual(
+            self.ids(["rice", "lettuce"], order="jaccard")[0], self.pilaf.id
+        )
+        self.assertEqual(
+            self.ids(["saffron", "lettuce"], order="missing"),
+            [self.salad.id, self.curry.id],
+        )
+
+    def test_matched_and_missing(self):
+        ranked = recipe_ranker.rank(["Rice", "saffron"], limit=1)[0]
+        self.assertEqual(ranked.recipe_id, self.curry.id)
+        self.assertEqual(sorted(ranked.matched), ["Rice", "Saffron"])
+        self.assertEqual(ranked.missing, ["Cherry Tomato"])
+        self.assertAlmostEqual(ranked.jaccard, 2 / 3)
+
+    def test_pantry_items_match_longer_names(self):
+        """Without an ingredient of that name, "tomatoes" covers "cherry tomato\""""
+        self.assertEqual(
+            sorted(self.ids(["tomatoes"])), sorted([self.curry.id, self.salad.id])
+        )
+
+    @mock.patch("core.ranking.MIN_OVERLAY", 1)
+    def test_follows_writes(self):
+        self.assertEqual(self.ids(["lettuce"]), [self.salad.id])
+        with self.captureOnCommitCallbacks(execute=True):
+            soup = self.recipe("Soup", "Lettuce", "Leek")
+        # Scored from the overlay, then folded into a rebuilt matrix
+        self.assertEqual(self.ids(["lettuce", "leek"])[0], soup.id)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.salad.delete()
+            RecipeIngredient.objects.filter(recipe=self.pilaf).delete()
+        self.assertEqual(self.ids(["lettuce"]), [soup.id])
+        self.assertEqual(self.ids(["salt"]), [])
+
+    def test_matches_python_scoring_on_a_catalog(self):
+        from .management.commands.bench_ranking import (
+            StaticSource,
+            python_rank,
+            synthetic_catalog,
+        )
+        from .ranking import IngredientMatrix
+
+        recipes = synthetic_catalog(500, vocabulary=60)
+        matrix = IngredientMatrix(recipes)
+        ranker = RecipeRanker(source=StaticSource(recipes))
+        for pantry in (["egg", "milk"], ["fresh basil", "rice", "tomato"]):
+            for order in ("coverage", "missing", "jaccard"):
+                ranked = [
+                    match.recipe_id
+                    for match in ranker.rank(pantry, limit=10, order=order)
+                ]
+                self.assertEqual(
+                    ranked, python_rank(recipes, matrix, pantry, 10, order)
+                )
+
+    def test_rank_endpoint(self):
+        url = reverse("recipe-rank")
+        response = self.client.get(url, {"ingredients": "rice, saffron", "limit": 2})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["count"], 2)
+        first = response.data["results"][0]
+        self.assertEqual(first["recipe"]["title"], "Curry")
+        self.assertEqual(first["missing"], ["Cherry Tomato"])
+
+        for params in ({}, {"ingredients": "rice", "limit": 0}, {
+            "ingredients": "rice", "order": "random"
+        }):
+            response = self.client.get(url, params)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    @override_settings(AI_MATCH_BACKEND={
+        "BACKEND": "core.match_backends.GeminiMatchBackend"
+    })
+    @mock.patch.dict("os.environ", {"GOOGLE_AI_API_KEY": ""})
+    def test_ranking_stands_in_for_an_unavailable_llm(self):
+        reset_match_backend()
+        url = reverse("ai-recipe-match")
+        response = self.client.post(url, {"ingredients": "tomatoes"}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["recipe"]["id"], self.salad.id)
+        self.assertIn("Lettuce", response.data["justification"])
+
+        with override_settings(AI_MATCH_RANKING_FALLBACK=False):
+            response = self.client.post(
+                url, {"ingredients": "tomatoes"}, format="json"
+            )
+        self.assertEqual(
+            response.status_code, status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+
+    @override_settings(AI_MATCH_TIMEOUT=0.05, AI_MATCH_BACKEND=local_backend(5))
+    async def test_ranking_answers_when_the_llm_times_out(self):
+        await sync_to_async(reset_match_backend)()
+        with self.assertLogs("core.matching", "WARNING"):
+            response = await self.async_client.post(
+                reverse("ai-recipe-match-async"),
+                {"ingredients": "tomatoes"},
+                content_type="application/json",
+            )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()["recipe"]["id"], self.salad.id)
+
+
+class PantryTests(APITestCase):
+    def setUp(self):
+        ingredient_index.invalidate()
+        self.curry = self.recipe("Curry", "Rice", "Cherry Tomato", "Saffron")
+        self.salad = self.recipe("Salad", "Cherry Tomato", "Lettuce")
+        self.pilaf = self.recipe("Pilaf", "Rice", "Salt")
+
+    recipe = RankingTests.recipe
+
+    def ids(self, pantry, max_missing=0):
+        cookable = pantry_index.cookable(pantry, max_missing)
+        return [match.recipe_id for match in cookable[: len(cookable)]]
+
+    def test_missing_budget_and_order(self):
+        self.assertEqual(self.ids(["rice", "salt"]), [self.pilaf.id])
+        self.assertEqual(self.ids(["rice", "salt"], 2), [self.pilaf.id, self.curry.id])
+        # Fewest missing, then most covered, then newest
+        self.assertEqual(
+            self.ids(["rice", "tomatoes", "lettuce"], 1),
+            [self.salad.id, self.curry.id, self.pilaf.id],
+        )
+        # Recipes using nothing from the pantry never fit
+        self.assertEqual(self.ids(["leek"], 10), [])
+
+        match = pantry_index.cookable(["Rice"], 2)[0]
+        self.assertEqual((match.matched, match.missing), (["Rice"], ["Salt"]))
+        self.assertEqual(match.missing_count, 1)
+
+    def test_follows_writes(self):
+        self.assertEqual(self.ids(["lettuce"], 1), [self.salad.id])
+        with self.captureOnCommitCallbacks(execute=True):
+            soup = self.recipe("Soup", "Lettuce", "Leek")
+        self.assertEqual(self.ids(["lettuce", "leek"]), [soup.id])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.salad.delete()
+            RecipeIngredient.objects.filter(
+                recipe=soup, ingredient__name="Leek"
+            ).delete()
+        self.assertEqual(self.ids(["lettuce"], 1), [soup.id])
+        self.assertEqual(self.ids(["leek"], 1), [])
+
+    def test_matches_a_scan_on_a_catalog(self):
+        from .management.commands.bench_cookable import python_cookable
+        from .management.commands.bench_ranking import StaticSource, synthetic_catalog
+
+        recipes = synthetic_catalog(500, vocabulary=60)
+        pantry = ["egg", "milk", "fresh basil", "rice", "tomato", "butter"]
+        for dense_ratio in (256, 1):
+            # Bitset postings, then row sets for every name
+            with mock.patch("core.pantry.DENSE_RATIO", dense_ratio):
+                index = PantryIndex(source=StaticSource(recipes))
+                index.cookable(pantry)
+            wanted = set().union(*(index._names_for(item) for item in pantry))
+            for max_missing in (0, 3, 8):
+                cookable = index.cookable(pantry, max_missing)
+                expected = python_cookable(recipes, wanted, max_missing)
+                self.assertEqual(len(cookable), len(expected))
+                self.assertEqual(
+                    [match.recipe_id for match in cookable[5:15]], expected[5:15]
+                )
+
+    def test_cookable_endpoint(self):
+        url = reverse("recipe-cookable")
+        params = {"ingredients": "rice, tomatoes, lettuce", "max_missing": 1}
+        response = self.client.get(url, {**params, "page_size": 2})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["count"], 3)
+        self.assertIn("page=2", response.data["next"])
+        first = response.data["results"][0]
+        self.assertEqual(first["recipe"]["title"], "Salad")
+        self.assertEqual(first["missing_count"], 0)
+        response = self.client.get(url, {**params, "page_size": 2, "page": 2})
+        self.assertEqual(response.data["results"][0]["missing"], ["Salt"])
+
+        for params in ({}, {"ingredients": "rice", "max_missing": 11}, {
+            "ingredients": "rice", "max_missing": "some"
+        }):
+            response = self.client.get(url, params)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
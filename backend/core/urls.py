@@ -1,11 +1,20 @@
 from django.urls import path
+from .instrumentation import metrics_view
 from .views import (
     RecipeLandingPageView,
     RecipeByCategoryView,
     RecipeSearchView,
     RecipeDetailView,
+    RecipeScaleView,
     RecipeCreateView,
+    recipe_import,
+    recipe_export,
     ai_recipe_match,
+    ai_recipe_match_async,
+    ai_match_cache_stats,
+    ai_match_job,
+    recipe_rank,
+    RecipeCookableView,
 )
 from .auth_views import (
     UserRegistrationView,
@@ -37,11 +46,44 @@ urlpatterns = [
 
     # 4. Full detail view by recipe ID
     path("recipes/<int:id>/", RecipeDetailView.as_view(), name="recipe-detail"),
+    path(
+        "recipes/<int:id>/scale/", RecipeScaleView.as_view(), name="recipe-scale"
+    ),
 
     # 5. Create a new full recipe with nested relationships (requires auth)
     path("recipes/create/", RecipeCreateView.as_view(), name="recipe-create"),
 
+    # Bulk import from JSON Lines / CSV (admin only)
+    path("recipes/import/", recipe_import, name="recipe-import"),
+    path("recipes/export/", recipe_export, name="recipe-export"),
+
+    # Local ingredient-overlap ranking (no LLM)
+    path("recipes/rank/", recipe_rank, name="recipe-rank"),
+    path(
+        "recipes/cookable/", RecipeCookableView.as_view(), name="recipe-cookable"
+    ),
+
     # 6. AI Recipe Matching endpoint
     path("recipes/ai-match/", ai_recipe_match, name="ai-recipe-match"),
 
+    # 7. Async AI matching (non-blocking when served over ASGI)
+    path(
+        "recipes/ai-match/async/",
+        ai_recipe_match_async,
+        name="ai-recipe-match-async",
+    ),
+    # Background AI matches ({"async": true}) and their results
+    path(
+        "recipes/ai-match/jobs/<uuid:job_id>/",
+        ai_match_job,
+        name="ai-match-job",
+    ),
+    path(
+        "recipes/ai-match/cache-stats/",
+        ai_match_cache_stats,
+        name="ai-match-cache-stats",
+    ),
+
+    # Prometheus metrics of this worker (core.instrumentation)
+    path("metrics/", metrics_view, name="metrics"),
 ]
@@ -1,38 +1,70 @@
+from asgiref.sync import sync_to_async
 from rest_framework import generics
-from rest_framework.pagination import PageNumberPagination
-from rest_framework.decorators import api_view
-from rest_framework.permissions import IsAuthenticated, AllowAny
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import IsAuthenticated, AllowAny, IsAdminUser
 
 from .models import Recipe, Category
 from .serializers import (
     RecipeListSerializer,
     RecipeDetailSerializer,
+    RecipeSearchResultSerializer,
+    ScaledRecipeIngredientSerializer,
 )
 from rest_framework.response import Response
 from rest_framework import status
+from rest_framework.exceptions import ValidationError
 from .serializers import RecipeCreateSerializer, RecipeCreatedResponseSerializer
+from .conditional import catalog_conditional, recipe_conditional
+from .match_cache import match_cache
+from .match_jobs import (
+    JobLimitExceeded,
+    get_setting as get_job_setting,
+    request_owner,
+    submit,
+    wait_for_job,
+    wants_background,
+)
+from .normalization import normalize_name
+from .page_cache import CachedDetailMixin, CachedListMixin, category_scope
+from .payloads import RowDetailMixin, RowListMixin, list_payloads
+from .pagination import RankedPagination, RecipePagination
+from .pantry import pantry_index
+from .ranking import ORDERINGS, recipe_ranker
+from .recipe_export import CONTENT_TYPE as EXPORT_CONTENT_TYPE, export_recipes
+from .recipe_import import ImportFormatError, RecipeImporter, read_rows
+from .search import search_recipes
+from .single_flight import acoalesced, coalesced, stats as single_flight_stats
+from .matching import (
+    afind_cached_match,
+    afind_exact_match,
+    allm_match,
+    aparse_user_ingredients,
+    find_cached_match,
+    find_exact_match,
+    llm_match,
+    match_payload,
+    parse_user_ingredients,
+)
 
-import google.generativeai as genai
-import os
-import json
-import re
-
+from django.conf import settings
+from django.http import JsonResponse, StreamingHttpResponse
+from django.urls import reverse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST
 
+import codecs
+import json
+import logging
 
-# -------------------------------------------------
-# Pagination used across list views
-# -------------------------------------------------
-class RecipePagination(PageNumberPagination):
-    page_size = 10
-    page_size_query_param = "page_size"
-    max_page_size = 100
+logger = logging.getLogger(__name__)
 
 
 # -------------------------------------------------
 # 1. Landing page – paginated newest recipes
 # -------------------------------------------------
-class RecipeLandingPageView(generics.ListAPIView):
-    queryset = Recipe.objects.all().order_by("-created_at")
+@catalog_conditional
+class RecipeLandingPageView(CachedListMixin, RowListMixin, generics.ListAPIView):
+    queryset = Recipe.objects.for_list().order_by("-created_at", "-id")
     serializer_class = RecipeListSerializer
     pagination_class = RecipePagination
 
@@ -40,39 +72,118 @@ class RecipeLandingPageView(generics.ListAPIView):
 # -------------------------------------------------
 # 2. Category filtered list (ForeignKey)
 # -------------------------------------------------
-class RecipeByCategoryView(generics.ListAPIView):
+@catalog_conditional
+class RecipeByCategoryView(CachedListMixin, RowListMixin, generics.ListAPIView):
     serializer_class = RecipeListSerializer
     pagination_class = RecipePagination
 
+    def get_page_cache_scope(self):
+        return category_scope(normalize_name(self.kwargs["category"]))
+
     def get_queryset(self):
         category_name = self.kwargs["category"]
-        return Recipe.objects.filter(
-            category__name__iexact=category_name
-        ).order_by("-created_at")
+        return Recipe.objects.for_list().filter(
+            category__normalized_name=normalize_name(category_name)
+        ).order_by("-created_at", "-id")
 
 
 # -------------------------------------------------
-# 3. Search recipes by title
+# 3. Full-text search (title, description, ingredients, instructions)
 # -------------------------------------------------
+@catalog_conditional
 class RecipeSearchView(generics.ListAPIView):
-    serializer_class = RecipeListSerializer
+    """
+    GET /api/recipes/search/?q=term
+    Recipes ranked by relevance (higher ``rank`` first). Without a query,
+    the newest recipes, with a null ``rank``.
+    """
+    serializer_class = RecipeSearchResultSerializer
     pagination_class = RecipePagination
 
     def get_queryset(self):
-        query = self.request.query_params.get("q", "")
-        return Recipe.objects.filter(
-            title__icontains=query
-        ).order_by("-created_at")
+        query = self.request.query_params.get("q", "").strip()
+        queryset = Recipe.objects.for_list()
+        if not query:
+            return queryset.order_by("-created_at", "-id")
+        return search_recipes(query, queryset)
 
 
 # -------------------------------------------------
 # 4. Full detail page by ID
 # -------------------------------------------------
-class RecipeDetailView(generics.RetrieveAPIView):
-    queryset = Recipe.objects.all()
+@recipe_conditional
+class RecipeDetailView(
+    RowDetailMixin, CachedDetailMixin, generics.RetrieveAPIView
+):
+    queryset = Recipe.objects.for_detail()
     serializer_class = RecipeDetailSerializer
     lookup_field = "id"
 
+
+# -------------------------------------------------
+# 4b. Ingredient amounts scaled to a number of servings
+# -------------------------------------------------
+MAX_SCALE_FACTOR = 100
+
+
+@recipe_conditional
+class RecipeScaleView(generics.RetrieveAPIView):
+    """
+    GET /api/recipes/{id}/scale/?servings=6 (or ?factor=1.5)
+    Scales the stored numeric amounts; no quantity text is parsed here.
+    """
+    queryset = Recipe.objects.with_ingredients()
+    lookup_field = "id"
+
+    def retrieve(self, request, *args, **kwargs):
+        recipe = self.get_object()
+        factor, servings = self.scale_factor(recipe, request.query_params)
+        ingredients = ScaledRecipeIngredientSerializer(
+            recipe.recipe_ingredients.all(), many=True, context={"factor": factor}
+        )
+        return Response({
+            "id": recipe.id,
+            "title": recipe.title,
+            "servings": servings,
+            "original_servings": recipe.servings,
+            "factor": round(factor, 4),
+            "recipe_ingredients": ingredients.data,
+        })
+
+    @staticmethod
+    def scale_factor(recipe, params):
+        """``(factor, target servings)`` from ``servings`` or ``factor``"""
+        if "servings" in params:
+            try:
+                servings = int(params["servings"])
+            except ValueError:
+                servings = 0
+            if servings < 1:
+                raise ValidationError({"servings": "Must be a positive integer."})
+            if not recipe.servings:
+                raise ValidationError(
+                    {"servings": "This recipe has no servings; pass factor instead."}
+                )
+            factor = servings / recipe.servings
+        elif "factor" in params:
+            try:
+                factor = float(params["factor"])
+            except ValueError:
+                factor = 0
+            if not 0 < factor <= MAX_SCALE_FACTOR:
+                raise ValidationError(
+                    {"factor": f"Must be between 0 and {MAX_SCALE_FACTOR}."}
+                )
+            servings = recipe.servings * factor if recipe.servings else None
+        else:
+            factor, servings = 1.0, recipe.servings
+        if factor > MAX_SCALE_FACTOR:
+            raise ValidationError(
+                {"servings": f"At most {MAX_SCALE_FACTOR} times the recipe."}
+            )
+        return factor, servings
+
+
 class RecipeCreateView(generics.CreateAPIView):
     """
     POST /api/recipes/create/
@@ -94,322 +205,295 @@ class RecipeCreateView(generics.CreateAPIView):
 
 
 # -------------------------------------------------
-# AI Recipe Matching endpoint using Google Gemini
+# Bulk import (JSON Lines or CSV body, admin only)
+# -------------------------------------------------
+@api_view(['POST'])
+@permission_classes([IsAdminUser])
+def recipe_import(request):
+    """
+    POST /api/recipes/import/
+    Body: one recipe per line as JSON (Content-Type application/x-ndjson),
+    or CSV (Content-Type text/csv). The body is streamed and written in
+    chunks; the response reports per-chunk throughput and per-line errors.
+    Recipes are attributed to the importing user.
+    """
+    fmt = "csv" if request.content_type.startswith("text/csv") else "jsonl"
+    stream = request.stream
+    lines = codecs.iterdecode(stream, "utf-8") if stream is not None else []
+
+    importer = RecipeImporter(
+        author=request.user,
+        chunk_size=getattr(settings, "RECIPE_IMPORT_CHUNK_SIZE", 500),
+    )
+    try:
+        report = importer.run(read_rows(lines, fmt))
+    except (ImportFormatError, UnicodeDecodeError) as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    return Response(report.as_dict(), status=status.HTTP_200_OK)
+
+
+# -------------------------------------------------
+# Streaming export (NDJSON, admin only)
+# -------------------------------------------------
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def recipe_export(request):
+    """
+    GET /api/recipes/export/
+    The whole catalog, one RecipeDetail record per line, streamed in
+    constant memory. The output can be fed back to /api/recipes/import/.
+    """
+    response = StreamingHttpResponse(
+        export_recipes(chunk_size=getattr(settings, "RECIPE_EXPORT_CHUNK_SIZE", 500)),
+        content_type=EXPORT_CONTENT_TYPE,
+    )
+    response["Content-Disposition"] = 'attachment; filename="recipes.ndjson"'
+    return response
+
+
+# -------------------------------------------------
+# AI Recipe Matching endpoint (Gemini or the configured backend)
 # -------------------------------------------------
 @api_view(['POST'])
 def ai_recipe_match(request):
     """
-    Match user ingredient input to recipes using Google AI Studio (Gemini)
-    
+    Match user ingredient input to recipes using Google AI Studio (Gemini),
+    or whichever LLM backend AI_MATCH_BACKEND selects
+
     Request body: {"ingredients": "chicken, tomatoes, pasta"}
     Returns: List of matching recipes ordered by relevance
     """
     user_input = request.data.get('ingredients', '').strip()
-    
+
     if not user_input:
         return Response(
             {'error': 'Please provide ingredients'},
             status=status.HTTP_400_BAD_REQUEST
         )
-    
-    # Get API key from environment
-    api_key = os.getenv('GOOGLE_AI_API_KEY')
-    if not api_key or api_key == 'YOUR_KEY_HERE':
-        return Response(
-            {'error': 'Google AI API key not configured'},
-            status=status.HTTP_500_INTERNAL_SERVER_ERROR
-        )
-    
-    # Configure Gemini API
+
+    user_ingredients = parse_user_ingredients(user_input)
+
+    # First, check for exact ingredient matches before calling AI (the
+    # in-memory index ranks recipes by overlap without querying the DB),
+    # then for a cached answer to the same pantry in any order or case
+    match = find_exact_match(user_ingredients)
+    if match is None:
+        # One catalog version for the cache lookup, the flight and the answer
+        version = match_cache.version()
+        match = find_cached_match(user_ingredients, version)
+    if match is not None:
+        return Response(match_payload(*match), status=status.HTTP_200_OK)
+
+    if wants_background(request):
+        return queue_match_job(request, user_input, user_ingredients)
+
+    # Concurrent requests for this pantry share one LLM call
+    status_code, body = coalesced(
+        user_ingredients,
+        lambda: llm_match(user_input, user_ingredients, version),
+        version,
+    )
+    return Response(body, status=status_code)
+
+
+def queue_match_job(request, user_input, user_ingredients):
+    """202 pointing at the background job answering this AI match"""
     try:
-        genai.configure(api_key=api_key)
-        # Try to get client info to verify API key works
-        try:
-            # This will help us see what's available
-            test_models = list(genai.list_models())
-            if test_models:
-                # Log available models for debugging
-                available_model_names = [m.name for m in test_models]
-            else:
-                # If list_models returns empty, try direct model access
-                pass
-        except Exception:
-            # If list_models fails, we'll try direct model access anyway
-            pass
-    except Exception as e:
+        job, _ = submit(user_input, user_ingredients, request_owner(request))
+    except JobLimitExceeded as e:
         return Response(
-            {'error': f'Failed to configure Gemini API: {str(e)}'},
-            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            {'error': f'At most {e} AI matches may be in progress at once'},
+            status=status.HTTP_429_TOO_MANY_REQUESTS,
+            headers={'Retry-After': '5'}
         )
-    
-    # Fetch all recipes with their ingredients
+    url = request.build_absolute_uri(reverse('ai-match-job', args=[job.id]))
+    return Response(
+        {'job_id': str(job.id), 'status': job.status, 'status_url': url},
+        status=status.HTTP_202_ACCEPTED,
+        headers={'Location': url, 'Retry-After': '1'}
+    )
+
+
+@api_view(['GET'])
+def ai_match_job(request, job_id):
+    """
+    GET /api/recipes/ai-match/jobs/<job_id>/?wait=<seconds>
+    A background AI match: 202 while it is queued or running, then its
+    result. With wait, blocks until the job finishes, for up to that long.
+    """
     try:
-        recipes = Recipe.objects.select_related('category', 'skill_level').prefetch_related(
-            'recipe_ingredients__ingredient'
-        ).all()
-        
-        if not recipes.exists():
-            return Response(
-                {'error': 'No recipes found'},
-                status=status.HTTP_404_NOT_FOUND
-            )
-    except Exception as e:
+        wait = float(request.query_params.get('wait', 0))
+    except ValueError:
+        wait = -1
+    if not 0 <= wait <= get_job_setting('MAX_WAIT'):
         return Response(
-            {'error': f'Failed to fetch recipes: {str(e)}'},
-            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            {'error': f"wait must be between 0 and {get_job_setting('MAX_WAIT')}"},
+            status=status.HTTP_400_BAD_REQUEST
         )
-    
-    # Format recipes for Gemini prompt
-    recipes_text = []
-    recipe_id_map = {}
-    
-    # Normalize user input for exact matching
-    user_input_normalized = user_input.lower().strip()
-    user_ingredients = [ing.strip().lower() for ing in user_input_normalized.split(',')]
-    
-    # First, check for exact ingredient matches before calling AI
-    exact_matches = []
-    for recipe in recipes:
-        recipe_ingredients = [
-            ri.ingredient.name.lower().strip()
-            for ri in recipe.recipe_ingredients.all()
-        ]
-        # Check if any user ingredient exactly matches any recipe ingredient
-        for user_ing in user_ingredients:
-            if user_ing in recipe_ingredients:
-                exact_matches.append(recipe)
-                break  # Found a match, no need to check other ingredients for this recipe
-    
-    # If we found exact matches, return the first one immediately with justification
-    if exact_matches:
-        best_match = exact_matches[0]
-        serializer = RecipeListSerializer(best_match)
-        
-        # Create whimsical justification for exact match
-        recipe_ingredients = [
-            ri.ingredient.name for ri in best_match.recipe_ingredients.all()
-        ]
-        matched_ings = [ing for ing in user_ingredients if ing in [ri.lower().strip() for ri in recipe_ingredients]]
-        
-        if matched_ings:
-            # Format matched ingredients nicely
-            matched_display = ', '.join([ing.title() for ing in matched_ings])
-            missing_ings = [ri for ri in recipe_ingredients if ri.lower().strip() not in user_ingredients]
-            
-            if missing_ings:
-                missing_display = ', '.join(missing_ings[:3])  # Show first 3 missing
-                if len(missing_ings) > 3:
-                    missing_display += f", and {len(missing_ings) - 3} more thing{'s' if len(missing_ings) - 3 > 1 else ''}"
-                justification = f"With your {matched_display}, you could make {best_match.title}! Check you have the right amounts, but then the only thing you'd need is {missing_display}."
-            else:
-                justification = f"Perfect match! With your {matched_display}, you have everything you need to make {best_match.title}. You're all set to create something delicious!"
-        else:
-            justification = f"Great news! You have the perfect ingredients to make {best_match.title}. Check you have the right amounts, and you're ready to cook!"
-        
-        return Response({
-            'count': 1,
-            'recipe': serializer.data,
-            'justification': justification
-        }, status=status.HTTP_200_OK)
-    
-    # No exact matches found, use AI to find best match
-    for recipe in recipes:
-        ingredients_list = [
-            f"{ri.ingredient.name} ({ri.quantity})" 
-            for ri in recipe.recipe_ingredients.all()
-        ]
-        
-        recipe_info = f"""Recipe ID: {recipe.id}
-Title: {recipe.title}
-Category: {recipe.category.name if recipe.category else 'N/A'}
-Ingredients: {', '.join(ingredients_list) if ingredients_list else 'N/A'}
-Description: {recipe.description[:200] if recipe.description else 'N/A'}
-"""
-        recipes_text.append(recipe_info)
-        recipe_id_map[recipe.id] = recipe
-    
-    # Create prompt for Gemini
-    prompt = f"""You are a whimsical recipe matching assistant. A user has these ingredients: "{user_input}"
-
-Here are all available recipes:
-
-{chr(10).join(recipes_text)}
-
-Find the SINGLE best matching recipe based on the user's ingredients. 
-Priority order:
-1. EXACT ingredient match (if user ingredient appears exactly in recipe ingredients, this is the best match)
-2. Direct ingredient matches (same ingredient name)
-3. Similar ingredients or substitutes
-4. Recipe category relevance
-
-Return a JSON object with two fields:
-1. "recipe_id": the single best matching recipe ID (just the number)
-2. "justification": a whimsical, friendly message explaining why this recipe was chosen, in the style of:
-   "With your [user ingredients], you could make [recipe name]! Check you have the right amounts, but then the only thing you'd need is [missing ingredients or encouragement]."
-   
-Make it warm, encouraging, and slightly playful. Reference the user's ingredients and what they'd need.
-
-Example format:
-{{
-  "recipe_id": 23,
-  "justification": "With your curry paste, you could make Vegetable Curry! Check you have the right amounts, but then the only thing you'd need is some fresh vegetables and a bit of time to let those flavors meld together."
-}}
-
-Return ONLY the JSON object, no other text."""
-    
-    try:
-        # Call Gemini API - try different approaches based on API version
-        # The error suggests v1beta API, so models might be named differently
-        
-        response = None
-        last_error = None
-        
-        # First, try to get available models if possible
-        try:
-            available_models = list(genai.list_models())
-            if available_models:
-                # Use the first model that supports generateContent
-                for model_info in available_models:
-                    if hasattr(model_info, 'supported_generation_methods') and 'generateContent' in model_info.supported_generation_methods:
-                        model_name = model_info.name
-                        # Remove 'models/' prefix if present
-                        if '/' in model_name:
-                            model_name = model_name.split('/')[-1]
-                        try:
-                            model = genai.GenerativeModel(model_name)
-                            response = model.generate_content(prompt)
-                            break
-                        except Exception as e:
-                            last_error = str(e)
-                            continue
-        except Exception as e:
-            # If list_models fails, continue to direct model access
-            last_error = str(e)
-        
-        # If no model found from list, try common model names directly
-        if response is None:
-            # Try different model name formats
-            model_names_to_try = [
-                'gemini-1.5-flash-latest',  # Latest format
-                'gemini-1.5-pro-latest',
-                'gemini-1.5-flash',
-                'gemini-1.5-pro',
-                'gemini-pro',
-                # Try with full path
-                'models/gemini-1.5-flash-latest',
-                'models/gemini-1.5-pro-latest',
-                'models/gemini-1.5-flash',
-                'models/gemini-1.5-pro',
-                'models/gemini-pro',
-            ]
-            
-            for model_name in model_names_to_try:
-                try:
-                    model = genai.GenerativeModel(model_name)
-                    response = model.generate_content(prompt)
-                    break  # Success, exit loop
-                except Exception as e:
-                    last_error = str(e)
-                    continue  # Try next model
-        
-        if response is None:
-            # Provide helpful error message
-            error_msg = (
-                f"Could not find a working Gemini model. "
-                f"Last error: {last_error}. "
-                f"\n\nTroubleshooting steps:\n"
-                f"1. Verify your API key at https://aistudio.google.com/app/apikey\n"
-                f"2. Make sure the API key has 'Generative Language API' enabled\n"
-                f"3. Check if your API key has any restrictions\n"
-                f"4. Try creating a new API key\n"
-                f"5. Ensure you're using the correct API key (not Vertex AI key)"
-            )
-            raise ValueError(error_msg)
-        
-        # Parse JSON response
-        response_text = response.text.strip()
-        
-        # Remove markdown code blocks if present
-        if '```' in response_text:
-            # Extract content between code blocks
-            match = re.search(r'```(?:json)?\s*(.*?)\s*```', response_text, re.DOTALL)
-            if match:
-                response_text = match.group(1).strip()
-        
-        # Try to parse as JSON object (with recipe_id and justification)
-        try:
-            ai_response = json.loads(response_text)
-            
-            # Handle both old format (array) and new format (object)
-            if isinstance(ai_response, list):
-                # Old format: just an array of IDs
-                matched_ids = ai_response
-                justification = None
-            elif isinstance(ai_response, dict):
-                # New format: object with recipe_id and justification
-                matched_ids = [ai_response.get('recipe_id')]
-                justification = ai_response.get('justification')
-            else:
-                raise ValueError(f"Unexpected response format: {type(ai_response)}")
-                
-        except json.JSONDecodeError:
-            # Try to extract array from text (fallback for old format)
-            array_match = re.search(r'\[[\d,\s]+\]', response_text)
-            if array_match:
-                matched_ids = json.loads(array_match.group(0))
-                justification = None
-            else:
-                # Try to extract object
-                object_match = re.search(r'\{[^}]+\}', response_text)
-                if object_match:
-                    try:
-                        ai_response = json.loads(object_match.group(0))
-                        matched_ids = [ai_response.get('recipe_id')]
-                        justification = ai_response.get('justification')
-                    except:
-                        raise ValueError(f"Could not parse JSON from response: {response_text}")
-                else:
-                    raise ValueError(f"Could not parse JSON from response: {response_text}")
-        
-        # Validate that matched_ids is a list
-        if not isinstance(matched_ids, list) or not matched_ids:
-            raise ValueError(f"Expected non-empty list, got {matched_ids}")
-        
-        # Get the best matching recipe
-        recipe_id = matched_ids[0]
-        if recipe_id not in recipe_id_map:
-            raise ValueError(f"Recipe ID {recipe_id} not found in available recipes")
-        
-        best_match = recipe_id_map[recipe_id]
-        serializer = RecipeListSerializer(best_match)
-        
-        # Generate justification if not provided by AI
-        if not justification:
-            # Create a simple justification based on ingredients
-            recipe_ingredients = [
-                ri.ingredient.name for ri in best_match.recipe_ingredients.all()
-            ]
-            user_ing_list = [ing.strip() for ing in user_input.split(',')]
-            matched_ings = [ing for ing in user_ing_list if any(ing.lower() in ri.lower() or ri.lower() in ing.lower() for ri in recipe_ingredients)]
-            
-            if matched_ings:
-                justification = f"With your {', '.join(matched_ings)}, you could make {best_match.title}! Check you have the right amounts, but then you're all set to create something delicious."
-            else:
-                justification = f"You could make {best_match.title}! This recipe matches your ingredients and will be a great choice for your next meal."
-        
-        return Response({
-            'count': 1,
-            'recipe': serializer.data,
-            'justification': justification
-        }, status=status.HTTP_200_OK)
-        
-    except json.JSONDecodeError as e:
+    job = wait_for_job(job_id, wait)
+    if job is None:
         return Response(
-            {'error': f'Failed to parse AI response as JSON: {str(e)}'},
-            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            {'error': 'Match job not found'}, status=status.HTTP_404_NOT_FOUND
         )
-    except Exception as e:
+    body = {'id': str(job.id), 'status': job.status}
+    if not job.finished:
         return Response(
-            {'error': f'AI matching failed: {str(e)}'},
-            status=status.HTTP_500_INTERNAL_SERVER_ERROR
-        )
\ No newline at end of file
+            body, status=status.HTTP_202_ACCEPTED, headers={'Retry-After': '1'}
+        )
+    body.update(result_status=job.result_status, result=job.result)
+    return Response(body, status=status.HTTP_200_OK)
+
+
+# -------------------------------------------------
+# Async AI Recipe Matching endpoint (ASGI)
+# -------------------------------------------------
+@csrf_exempt
+@require_POST
+async def ai_recipe_match_async(request):
+    """
+    POST /api/recipes/ai-match/async/
+    Same contract as ai_recipe_match, but never blocks a worker thread while
+    waiting for the LLM. The call is bounded by AI_MATCH_TIMEOUT and is
+    cancelled when the client disconnects (Django cancels the view task).
+    """
+    try:
+        body = json.loads(request.body or b'{}')
+    except json.JSONDecodeError:
+        return JsonResponse(
+            {'error': 'Request body must be JSON'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    if not isinstance(body, dict):
+        return JsonResponse(
+            {'error': 'Request body must be a JSON object'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    user_input = str(body.get('ingredients', '')).strip()
+
+    if not user_input:
+        return JsonResponse(
+            {'error': 'Please provide ingredients'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    user_ingredients = await aparse_user_ingredients(user_input)
+
+    match = await afind_exact_match(user_ingredients)
+    if match is None:
+        version = await sync_to_async(match_cache.version)()
+        match = await afind_cached_match(user_ingredients, version)
+    if match is not None:
+        return JsonResponse(match_payload(*match), status=status.HTTP_200_OK)
+
+    status_code, body = await acoalesced(
+        user_ingredients,
+        lambda: allm_match(user_input, user_ingredients, version),
+        version,
+    )
+    return JsonResponse(body, status=status_code)
+
+
+# -------------------------------------------------
+# Local ingredient ranking (no LLM)
+# -------------------------------------------------
+RANK_MAX_LIMIT = 50
+
+
+@api_view(['GET'])
+def recipe_rank(request):
+    """
+    GET /api/recipes/rank/?ingredients=chicken,rice&limit=10&order=coverage
+    Every recipe scored against the pantry by core.ranking, best first.
+    order: coverage (IDF-weighted share of the recipe covered, default),
+    missing (fewest missing ingredients) or jaccard.
+    """
+    user_ingredients = parse_user_ingredients(
+        request.query_params.get('ingredients', '')
+    )
+    if not user_ingredients:
+        raise ValidationError({'ingredients': 'Please provide ingredients.'})
+    try:
+        limit = int(request.query_params.get('limit', 10))
+    except ValueError:
+        limit = 0
+    if not 0 < limit <= RANK_MAX_LIMIT:
+        raise ValidationError(
+            {'limit': f'Must be an integer between 1 and {RANK_MAX_LIMIT}.'}
+        )
+    order = request.query_params.get('order', 'coverage')
+    if order not in ORDERINGS:
+        raise ValidationError({'order': f'Must be one of {", ".join(ORDERINGS)}.'})
+
+    ranked = recipe_ranker.rank(user_ingredients, limit=limit, order=order)
+    recipes = list_payloads([match.recipe_id for match in ranked])
+    results = [
+        {
+            'recipe': recipes[match.recipe_id],
+            'coverage': round(match.coverage, 4),
+            'jaccard': round(match.jaccard, 4),
+            'matched': match.matched,
+            'missing': match.missing,
+        }
+        for match in ranked
+        if match.recipe_id in recipes
+    ]
+    return Response({'count': len(results), 'results': results})
+
+
+COOKABLE_MAX_MISSING = 10
+
+
+@catalog_conditional
+class RecipeCookableView(generics.ListAPIView):
+    """
+    GET /api/recipes/cookable/?ingredients=chicken,rice&max_missing=2
+    Every recipe using the pantry and missing at most ``max_missing``
+    (default 0) of its ingredients, from the bitsets of core.pantry: fewest
+    missing first, then most ingredients covered, then newest. Page-number
+    pagination.
+    """
+    pagination_class = RankedPagination
+
+    def list(self, request, *args, **kwargs):
+        user_ingredients = parse_user_ingredients(
+            request.query_params.get('ingredients', '')
+        )
+        if not user_ingredients:
+            raise ValidationError({'ingredients': 'Please provide ingredients.'})
+        try:
+            max_missing = int(request.query_params.get('max_missing', 0))
+        except ValueError:
+            max_missing = -1
+        if not 0 <= max_missing <= COOKABLE_MAX_MISSING:
+            raise ValidationError({
+                'max_missing':
+                    f'Must be an integer between 0 and {COOKABLE_MAX_MISSING}.'
+            })
+
+        cookable = pantry_index.cookable(user_ingredients, max_missing)
+        page = self.paginate_queryset(cookable)
+        recipes = list_payloads([match.recipe_id for match in page])
+        results = [
+            {
+                'recipe': recipes[match.recipe_id],
+                'missing_count': match.missing_count,
+                'matched': match.matched,
+                'missing': match.missing,
+            }
+            for match in page
+            if match.recipe_id in recipes
+        ]
+        return self.get_paginated_response(results)
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def ai_match_cache_stats(request):
+    """
+    GET /api/recipes/ai-match/cache-stats/
+    Hit/miss counters of the AI match response cache, and how many LLM
+    passes were shared by concurrent requests (this worker only)
+    """
+    stats = {**match_cache.stats(), 'single_flight': single_flight_stats()}
+    return Response(stats, status=status.HTTP_200_OK)